@@ -0,0 +1,79 @@
+"""
+Producer/consumer pipeline for batched CSV ingestion.
+
+A reader thread turns the CSV into batches (parsing, JSON decoding and topic
+resolution happen there) and feeds a bounded queue; several uploader workers
+take batches off the queue and flush them concurrently. Each worker records its
+counters in a fresh per-batch stats dict, and the deltas are returned in batch
+order, so the caller merges them deterministically from a single thread.
+"""
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def run_batch_pipeline(produce_batches: Callable[[], Iterator[List[Any]]],
+                       process_batch: Callable[[List[Any], Dict[str, Any]], None],
+                       new_stats: Callable[[], Dict[str, Any]],
+                       workers: int = 4, queue_size: int = 8) -> List[Dict[str, Any]]:
+    """
+    Run produce_batches in a reader thread and process_batch(batch, stats) in
+    `workers` uploader threads connected by a queue of at most `queue_size` batches.
+
+    Returns one stats dict per batch, in the order the batches were produced.
+    A batch whose processing raises is counted as errors for all of its rows.
+    An exception in the reader is re-raised once the workers have drained.
+    """
+    batches: queue.Queue = queue.Queue(maxsize=queue_size)
+    results: Dict[int, Dict[str, Any]] = {}
+    reader_errors: List[BaseException] = []
+
+    def reader():
+        try:
+            for batch_number, batch in enumerate(produce_batches()):
+                batches.put((batch_number, batch))
+        except BaseException as e:
+            reader_errors.append(e)
+        finally:
+            for _ in range(workers):
+                batches.put(_DONE)
+
+    def uploader():
+        while True:
+            item = batches.get()
+            if item is _DONE:
+                return
+            batch_number, batch = item
+            stats = new_stats()
+            try:
+                process_batch(batch, stats)
+            except Exception as e:
+                logger.error(f"Batch {batch_number + 1} failed: {e}")
+                stats['errors'] = stats.get('errors', 0) + len(batch)
+            results[batch_number] = stats
+
+    threads = [threading.Thread(target=reader, name='csv-reader', daemon=True)]
+    threads += [threading.Thread(target=uploader, name=f'csv-uploader-{i + 1}', daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if reader_errors:
+        raise reader_errors[0]
+    return [results[batch_number] for batch_number in sorted(results)]
+
+
+def merge_stats(target: Dict[str, Any], delta: Dict[str, Any]):
+    """Add counters and union sets from a per-batch stats dict into `target`"""
+    for key, value in delta.items():
+        if isinstance(value, set):
+            target[key] |= value
+        else:
+            target[key] += value
@@ -11,12 +11,18 @@ import os
 import re
 import time
 import argparse
-import requests
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from llm_backends import BackendError, BackendRouter, Completion, add_backend_arguments, build_router
+from llm_cache import disable_cache, print_cache_stats
+from llm_telemetry import add_telemetry_arguments, finish_telemetry
+from rate_limit import RateLimiter
 
 # Configuration
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+SYSTEM_PROMPT = "You are a chemistry expert and multilingual educational assistant."
 OUTPUT_CSV = "enriched_chemistry_terms.csv"
+MAX_COMPLETION_TOKENS = 1000
 
 def parse_extracted_terms(input_file: str) -> Dict[str, List[str]]:
     """Parses the output file from the extraction script to get terms by topic"""
@@ -43,20 +49,7 @@ def parse_extracted_terms(input_file: str) -> Dict[str, List[str]]:
         print(f"Error parsing input file: {e}")
         return {}
 
-def get_term_enrichment(api_key: str, term: str) -> Optional[dict]:
-    """
-    Gets comprehensive term enrichment from DeepSeek API.
-    Returns a dictionary with all enrichment data.
-    """
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    prompt = f"""
-You are a chemistry expert and multilingual educator. For the term "{term}", provide comprehensive information in JSON format with these keys:
-
-REQUIRED KEYS:
+ENRICHMENT_KEYS_SPEC = """REQUIRED KEYS:
 1. explanation: Concise educational explanation (1-2 sentences)
 2. urdu_meaning: Urdu translation if available (e.g., "مفروضہ - مفروضہ")
 3. term_type: Classification (element, compound, concept, process, property, unit, other)
@@ -81,7 +74,130 @@ PROPERTIES STRUCTURE:
     "key_principle": "Brief principle",
     "related_concepts": [list of related terms],
     "real_world_example": "Specific application"
+"""
 
+COVALENT_BOND_EXAMPLE = """{
+    "explanation": "A chemical bond formed by the sharing of electron pairs between atoms",
+    "urdu_meaning": "سالماتی ربط - ایٹموں کے درمیان الیکٹران کی شرکت سے بننے والا کیمیائی بندھن",
+    "term_type": "concept",
+    "example_sentence": "Water molecules are formed through covalent bonds between oxygen and hydrogen atoms.",
+    "properties": {
+        "key_principle": "Electron sharing",
+        "related_concepts": ["ionic bond", "molecule", "electron pair"],
+        "real_world_example": "Formation of DNA double helix structure"
+    }
+}"""
+
+REQUIRED_KEYS = ('explanation', 'urdu_meaning', 'term_type', 'example_sentence', 'properties')
+TERM_TYPES = ('element', 'compound', 'concept', 'process', 'property', 'unit', 'other')
+
+# Required properties and their JSON types per term_type; other types only need an object
+CONCEPT_PROPERTIES = {'key_principle': str, 'related_concepts': list, 'real_world_example': str}
+PROPERTY_SCHEMA = {
+    'element': {'symbol': str, 'atomic_number': (int, float), 'category': str, 'state_room_temp': str,
+                'common_uses': list},
+    'compound': {'formula': str, 'molar_mass': (str, int, float), 'state_room_temp': str, 'hazards': list},
+    'concept': CONCEPT_PROPERTIES,
+    'process': CONCEPT_PROPERTIES,
+}
+
+# Repairs only ask for the broken fields, so they need a fraction of a full completion
+REPAIR_MAX_TOKENS = 800
+
+# Batch mode: completion budget per term, capped by the model's output limit
+BATCH_TOKENS_PER_TERM = 500
+MODEL_MAX_OUTPUT_TOKENS = 8000
+MAX_BATCH_SIZE = MODEL_MAX_OUTPUT_TOKENS // BATCH_TOKENS_PER_TERM
+
+def _matches(value, expected) -> bool:
+    """isinstance check that also rejects blank strings and booleans posing as numbers"""
+    if isinstance(value, bool) or not isinstance(value, expected):
+        return False
+    return not isinstance(value, str) or bool(value.strip())
+
+def enrichment_problems(data: dict) -> List[str]:
+    """
+    Fields of a parsed enrichment that are missing or invalid, as paths such as
+    'term_type' or 'properties.symbol'; empty when the record matches the schema.
+    The shape of 'properties' depends on term_type, so an unknown type invalidates both.
+    """
+    problems = [key for key in REQUIRED_KEYS
+                if key not in ('term_type', 'properties') and not _matches(data.get(key), str)]
+    term_type = data.get('term_type')
+    term_type = term_type.strip().lower() if isinstance(term_type, str) else None
+    properties = data.get('properties')
+    if term_type not in TERM_TYPES:
+        return problems + ['term_type', 'properties']
+    if not isinstance(properties, dict):
+        return problems + ['properties']
+    for name, expected in PROPERTY_SCHEMA.get(term_type, {}).items():
+        if not _matches(properties.get(name), expected):
+            problems.append(f"properties.{name}")
+    return problems
+
+def merge_repair(enrichment: dict, patch: dict, problems: List[str]) -> dict:
+    """Copies the repaired fields from `patch` into a copy of `enrichment`, leaving valid fields untouched"""
+    merged = dict(enrichment)
+    properties = dict(merged['properties']) if isinstance(merged.get('properties'), dict) else {}
+    patch_properties = patch.get('properties') if isinstance(patch.get('properties'), dict) else {}
+    for problem in problems:
+        if problem == 'properties':
+            properties = dict(patch_properties)
+        elif problem.startswith('properties.'):
+            name = problem.split('.', 1)[1]
+            # Models sometimes return nested fields at the top level
+            if name in patch_properties or name in patch:
+                properties[name] = patch_properties.get(name, patch.get(name))
+        elif problem in patch:
+            merged[problem] = patch[problem]
+    merged['properties'] = properties
+    return merged
+
+def parse_json(raw_output: str, opener: str = '{'):
+    """
+    Parses the JSON object (or array, with opener '[') in a model response.
+    Falls back to the first complete value when text after it breaks the greedy match.
+    Returns None when nothing parses.
+    """
+    closer = '}' if opener == '{' else ']'
+    match = re.search(re.escape(opener) + '.*' + re.escape(closer), raw_output, re.DOTALL)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(0))
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.JSONDecoder().raw_decode(match.group(0))[0]
+    except json.JSONDecodeError:
+        return None
+
+def request_completion(router: BackendRouter, prompt: str, max_tokens: int, label: str,
+                       attempt: int = 0) -> Optional[Completion]:
+    """
+    Sends one completion through the backend router (or replays it from the LLM cache).
+    Returns None on failure. Call completion.remember() only once the text proved
+    usable, so bad responses are retried on the next run, and report unparseable
+    output with completion.mark_parse_failure() (schema problems with
+    completion.mark_schema_repair()) for the telemetry.
+    """
+    try:
+        return router.complete(prompt, system=SYSTEM_PROMPT, temperature=0.3, max_tokens=max_tokens,
+                               timeout=max(60, max_tokens // 50), label=label, attempt=attempt)
+    except BackendError as e:
+        print(f"API Request Error for {label}: {e}")
+        return None
+
+def get_term_enrichment(router: BackendRouter, term: str, attempt: int = 0) -> Optional[dict]:
+    """
+    Gets comprehensive term enrichment from the configured LLM backend(s).
+    Returns a dictionary with all enrichment data, validated against the schema
+    (fields the model got wrong are repaired with a follow-up request).
+    """
+    prompt = f"""
+You are a chemistry expert and multilingual educator. For the term "{term}", provide comprehensive information in JSON format with these keys:
+
+{ENRICHMENT_KEYS_SPEC}
 OUTPUT FORMAT (JSON ONLY):
 {{
     "explanation": "...",
@@ -92,88 +208,335 @@ OUTPUT FORMAT (JSON ONLY):
 }}
 
 EXAMPLE FOR "COVALENT BOND":
-{{
-    "explanation": "A chemical bond formed by the sharing of electron pairs between atoms",
-    "urdu_meaning": "سالماتی ربط - ایٹموں کے درمیان الیکٹران کی شرکت سے بننے والا کیمیائی بندھن",
-    "term_type": "concept",
-    "example_sentence": "Water molecules are formed through covalent bonds between oxygen and hydrogen atoms.",
-    "properties": {{
-        "key_principle": "Electron sharing",
-        "related_concepts": ["ionic bond", "molecule", "electron pair"],
-        "real_world_example": "Formation of DNA double helix structure"
-    }}
-}}
+{COVALENT_BOND_EXAMPLE}
 
 Now analyze: "{term}"
 """
 
-    payload = {
-        "model": "deepseek-reasoner",
-        "messages": [
-            {"role": "system", "content": "You are a chemistry expert and multilingual educational assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 1000,
-    }
+    completion = request_completion(router, prompt, MAX_COMPLETION_TOKENS, f"'{term}'", attempt)
+    if completion is None:
+        return None
+    raw_output = completion.text
 
-    try:
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        content = response.json()
-
-        if 'choices' in content and content['choices']:
-            raw_output = content['choices'][0]['message']['content'].strip()
-
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', raw_output, re.DOTALL)
-            if not json_match:
-                print(f"[WARN] JSON not found for '{term}'. Full response:\n{raw_output[:500]}...")
-                return None
-            if json_match:
-                return json.loads(json_match.group(0))
-            else:
-                print(f"JSON not found in response for '{term}': {raw_output}")
-                return None
-        else:
-            print(f"No 'choices' in API response for '{term}'")
+    # Extract JSON from response
+    enrichment = parse_json(raw_output)
+    if not isinstance(enrichment, dict):
+        print(f"[WARN] JSON not found for '{term}'. Full response:\n{raw_output[:500]}...")
+        completion.mark_parse_failure()
+        return None
+    enrichment = validate_enrichment(router, term, enrichment, completion, attempt)
+    if enrichment:
+        completion.remember()
+    return enrichment
+
+def validate_enrichment(router: BackendRouter, term: str, enrichment: dict, completion: Completion,
+                        attempt: int = 0) -> Optional[dict]:
+    """
+    Checks a parsed enrichment against the schema. When fields are missing or
+    invalid, only those are requested again and merged in, instead of dropping
+    the record. Returns the valid enrichment (term_type lowercased) or None.
+    """
+    problems = enrichment_problems(enrichment)
+    if problems:
+        completion.mark_schema_repair()
+        print(f"  🩹 Repairing {', '.join(problems)} for '{term}'")
+        enrichment = repair_enrichment(router, term, enrichment, problems, attempt)
+        if enrichment is None:
             return None
+    enrichment['term_type'] = enrichment['term_type'].strip().lower()
+    return enrichment
+
+def repair_enrichment(router: BackendRouter, term: str, enrichment: dict, problems: List[str],
+                      attempt: int = 0) -> Optional[dict]:
+    """
+    Asks for just the fields in `problems` and merges them into the record.
+    Returns the repaired enrichment, or None if it still fails validation.
+    """
+    field_list = "\n".join(f"- {problem}" for problem in problems)
+    prompt = f"""
+You are a chemistry expert and multilingual educator. The JSON record below for the term "{term}" has missing or invalid fields.
+
+{ENRICHMENT_KEYS_SPEC}
+CURRENT RECORD:
+{json.dumps(enrichment, ensure_ascii=False, indent=4)}
+
+MISSING OR INVALID FIELDS:
+{field_list}
 
-    except requests.exceptions.RequestException as e:
-        print(f"API Request Error for '{term}': {e}")
+OUTPUT FORMAT (JSON ONLY):
+A JSON object with ONLY the fields listed above; nested fields such as "properties.symbol" go
+inside a "properties" object. Do not repeat the fields that are already valid.
+
+Now repair: "{term}"
+"""
+
+    completion = request_completion(router, prompt, REPAIR_MAX_TOKENS, f"repair of '{term}'", attempt)
+    if completion is None:
         return None
-    except json.JSONDecodeError:
-        print(f"JSON decode error for '{term}' response")
+    patch = parse_json(completion.text)
+    if not isinstance(patch, dict):
+        print(f"[WARN] JSON not found in repair for '{term}'. Full response:\n{completion.text[:500]}...")
+        completion.mark_parse_failure()
         return None
 
-def save_to_csv(results: List[Dict], output_path: str):
-    """Saves enriched terms to CSV file with a single JSON column"""
-    if not results:
-        print("No results to save")
-        return
+    repaired = merge_repair(enrichment, patch, problems)
+    remaining = enrichment_problems(repaired)
+    if remaining:
+        print(f"[WARN] Repair for '{term}' left {', '.join(remaining)} invalid")
+        completion.mark_schema_repair()
+        return None
+    completion.remember()
+    return repaired
+
+def get_batch_enrichment(router: BackendRouter, terms: List[str], attempt: int = 0) -> Dict[str, dict]:
+    """
+    Enriches several terms with one request that asks for a JSON array.
+    Each element is validated on its own (and repaired when only some fields are
+    wrong); returns {term.lower(): enrichment} for the elements that passed, so
+    callers can retry only the rest.
+    """
+    term_list = "\n".join(f"{i}. {term}" for i, term in enumerate(terms, start=1))
+    prompt = f"""
+You are a chemistry expert and multilingual educator. For EACH of the {len(terms)} terms listed below, provide comprehensive information in JSON format with these keys:
+
+{ENRICHMENT_KEYS_SPEC}
+OUTPUT FORMAT (JSON ONLY):
+A JSON array with exactly one object per term, in the same order as the list. Each object
+repeats the term in a "term" key, followed by the required keys:
+[
+    {{"term": "...", "explanation": "...", "urdu_meaning": "...", "term_type": "...", "example_sentence": "...", "properties": {{ ... }}}},
+    ...
+]
+
+EXAMPLE ELEMENT FOR "COVALENT BOND" (with "term": "covalent bond" added):
+{COVALENT_BOND_EXAMPLE}
+
+TERMS:
+{term_list}
+"""
+
+    label = f"batch of {len(terms)} terms ({terms[0]}...)"
+    max_tokens = min(MODEL_MAX_OUTPUT_TOKENS, BATCH_TOKENS_PER_TERM * len(terms))
+    completion = request_completion(router, prompt, max_tokens, label, attempt)
+    if completion is None:
+        return {}
+    raw_output = completion.text
+
+    elements = parse_json(raw_output, '[')
+    if not isinstance(elements, list):
+        print(f"[WARN] JSON array not found for {label}. Full response:\n{raw_output[:500]}...")
+        completion.mark_parse_failure()
+        return {}
+
+    wanted = {term.lower(): term for term in terms}
+    # Fall back to list position when the model leaves out the "term" keys
+    positional = len(elements) == len(terms)
+    matched = {}
+    for position, element in enumerate(elements):
+        if not isinstance(element, dict):
+            continue
+        element = dict(element)
+        key = str(element.pop('term', '')).strip().lower()
+        if key not in wanted and positional:
+            key = terms[position].lower()
+        if key in wanted and key not in matched:
+            matched[key] = element
+
+    # Terms without an element count as parse failures of this request; partial elements are repaired
+    completion.mark_parse_failure(len(wanted) - len(matched))
+    enrichments = {}
+    for key, element in matched.items():
+        enrichment = validate_enrichment(router, wanted[key], element, completion, attempt)
+        if enrichment:
+            enrichments[key] = enrichment
+    if enrichments:
+        completion.remember()
+    return enrichments
+
+def enrich_terms(router: BackendRouter, terms: List[str], max_attempts: int = 3) -> List[Optional[dict]]:
+    """
+    Enriches a group of terms with batched requests, re-asking only for the terms
+    whose elements were missing or invalid. Returns enrichments aligned with `terms`.
+    """
+    results: Dict[str, dict] = {}
+    pending = list(dict.fromkeys(terms))
+    for attempt in range(max_attempts):
+        if len(pending) == 1:
+            enrichment = get_term_enrichment(router, pending[0], attempt)
+            if enrichment:
+                results[pending[0].lower()] = enrichment
+        else:
+            results.update(get_batch_enrichment(router, pending, attempt))
+
+        pending = [term for term in pending if term.lower() not in results]
+        if not pending:
+            break
+        if attempt < max_attempts - 1:
+            print(f"  🔁 Retrying {len(pending)} term(s): {', '.join(pending)}")
+    return [results.get(term.lower()) for term in terms]
+
+def enrich_concurrently(router: BackendRouter, jobs: List[Tuple[str, str]], concurrency: int,
+                        on_result: Optional[Callable[[int, Optional[dict]], None]] = None,
+                        batch_size: int = 1) -> List[Optional[dict]]:
+    """
+    Enriches (topic_id, term) jobs with at most `concurrency` requests in flight,
+    `batch_size` terms per request.
+    Returns enrichments aligned with `jobs`, so callers keep the input order per topic.
+    `on_result(index, enrichment)` is called in job order as soon as each prefix completes.
+    """
+    results: List[Optional[dict]] = [None] * len(jobs)
+    completed = set()
+    next_index = 0
+    done = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {}
+        for start in range(0, len(jobs), batch_size):
+            indexes = list(range(start, min(start + batch_size, len(jobs))))
+            terms = [jobs[index][1] for index in indexes]
+            # Single-term requests keep their one-shot behaviour; batches retry failed terms
+            max_attempts = 3 if batch_size > 1 else 1
+            futures[executor.submit(enrich_terms, router, terms, max_attempts)] = indexes
+
+        for future in as_completed(futures):
+            indexes = futures[future]
+            try:
+                for index, enrichment in zip(indexes, future.result()):
+                    results[index] = enrichment
+            except Exception as e:
+                print(f"Unexpected error for {', '.join(jobs[index][1] for index in indexes)}: {e}")
+
+            for index in indexes:
+                done += 1
+                topic_id, term = jobs[index]
+                status = "✅" if results[index] else "❌"
+                print(f"  {status} [{done}/{len(jobs)}] Topic {topic_id}: {term}")
+
+            completed.update(indexes)
+            while next_index in completed:
+                if on_result:
+                    on_result(next_index, results[next_index])
+                next_index += 1
+    return results
+
+def load_checkpoint(output_path: str) -> List[Dict]:
+    """
+    Reads rows already written to output_path by an earlier, possibly interrupted, run.
+    A last line left half-written by a crash is cut off so appending resumes cleanly.
+    """
+    if not os.path.exists(output_path):
+        return []
+
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+            print(f"⚠️ Dropped a partially written row at the end of {output_path}")
+
+    with open(output_path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+class CsvCheckpointWriter:
+    """Writes enriched terms to CSV with a single JSON column, flushing every row"""
 
     fieldnames = ['term', 'topic_id', 'enrichment_data']
 
-    try:
-        with open(output_path, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for row in results:
-                # Convert enrichment data to JSON string
-                writer.writerow({
-                    'term': row['term'],
-                    'topic_id': row['topic_id'],
-                    'enrichment_data': json.dumps(row['enrichment_data'], ensure_ascii=False)
-                })
+    def __init__(self, output_path: str, append: bool = False):
+        has_header = append and os.path.exists(output_path) and os.path.getsize(output_path) > 0
+        self.file = open(output_path, 'a' if append else 'w', encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
+        self.count = 0
+        if not has_header:
+            self.writer.writeheader()
+            self.file.flush()
+
+    def write(self, row: Dict):
+        # Convert enrichment data to JSON string
+        self.writer.writerow({
+            'term': row['term'],
+            'topic_id': row['topic_id'],
+            'enrichment_data': json.dumps(row['enrichment_data'], ensure_ascii=False)
+        })
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+def normalize_term(term: str) -> str:
+    """Key under which spellings of the same term are enriched once ('Covalent  Bond' == 'covalent bond')"""
+    return ' '.join(term.lower().split())
+
+class TermFanOut:
+    """
+    Enriches each distinct normalised term once and emits a row for every topic it
+    appears in. Rows are released in input order (topic by topic, term by term) as
+    soon as every term before them is resolved, so the output stays grouped per
+    topic while still being written incrementally.
+    """
 
-        print(f"✅ Saved {len(results)} enriched terms to {output_path}")
-    except IOError as e:
-        print(f"Error writing to CSV: {e}")
+    def __init__(self, terms_by_topic: Dict[str, List[str]], writer: CsvCheckpointWriter,
+                 existing_rows: Optional[List[Dict]] = None):
+        self.writer = writer
+        self.occurrences: List[Tuple[str, str, str]] = []
+        first_seen: Dict[str, Tuple[str, str]] = {}
+        for topic_id, terms in terms_by_topic.items():
+            for term in terms:
+                key = normalize_term(term)
+                self.occurrences.append((topic_id, term, key))
+                first_seen.setdefault(key, (topic_id, term))
+
+        # Rows from an earlier run: their enrichments are reused for the remaining topics
+        self.resolved: Dict[str, Optional[dict]] = {}
+        self.written = set()
+        for row in existing_rows or []:
+            key = normalize_term(row['term'])
+            self.written.add((row['topic_id'], key))
+            if key not in self.resolved:
+                try:
+                    self.resolved[key] = json.loads(row['enrichment_data'])
+                except (TypeError, json.JSONDecodeError):
+                    pass
+
+        self.jobs: List[Tuple[str, str]] = [first_seen[key] for key in first_seen if key not in self.resolved]
+        self.reused = len(first_seen) - len(self.jobs)
+        self.cursor = 0
+
+    def limit(self, max_terms: int):
+        """Only enrich the first max_terms outstanding terms (0 for all)"""
+        if max_terms > 0:
+            self.jobs = self.jobs[:max_terms]
+
+    def resolve(self, job_index: int, enrichment: Optional[dict]):
+        """Record a job's enrichment (None if it failed) and write every row that is now ready"""
+        topic_id, term = self.jobs[job_index]
+        self.resolved[normalize_term(term)] = enrichment
+        self._flush()
+
+    def finish(self):
+        """Treat jobs that never ran as failed and write the remaining rows"""
+        for _, term in self.jobs:
+            self.resolved.setdefault(normalize_term(term), None)
+        self._flush()
+
+    def _flush(self):
+        scheduled = {normalize_term(term) for _, term in self.jobs}
+        while self.cursor < len(self.occurrences):
+            topic_id, term, key = self.occurrences[self.cursor]
+            if key in scheduled and key not in self.resolved:
+                break
+            enrichment = self.resolved.get(key)
+            if enrichment and (topic_id, key) not in self.written:
+                self.writer.write({
+                    'term': term,
+                    'topic_id': topic_id,
+                    'enrichment_data': enrichment
+                })
+                self.written.add((topic_id, key))
+            self.cursor += 1
 
 def main():
     parser = argparse.ArgumentParser(
-        description='Enriches extracted chemistry terms with DeepSeek API and saves to CSV with JSON data'
+        description='Enriches extracted chemistry terms with an LLM (DeepSeek or Ollama) and saves to CSV with JSON data'
     )
     parser.add_argument('input_file', help='Path to the extracted terms file')
     parser.add_argument(
@@ -194,16 +557,50 @@ def main():
     )
     parser.add_argument(
     '--skip-existing', action='store_true',
-    help='Skip terms already present in the output CSV'
+    help='Reuse terms already present in the output CSV instead of enriching them again'
     )
-
+    parser.add_argument(
+        '--resume', action='store_true',
+        help='Append to the output CSV, skipping terms it already holds (e.g. after an interrupted run)'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=1,
+        help='Parallel API requests; with this or --batch-size above 1, --delay is replaced by --rpm/--tpm limits (default: 1)'
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=1,
+        help=f'Terms per request; above 1, each request asks for a JSON array and failed terms are retried '
+             f'(max {MAX_BATCH_SIZE}, default: 1)'
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='Always call the API instead of reusing cached responses'
+    )
+    parser.add_argument(
+        '--rpm', type=float, default=0,
+        help='Requests per minute limit (0 for none)'
+    )
+    parser.add_argument(
+        '--tpm', type=float, default=0,
+        help='Estimated tokens per minute limit, prompt plus max completion (0 for none)'
+    )
+    add_backend_arguments(parser)
+    add_telemetry_arguments(parser, 'enrich')
 
     args = parser.parse_args()
+    if args.no_cache:
+        disable_cache()
+    if args.batch_size > MAX_BATCH_SIZE:
+        print(f"⚠️ --batch-size {args.batch_size} exceeds the model's output limit; using {MAX_BATCH_SIZE}")
+        args.batch_size = MAX_BATCH_SIZE
 
     # Get API key
     api_key = args.apikey or os.getenv("DEEPSEEK_API_KEY")
-    if not api_key:
-        print("Error: API key required. Use --apikey or set DEEPSEEK_API_KEY environment variable.")
+    limiter = RateLimiter(args.rpm or None, args.tpm or None) if (args.rpm or args.tpm) else None
+    try:
+        router = build_router(args, api_key, limiter)
+    except ValueError as e:
+        print(f"Error: {e}")
         return
 
     # Parse input file
@@ -213,61 +610,80 @@ def main():
         return
 
     # Process terms
-    enriched_terms = []
-    seen_terms = set()
-    if args.skip_existing and os.path.exists(args.output):
+    append = args.resume or args.skip_existing
+    existing_rows = []
+    if append:
         try:
-            with open(args.output, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    seen_terms.add(row['term'].lower())
-            print(f"🔁 Skipping {len(seen_terms)} terms already in {args.output}")
+            existing_rows = load_checkpoint(args.output)
         except Exception as e:
             print(f"⚠️ Failed to read existing output CSV: {e}")
 
-    term_count = 0
-
-    for topic_id, terms in terms_by_topic.items():
-        print(f"\n📚 Processing Topic {topic_id} ({len(terms)} terms)")
-
-        for term in terms:
-            # Skip duplicates
-            term_lower = term.lower()
-            if term_lower in seen_terms:
-                continue
-
-            # Limit processing if requested
-            if args.max_terms > 0 and term_count >= args.max_terms:
-                print(f"Reached maximum term limit ({args.max_terms})")
-                break
+    try:
+        writer = CsvCheckpointWriter(args.output, append=append)
+    except IOError as e:
+        print(f"Error writing to CSV: {e}")
+        return
 
-            print(f"  🔍 Enriching: {term}")
-            enrichment = get_term_enrichment(api_key, term)
-            time.sleep(args.delay)
+    fan_out = TermFanOut(terms_by_topic, writer, existing_rows)
+    if fan_out.reused:
+        print(f"🔁 Reusing {fan_out.reused} terms already enriched in {args.output}")
+    print(f"🔀 {len(fan_out.occurrences)} term occurrences, {len(fan_out.jobs)} distinct terms to enrich")
 
-            if enrichment:
-                enriched_terms.append({
-                    'term': term,
-                    'topic_id': topic_id,
-                    'enrichment_data': enrichment
-                })
-                seen_terms.add(term_lower)
-                term_count += 1
-                print(f"    ✅ Enriched")
-            else:
-                print(f"    ❌ Failed to enrich")
+    term_count = 0
 
-        if args.max_terms > 0 and term_count >= args.max_terms:
-            break
+    if args.concurrency > 1 or args.batch_size > 1:
+        fan_out.limit(args.max_terms)
+        jobs = fan_out.jobs
 
-    # Save results
-    save_to_csv(enriched_terms, args.output)
+        print(f"\n🚀 Enriching {len(jobs)} terms with {args.concurrency} parallel requests, "
+              f"{args.batch_size} term(s) per request")
+        try:
+            enrichments = enrich_concurrently(router, jobs, max(1, args.concurrency),
+                                              on_result=fan_out.resolve, batch_size=max(1, args.batch_size))
+            term_count = sum(1 for enrichment in enrichments if enrichment)
+        finally:
+            fan_out.finish()
+            writer.close()
+    else:
+        current_topic = None
+        try:
+            for index, (topic_id, term) in enumerate(fan_out.jobs):
+                # Limit processing if requested
+                if args.max_terms > 0 and term_count >= args.max_terms:
+                    print(f"Reached maximum term limit ({args.max_terms})")
+                    break
+
+                if topic_id != current_topic:
+                    current_topic = topic_id
+                    print(f"\n📚 Processing Topic {topic_id} ({len(terms_by_topic[topic_id])} terms)")
+
+                print(f"  🔍 Enriching: {term}")
+                requests_before = router.backend_requests
+                enrichment = get_term_enrichment(router, term)
+                # Cache hits never reach the API, so they need no pacing
+                if not limiter and router.backend_requests > requests_before:
+                    time.sleep(args.delay)
+
+                fan_out.resolve(index, enrichment)
+                if enrichment:
+                    term_count += 1
+                    print(f"    ✅ Enriched")
+                else:
+                    print(f"    ❌ Failed to enrich")
+        finally:
+            fan_out.finish()
+            writer.close()
+
+    print(f"✅ Saved {writer.count} topic rows to {args.output}")
 
     # Print summary
     print("\n" + "=" * 50)
-    print(f"Total terms processed: {term_count}")
-    print(f"Unique terms enriched: {len(enriched_terms)}")
+    print(f"Unique terms enriched: {term_count}")
+    print(f"Topic rows written: {writer.count}")
     print(f"Output saved to: {args.output}")
+    print(router.summary())
+    print_cache_stats()
+    finish_telemetry(args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,469 @@
+"""
+Pluggable LLM backends with health-based routing.
+
+Each backend speaks one wire protocol (a DeepSeek/OpenAI-compatible chat API,
+or Ollama's /api/generate), owns a pooled HTTP session, caps its in-flight
+requests with a semaphore and keeps a rolling window of latencies and errors.
+A BackendRouter sends each prompt to the first healthy backend; a backend whose
+p95 latency or error rate crosses the configured threshold is moved behind the
+others until its cooldown expires, a failed call fails over to the next backend,
+and with hedging enabled a second backend is raced against a slow first one.
+Responses go through the shared LLM cache (see llm_cache.py), and every
+completion is recorded in the run's telemetry (see llm_telemetry.py).
+
+Endpoints are plain URLs, so every tool can be pointed at a local stub server
+(tools/llm_stub_server.py) with --deepseek-url / --ollama-host.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm_cache import LLMCache, get_cache
+from llm_telemetry import LLMTelemetry, get_telemetry
+from rate_limit import RateLimiter, estimate_tokens
+
+DEEPSEEK_API_URL = os.getenv('DEEPSEEK_API_URL', "https://api.deepseek.com/v1/chat/completions")
+DEEPSEEK_MODEL = "deepseek-reasoner"
+OLLAMA_HOST = os.getenv('OLLAMA_HOST', "http://localhost:11434")
+OLLAMA_MODEL = "llama3.2:latest"
+
+
+class BackendError(Exception):
+    """Raised when a backend (or every backend of a router) fails to produce a completion"""
+
+
+class Completion:
+    """Text returned by a backend, plus what is needed to cache it once it proves usable"""
+
+    def __init__(self, text: str, backend: str, raw_response: str, latency: float, cached: bool,
+                 remember: Callable[[], None], usage=(0, 0)):
+        self.text = text
+        self.backend = backend
+        self.raw_response = raw_response
+        self.latency = latency
+        self.cached = cached
+        self.prompt_tokens, self.completion_tokens = usage
+        self.trace: Optional[Dict[str, Any]] = None
+        self._remember = remember
+
+    def remember(self):
+        """Store the raw response in the LLM cache (no-op for cache hits)"""
+        self._remember()
+
+    def mark_parse_failure(self, count: int = 1):
+        """Record that the caller could not parse (part of) the text"""
+        if self.trace is not None:
+            self.trace['parse_failures'] += count
+
+    def mark_schema_repair(self, count: int = 1):
+        """Record that parsed output failed schema validation and needed a repair request"""
+        if self.trace is not None:
+            self.trace['schema_repairs'] += count
+
+
+class LLMBackend(ABC):
+    """Base class: subclasses build the payload and extract the text for their protocol"""
+
+    name = "backend"
+
+    def __init__(self, endpoint: str, model: str, max_concurrency: int = 4,
+                 limiter: Optional[RateLimiter] = None, window: int = 50):
+        self.endpoint = endpoint
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.degraded_since: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"{self.name}({self.model} @ {self.endpoint})"
+
+    # --- Protocol specifics ---
+
+    def headers(self) -> Dict[str, str]:
+        return {"Content-Type": "application/json"}
+
+    @abstractmethod
+    def build_payload(self, prompt: str, system: Optional[str], temperature: float, max_tokens: int) -> Dict[str, Any]:
+        """Request body for the protocol"""
+
+    @abstractmethod
+    def cache_key(self, payload: Dict[str, Any]) -> str:
+        """LLM cache key for a request body"""
+
+    @abstractmethod
+    def extract_text(self, content: Dict[str, Any]) -> Optional[str]:
+        """Completion text of a decoded response, or None if it has none"""
+
+    def extract_usage(self, content: Dict[str, Any]):
+        """(prompt tokens, completion tokens) reported by the response, if any"""
+        return 0, 0
+
+    # --- Calls ---
+
+    def request_cache_key(self, prompt: str, system: Optional[str] = None, temperature: float = 0.0,
+                          max_tokens: int = 1000, **_) -> str:
+        return self.cache_key(self.build_payload(prompt, system, temperature, max_tokens))
+
+    def completion_from_cache(self, raw_response: str) -> Optional[Completion]:
+        """A Completion for a cached raw response, or None if it holds no usable text"""
+        try:
+            content = json.loads(raw_response)
+            text = self.extract_text(content)
+            usage = self.extract_usage(content)
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            text = None
+        if text is None:
+            return None
+        return Completion(text, self.name, raw_response, 0.0, True, lambda: None, usage)
+
+    def fetch(self, prompt: str, system: Optional[str] = None, temperature: float = 0.0,
+              max_tokens: int = 1000, timeout: float = 60) -> Completion:
+        """Send the request (bypassing the cache lookup); raises BackendError on any failure"""
+        payload = self.build_payload(prompt, system, temperature, max_tokens)
+        with self._slots:
+            if self.limiter:
+                self.limiter.acquire(estimate_tokens(prompt + (system or '')) + max_tokens)
+            start = time.perf_counter()
+            try:
+                response = self.session.post(self.endpoint, headers=self.headers(), json=payload, timeout=timeout)
+                response.raise_for_status()
+                raw_response = response.text
+                content = json.loads(raw_response)
+                text = self.extract_text(content)
+                usage = self.extract_usage(content)
+                if text is None:
+                    raise BackendError(f"{self.name}: no completion in response")
+            except (requests.exceptions.RequestException, ValueError, KeyError, IndexError, TypeError,
+                    AttributeError) as e:
+                self.record(time.perf_counter() - start, ok=False)
+                raise BackendError(f"{self.name}: {e}") from e
+            except BackendError:
+                self.record(time.perf_counter() - start, ok=False)
+                raise
+            latency = time.perf_counter() - start
+            self.record(latency, ok=True)
+
+        key = self.cache_key(payload)
+
+        def remember():
+            cache = get_cache()
+            if cache:
+                cache.put(key, self.endpoint, self.model, raw_response)
+
+        return Completion(text, self.name, raw_response, latency, False, remember, usage)
+
+    # --- Health ---
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._samples.append((latency, ok))
+
+    def reset_health(self):
+        with self._lock:
+            self._samples.clear()
+        self.degraded_since = None
+
+    def health(self):
+        """(sample count, p95 latency in seconds, error rate) over the rolling window"""
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return 0, 0.0, 0.0
+        latencies = sorted(latency for latency, ok in samples if ok) or [0.0]
+        p95 = latencies[max(0, math.ceil(0.95 * len(latencies)) - 1)]
+        error_rate = sum(1 for _, ok in samples if not ok) / len(samples)
+        return len(samples), p95, error_rate
+
+
+class DeepSeekChatBackend(LLMBackend):
+    """DeepSeek / OpenAI-compatible /chat/completions"""
+
+    name = "deepseek"
+
+    def __init__(self, api_key: str, endpoint: str = DEEPSEEK_API_URL, model: str = DEEPSEEK_MODEL, **kwargs):
+        super().__init__(endpoint, model, **kwargs)
+        self.api_key = api_key
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(self, prompt, system, temperature, max_tokens):
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+
+    def cache_key(self, payload):
+        return LLMCache.make_key(self.endpoint, payload['model'], payload['messages'],
+                                 {'temperature': payload['temperature'], 'max_tokens': payload['max_tokens']})
+
+    def extract_text(self, content):
+        if 'choices' in content and content['choices']:
+            return content['choices'][0]['message']['content'].strip()
+        return None
+
+    def extract_usage(self, content):
+        # Reasoning tokens are already included in completion_tokens
+        usage = content.get('usage') or {}
+        return usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0)
+
+
+class OllamaGenerateBackend(LLMBackend):
+    """Ollama /api/generate (non-streaming)"""
+
+    name = "ollama"
+
+    def __init__(self, host: str = OLLAMA_HOST, model: str = OLLAMA_MODEL, **kwargs):
+        super().__init__(f"{host.rstrip('/')}/api/generate", model, **kwargs)
+
+    def build_payload(self, prompt, system, temperature, max_tokens):
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+        if system:
+            payload["system"] = system
+        return payload
+
+    def cache_key(self, payload):
+        prompt = [payload['system'], payload['prompt']] if 'system' in payload else payload['prompt']
+        return LLMCache.make_key(self.endpoint, payload['model'], prompt, payload['options'])
+
+    def extract_text(self, content):
+        text = content.get('response')
+        return text.strip() if text else None
+
+    def extract_usage(self, content):
+        return content.get('prompt_eval_count', 0), content.get('eval_count', 0)
+
+
+class BackendRouter:
+    """
+    Routes completions over an ordered list of backends.
+
+    A backend with at least `min_samples` recent calls is degraded when its p95
+    latency exceeds `p95_threshold` seconds or its error rate exceeds
+    `error_rate_threshold`; degraded backends are tried after the healthy ones and
+    get a fresh window after `cooldown` seconds. With `hedge_after` set, a request
+    still pending after that many seconds is also sent to the next backend and the
+    first success wins. Each completion is recorded in `telemetry`.
+    """
+
+    def __init__(self, backends: List[LLMBackend], p95_threshold: Optional[float] = None,
+                 error_rate_threshold: float = 0.5, hedge_after: Optional[float] = None,
+                 min_samples: int = 5, cooldown: float = 60.0, telemetry: Optional[LLMTelemetry] = None):
+        if not backends:
+            raise ValueError("BackendRouter needs at least one backend")
+        self.backends = backends
+        self.p95_threshold = p95_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.hedge_after = hedge_after
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.telemetry = telemetry or get_telemetry()
+        self.failovers = 0
+        self.hedges = 0
+        # Requests actually sent to a backend (cache hits excluded), e.g. for pacing callers
+        self.backend_requests = 0
+        self._state_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=sum(b.max_concurrency for b in backends) + len(backends),
+                                            thread_name_prefix='llm-hedge') if hedge_after is not None else None
+
+    def is_degraded(self, backend: LLMBackend) -> bool:
+        samples, p95, error_rate = backend.health()
+        degraded = samples >= self.min_samples and (
+            (self.p95_threshold is not None and p95 > self.p95_threshold)
+            or error_rate > self.error_rate_threshold
+        )
+        with self._state_lock:
+            if not degraded:
+                backend.degraded_since = None
+                return False
+            if backend.degraded_since is None:
+                backend.degraded_since = time.monotonic()
+                print(f"⚠️ {backend.name} degraded (p95 {p95:.1f}s, {error_rate:.0%} errors over {samples} calls); "
+                      f"routing to the next backend")
+                return True
+            if time.monotonic() - backend.degraded_since > self.cooldown:
+                # Half-open: give it a clean window and let traffic probe it again
+                backend.reset_health()
+                return False
+            return True
+
+    def ordered_backends(self) -> List[LLMBackend]:
+        healthy = [b for b in self.backends if not self.is_degraded(b)]
+        return healthy + [b for b in self.backends if b not in healthy]
+
+    def complete(self, prompt: str, system: Optional[str] = None, temperature: float = 0.0,
+                 max_tokens: int = 1000, timeout: float = 60, label: str = '', attempt: int = 0) -> Completion:
+        """
+        Returns the first successful completion, raising BackendError when every
+        backend failed. `label` and `attempt` (the caller's retry number) go into telemetry.
+        """
+        request = dict(prompt=prompt, system=system, temperature=temperature, max_tokens=max_tokens, timeout=timeout)
+        start = time.perf_counter()
+        cache = get_cache()
+        if cache:
+            found = cache.get_first([backend.request_cache_key(**request) for backend in self.backends])
+            if found:
+                position, raw_response = found
+                completion = self.backends[position].completion_from_cache(raw_response)
+                if completion:
+                    return self._traced(completion, start, label, attempt, backend_requests=0)
+
+        ordered = self.ordered_backends()
+        tried = []
+        errors = []
+        backend_requests = 0
+        for backend in ordered:
+            if backend in tried:
+                continue
+            hedge = None
+            if self._executor:
+                hedge = next((b for b in ordered if b is not backend and b not in tried), None)
+            tried += [backend] + ([hedge] if hedge else [])
+            launched = [0]
+            try:
+                completion = self._attempt(backend, hedge, request, launched)
+                return self._traced(completion, start, label, attempt, backend_requests + launched[0])
+            except BackendError as e:
+                backend_requests += launched[0]
+                errors.append(str(e))
+                remaining = [b for b in ordered if b not in tried]
+                if remaining:
+                    with self._state_lock:
+                        self.failovers += 1
+                    print(f"⚠️ {e}; failing over to {remaining[0].name}")
+
+        with self._state_lock:
+            self.backend_requests += backend_requests
+        self.telemetry.record(label=label, attempt=attempt, ok=False, backend_requests=backend_requests,
+                              latency_s=round(time.perf_counter() - start, 3), error="; ".join(errors))
+        raise BackendError("; ".join(errors))
+
+    def _traced(self, completion: Completion, start: float, label: str, attempt: int,
+                backend_requests: int) -> Completion:
+        backend = next(b for b in self.backends if b.name == completion.backend)
+        with self._state_lock:
+            self.backend_requests += backend_requests
+        completion.trace = self.telemetry.record(
+            label=label,
+            backend=completion.backend,
+            model=backend.model,
+            cached=completion.cached,
+            prompt_tokens=completion.prompt_tokens,
+            completion_tokens=completion.completion_tokens,
+            latency_s=round(time.perf_counter() - start, 3),
+            attempt=attempt,
+            backend_requests=backend_requests,
+            response_bytes=len(completion.raw_response.encode('utf-8')),
+        )
+        return completion
+
+    def _attempt(self, backend: LLMBackend, hedge: Optional[LLMBackend], request: Dict[str, Any],
+                 launched: List[int]) -> Completion:
+        """Runs the request on `backend` (raced against `hedge` when slow); counts requests in launched[0]"""
+        launched[0] += 1
+        if hedge is None:
+            return backend.fetch(**request)
+
+        futures = [self._executor.submit(backend.fetch, **request)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            with self._state_lock:
+                self.hedges += 1
+            launched[0] += 1
+            futures.append(self._executor.submit(hedge.fetch, **request))
+
+        errors = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except BackendError as e:
+                    errors.append(str(e))
+            if not pending and len(futures) == 1:
+                # The first backend failed before the hedge delay; go straight to the second
+                launched[0] += 1
+                futures.append(self._executor.submit(hedge.fetch, **request))
+                pending = {futures[-1]}
+        raise BackendError("; ".join(errors))
+
+    def summary(self) -> str:
+        parts = []
+        for backend in self.backends:
+            samples, p95, error_rate = backend.health()
+            parts.append(f"{backend.name}: {samples} calls, p95 {p95:.1f}s, {error_rate:.0%} errors")
+        return f"LLM backends: {'; '.join(parts)}; {self.failovers} failovers, {self.hedges} hedged"
+
+
+def add_backend_arguments(parser, default_backend: str = 'deepseek'):
+    """Adds the shared backend / routing options to a tool's argument parser"""
+    parser.add_argument('--backend', choices=['deepseek', 'ollama'], default=default_backend,
+                        help=f'Primary LLM backend (default: {default_backend})')
+    parser.add_argument('--fallback', choices=['deepseek', 'ollama'],
+                        help='Second backend for failover and hedging')
+    parser.add_argument('--deepseek-url', default=DEEPSEEK_API_URL,
+                        help='DeepSeek-compatible chat completions URL (env DEEPSEEK_API_URL)')
+    parser.add_argument('--deepseek-model', default=DEEPSEEK_MODEL, help=f'DeepSeek model (default: {DEEPSEEK_MODEL})')
+    parser.add_argument('--deepseek-concurrency', type=int, default=8,
+                        help='Max in-flight DeepSeek requests (default: 8)')
+    parser.add_argument('--ollama-host', default=OLLAMA_HOST, help='Ollama host URL (env OLLAMA_HOST)')
+    parser.add_argument('--ollama-model', default=OLLAMA_MODEL, help=f'Ollama model (default: {OLLAMA_MODEL})')
+    parser.add_argument('--ollama-concurrency', type=int, default=1,
+                        help='Max in-flight Ollama requests (default: 1)')
+    parser.add_argument('--p95-threshold', type=float, default=None,
+                        help='Route away from a backend whose p95 latency exceeds this many seconds')
+    parser.add_argument('--error-threshold', type=float, default=0.5,
+                        help='Route away from a backend whose recent error rate exceeds this fraction (default: 0.5)')
+    parser.add_argument('--hedge-after', type=float, default=None,
+                        help='Also send a request to the fallback if the primary has not answered after this many seconds')
+
+
+def build_router(args, api_key: Optional[str] = None, limiter: Optional[RateLimiter] = None) -> BackendRouter:
+    """Creates the router described by add_backend_arguments options; `limiter` applies to DeepSeek"""
+    def make(kind: str) -> LLMBackend:
+        if kind == 'deepseek':
+            if not api_key:
+                raise ValueError("The deepseek backend needs an API key (--apikey or DEEPSEEK_API_KEY)")
+            return DeepSeekChatBackend(api_key, endpoint=args.deepseek_url, model=args.deepseek_model,
+                                       max_concurrency=args.deepseek_concurrency, limiter=limiter)
+        return OllamaGenerateBackend(host=args.ollama_host, model=args.ollama_model,
+                                     max_concurrency=args.ollama_concurrency)
+
+    backends = [make(args.backend)]
+    if args.fallback and args.fallback != args.backend:
+        backends.append(make(args.fallback))
+    return BackendRouter(backends, p95_threshold=args.p95_threshold,
+                         error_rate_threshold=args.error_threshold, hedge_after=args.hedge_after)
@@ -0,0 +1,162 @@
+"""
+Content-addressed cache for LLM API responses.
+
+Responses are stored in a local SQLite file keyed by the SHA-256 of
+(endpoint, model, prompt, parameters), so rerunning wordex, enrich or simpex on
+the same input is served from disk instead of being paid for again. Raw response
+bodies are kept with their creation and last-access times; entries older than
+the maximum age are dropped, and once the file holds more than the size limit
+the least recently used entries go first. Eviction runs when the cache is
+opened and again every few hundred writes, so long runs stay within the limits.
+
+Configuration (environment):
+    LLM_CACHE_PATH          SQLite file (default: .llm_cache.sqlite3 next to this module)
+    LLM_CACHE_MAX_AGE_DAYS  Maximum entry age (default: 30, 0 for no limit)
+    LLM_CACHE_MAX_MB        Maximum total response size (default: 256, 0 for no limit)
+    LLM_CACHE_EVICT_EVERY   Writes between evictions (default: 500, 0 to evict only on open)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.llm_cache.sqlite3'))
+CACHE_MAX_AGE_SECONDS = float(os.getenv('LLM_CACHE_MAX_AGE_DAYS', '30')) * 24 * 60 * 60
+CACHE_MAX_BYTES = int(float(os.getenv('LLM_CACHE_MAX_MB', '256')) * 1024 * 1024)
+CACHE_EVICT_EVERY = int(os.getenv('LLM_CACHE_EVICT_EVERY', '500'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    model TEXT,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at);
+"""
+
+
+class LLMCache:
+    """SQLite-backed response store, safe to share between threads"""
+
+    def __init__(self, path: str = CACHE_PATH, max_age_seconds: float = CACHE_MAX_AGE_SECONDS,
+                 max_bytes: int = CACHE_MAX_BYTES, evict_every: int = CACHE_EVICT_EVERY):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self.evicted = self.evict()
+
+    @staticmethod
+    def make_key(endpoint: str, model: Optional[str], prompt: Any, params: Optional[Dict[str, Any]] = None) -> str:
+        """Stable hash of everything that determines the response"""
+        material = json.dumps([endpoint, model, prompt, params or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Raw response for `key`, or None on a miss (expired entries count as misses)"""
+        found = self.get_first([key])
+        return found[1] if found else None
+
+    def get_first(self, keys: List[str]) -> Optional[Tuple[int, str]]:
+        """(position, raw response) of the first of `keys` that is cached; one lookup for the stats"""
+        now = time.time()
+        with self._lock:
+            for position, key in enumerate(keys):
+                row = self._conn.execute('SELECT response, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+                if row and (not self.max_age_seconds or now - row[1] <= self.max_age_seconds):
+                    self._conn.execute('UPDATE responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?', (now, key))
+                    self._conn.commit()
+                    self.hits += 1
+                    return position, row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, endpoint: str, model: Optional[str], response: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, endpoint, model, response, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, endpoint, model, response, len(response.encode('utf-8')), now, now)
+            )
+            self._conn.commit()
+            self.writes += 1
+            evict_due = self.evict_every > 0 and self.writes % self.evict_every == 0
+        if evict_due:
+            removed = self.evict()
+            with self._lock:
+                self.evicted += removed
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones beyond max_bytes. Returns the number removed."""
+        removed = 0
+        with self._lock:
+            if self.max_age_seconds:
+                removed += self._conn.execute('DELETE FROM responses WHERE created_at < ?',
+                                              (time.time() - self.max_age_seconds,)).rowcount
+            if self.max_bytes:
+                total = 0
+                stale = []
+                for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at DESC'):
+                    total += size
+                    if total > self.max_bytes:
+                        stale.append((key,))
+                self._conn.executemany('DELETE FROM responses WHERE key = ?', stale)
+                removed += len(stale)
+            self._conn.commit()
+        return removed
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = f"{self.hits / lookups:.0%}" if lookups else "n/a"
+        with self._lock:
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return (f"LLM cache: {self.hits} hits, {self.misses} misses ({hit_rate} hit rate), {self.writes} writes, "
+                f"{self.evicted} evicted; {entries} entries / {size / 1024 / 1024:.1f} MB in {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[LLMCache] = None
+_cache_disabled = False
+_default_lock = threading.Lock()
+
+
+def get_cache() -> Optional[LLMCache]:
+    """The process-wide cache, opened on first use; None when caching is disabled"""
+    global _default_cache
+    if _cache_disabled:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+    return _default_cache
+
+
+def disable_cache():
+    """Turn caching off for this process (e.g. for a --no-cache run)"""
+    global _cache_disabled
+    _cache_disabled = True
+
+
+def print_cache_stats():
+    if _default_cache is not None:
+        print(f"🗄️  {_default_cache.summary()}")
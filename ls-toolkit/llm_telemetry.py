@@ -0,0 +1,144 @@
+"""
+Per-call telemetry for LLM requests.
+
+Every completion made through a BackendRouter is recorded: backend and model,
+prompt/completion tokens (from the response's `usage`, or Ollama's eval counts),
+latency, retries (caller re-asks plus backend failovers/hedges), JSON-parse
+failures and schema repairs reported by the caller, response size and whether
+it came from the cache. At the end of a run the tools print a summary table per backend and
+append the raw records to a JSONL trace, so batch sizes, concurrency and prompts
+can be tuned from data.
+"""
+
+import json
+import math
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class LLMTelemetry:
+    """Thread-safe collector of call records for one run"""
+
+    def __init__(self, tool: str = ''):
+        self.tool = tool
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def record(self, **fields) -> Dict[str, Any]:
+        """Append a call record; the returned dict may still be updated (e.g. parse failures)"""
+        record = {
+            'ts': round(time.time(), 3),
+            'label': '',
+            'backend': None,
+            'model': None,
+            'ok': True,
+            'cached': False,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'latency_s': 0.0,
+            'attempt': 0,
+            'backend_requests': 0,
+            'parse_failures': 0,
+            'schema_repairs': 0,
+            'response_bytes': 0,
+            'error': None,
+        }
+        record.update(fields)
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Aggregates per backend; cache hits get their own row since they cost nothing"""
+        with self._lock:
+            records = list(self.records)
+
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            name = 'cache' if record['cached'] else (record['backend'] or 'failed')
+            groups.setdefault(name, []).append(record)
+
+        rows = []
+        for name, group in groups.items():
+            latencies = [r['latency_s'] for r in group if r['ok']]
+            rows.append({
+                'backend': name,
+                'calls': len(group),
+                'errors': sum(1 for r in group if not r['ok']),
+                'retries': sum((1 if r['attempt'] else 0) + max(0, r['backend_requests'] - 1) for r in group),
+                'parse_failures': sum(r['parse_failures'] for r in group),
+                'schema_repairs': sum(r['schema_repairs'] for r in group),
+                'prompt_tokens': sum(r['prompt_tokens'] for r in group),
+                'completion_tokens': sum(r['completion_tokens'] for r in group),
+                'p50_s': _percentile(latencies, 0.5),
+                'p95_s': _percentile(latencies, 0.95),
+                'avg_kb': sum(r['response_bytes'] for r in group) / len(group) / 1024,
+            })
+        return rows
+
+    def print_summary(self):
+        rows = self.rows()
+        if not rows:
+            return
+        header = (f"{'backend':<10} {'calls':>6} {'errors':>6} {'retries':>7} {'parse!':>6} {'repair':>6} "
+                  f"{'prompt tok':>11} {'compl tok':>10} {'p50 s':>7} {'p95 s':>7} {'avg KB':>7}")
+        print("\n📊 LLM calls")
+        print(header)
+        print("-" * len(header))
+        for row in rows:
+            print(f"{row['backend']:<10} {row['calls']:>6} {row['errors']:>6} {row['retries']:>7} "
+                  f"{row['parse_failures']:>6} {row['schema_repairs']:>6} {row['prompt_tokens']:>11} {row['completion_tokens']:>10} "
+                  f"{row['p50_s']:>7.2f} {row['p95_s']:>7.2f} {row['avg_kb']:>7.1f}")
+
+    def write_trace(self, path: str):
+        """Append this run's records as JSON lines"""
+        with self._lock:
+            records = list(self.records)
+        if not records:
+            return
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(dict(record, tool=self.tool, run_id=self.run_id), ensure_ascii=False) + "\n")
+        print(f"🧾 Appended {len(records)} LLM call records to {path}")
+
+
+_default_telemetry: Optional[LLMTelemetry] = None
+_default_lock = threading.Lock()
+
+
+def get_telemetry() -> LLMTelemetry:
+    """The process-wide collector, created on first use"""
+    global _default_telemetry
+    with _default_lock:
+        if _default_telemetry is None:
+            _default_telemetry = LLMTelemetry()
+    return _default_telemetry
+
+
+def add_telemetry_arguments(parser, tool: str):
+    """Adds --trace (JSONL file appended at the end of the run; '' disables it)"""
+    parser.add_argument('--trace', default=f"llm_trace_{tool}.jsonl",
+                        help=f"JSONL file that receives one record per LLM call (default: llm_trace_{tool}.jsonl, '' to disable)")
+    parser.set_defaults(telemetry_tool=tool)
+
+
+def finish_telemetry(args):
+    """Print the summary table and append the trace configured by add_telemetry_arguments"""
+    telemetry = get_telemetry()
+    telemetry.tool = getattr(args, 'telemetry_tool', telemetry.tool)
+    telemetry.print_summary()
+    if getattr(args, 'trace', None):
+        try:
+            telemetry.write_trace(args.trace)
+        except IOError as e:
+            print(f"⚠️ Could not write LLM trace to {args.trace}: {e}")
@@ -73,6 +73,8 @@ CREATE TABLE Questions (
     -- Question content
     question_text TEXT NOT NULL,
     question_text_urdu TEXT, -- For bilingual support
+    content_hash CHAR(64) UNIQUE, -- sha256(topic + type + normalised text), natural key for re-imports
+    source_hash CHAR(64), -- sha256 of the source JSON question, unchanged rows are skipped on re-import
     marks INTEGER NOT NULL,
     estimated_time_minutes INTEGER,
 
@@ -146,7 +148,8 @@ CREATE TABLE Question_Answers (
     -- Alternative answers
     alternative_answers TEXT[], -- Other acceptable answers
 
-    created_at TIMESTAMP DEFAULT NOW()
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(question_fk) -- One answer per question, lets re-imports upsert
 );
 
 -- MCQ Options
@@ -294,6 +297,11 @@ BEFORE INSERT OR UPDATE OF topic_fk ON Key_Terms
 FOR EACH ROW
 EXECUTE FUNCTION update_key_term_metadata();
 
+-- Migration for databases created before content hashes (idempotent qbank re-imports)
+-- ALTER TABLE Questions ADD COLUMN IF NOT EXISTS content_hash CHAR(64) UNIQUE;
+-- ALTER TABLE Questions ADD COLUMN IF NOT EXISTS source_hash CHAR(64);
+-- ALTER TABLE Question_Answers ADD CONSTRAINT question_answers_question_fk_key UNIQUE (question_fk);
+
 -- Sample data insertion
 INSERT INTO Question_Types (type_code, type_name, is_exam_pattern, marks_range) VALUES
 ('MCQ', 'Multiple Choice', TRUE, '1'),
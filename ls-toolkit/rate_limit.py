@@ -0,0 +1,69 @@
+"""
+Token-bucket rate limiting for LLM API calls.
+
+A RateLimiter combines a requests/minute bucket and a tokens/minute bucket;
+acquire() blocks the calling thread until both have capacity. Buckets start
+full, so a run may burst up to one minute's allowance before settling to the
+configured rate.
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute, holding at most one minute's worth"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.fill_rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)  # A single oversized call must not block forever
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.fill_rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Thread-safe limiter over requests/minute and (optionally) tokens/minute"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0):
+        """Block until one request and `tokens` tokens may be spent, then spend them"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = 0.0
+                if self.request_bucket:
+                    wait = max(wait, self.request_bucket.wait_time(1, now))
+                if self.token_bucket and tokens:
+                    wait = max(wait, self.token_bucket.wait_time(tokens, now))
+                if wait <= 0:
+                    if self.request_bucket:
+                        self.request_bucket.take(1)
+                    if self.token_bucket and tokens:
+                        self.token_bucket.take(tokens)
+                    return
+            time.sleep(wait)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size (~4 characters per token), good enough for budgeting"""
+    return max(1, len(text) // 4)
@@ -5,11 +5,15 @@ Extracts meaningful words from a topic and gets bilingual definitions
 """
 
 import json
+import os
 import re
 import asyncio
-import aiohttp
 import argparse
 
+from llm_backends import BackendError, BackendRouter, add_backend_arguments, build_router
+from llm_cache import disable_cache, print_cache_stats
+from llm_telemetry import add_telemetry_arguments, finish_telemetry
+
 # Sample topic - replace with your content
 SAMPLE_TOPIC = """
     <topic id="1.1" title="What is Chemistry?">
@@ -21,8 +25,8 @@ SAMPLE_TOPIC = """
     </topic>
 """
 
-async def extract_words_with_model(topic: str, model_name: str, ollama_host: str):
-    """Extract words and meanings using Ollama model"""
+async def extract_words_with_model(topic: str, router: BackendRouter):
+    """Extract words and meanings using the configured model (Ollama by default)"""
     prompt = f"""
 You are an expert educational content processor. Extract important educational words from this topic:
 
@@ -56,38 +60,33 @@ Output ONLY valid JSON in this format:
 """
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{ollama_host}/api/generate",
-                json={
-                    "model": model_name,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.2,
-                        "num_predict": 1000
-                    }
-                },
-                timeout=aiohttp.ClientTimeout(total=120)
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    content = result.get('response', '').strip()
-
-                    # Try to extract JSON
-                    try:
-                        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                        if json_match:
-                            return json.loads(json_match.group())
-                    except json.JSONDecodeError:
-                        print("Failed to parse JSON response")
-                        print("Raw response:")
-                        print(content)
-                        return None
-    except Exception as e:
+        # Backends are blocking; run the call off the event loop
+        completion = await asyncio.to_thread(router.complete, prompt, temperature=0.2, max_tokens=1000, timeout=120,
+                                             label="topic")
+    except BackendError as e:
         print(f"API Error: {e}")
         return None
 
+    word_data = parse_words_response(completion.text)
+    if word_data is not None:
+        completion.remember()
+    else:
+        completion.mark_parse_failure()
+    return word_data
+
+def parse_words_response(content: str):
+    """Extracts the JSON word list from the model's text"""
+    # Try to extract JSON
+    try:
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+    except json.JSONDecodeError:
+        print("Failed to parse JSON response")
+        print("Raw response:")
+        print(content)
+        return None
+
 def display_results(word_data):
     """Display word information in terminal"""
     if not word_data or 'words' not in word_data:
@@ -107,28 +106,44 @@ def display_results(word_data):
 
 async def main():
     parser = argparse.ArgumentParser(description='Simple Educational Word Extractor using Ollama')
-    parser.add_argument('--model', '-m', default='llama3.2:latest', help='Ollama model name')
-    parser.add_argument('--host', default='http://localhost:11434', help='Ollama host URL')
+    parser.add_argument('--model', '-m', help='Ollama model name (same as --ollama-model)')
+    parser.add_argument('--host', help='Ollama host URL (same as --ollama-host)')
+    parser.add_argument('--apikey', help='DeepSeek API Key, when --backend or --fallback is deepseek')
     parser.add_argument('--topic', help='Topic text to analyze (optional)')
+    parser.add_argument('--no-cache', action='store_true', help='Always call the model instead of reusing cached responses')
+    add_backend_arguments(parser, default_backend='ollama')
+    add_telemetry_arguments(parser, 'simpex')
 
     args = parser.parse_args()
+    if args.no_cache:
+        disable_cache()
+    args.ollama_model = args.model or args.ollama_model
+    args.ollama_host = args.host or args.ollama_host
+    try:
+        router = build_router(args, args.apikey or os.getenv("DEEPSEEK_API_KEY"))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
 
     # Use provided topic or sample
     topic = args.topic if args.topic else SAMPLE_TOPIC
 
-    print(f"🧪 Using model: {args.model}")
+    print(f"🧪 Using model: {router.backends[0]!r}")
     print(f"📝 Analyzing topic...")
     print("=" * 60)
     print(topic.strip())
     print("=" * 60)
 
     print("\n⏳ Processing... (this may take 1-2 minutes)")
-    word_data = await extract_words_with_model(topic, args.model, args.host)
+    word_data = await extract_words_with_model(topic, router)
 
     if word_data:
         display_results(word_data)
     else:
         print("❌ Failed to extract words")
+    print(router.summary())
+    print_cache_stats()
+    finish_telemetry(args)
 
 if __name__ == "__main__":
     asyncio.run(main())
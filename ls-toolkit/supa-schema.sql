@@ -109,7 +109,7 @@ CREATE TABLE IF NOT EXISTS Table_Data (
 
 CREATE TABLE words (
     word_pk SERIAL PRIMARY KEY,
-    word_text TEXT NOT NULL UNIQUE,       -- The normalized word/term (e.g., lowercase)
+    word_text TEXT NOT NULL,              -- The normalized word/term (e.g., lowercase); unique per book, see idx_words_word_text_book_fk
     meaning TEXT,                         -- Primary English explanation (maps to JSON "explanation")
     explanation TEXT,                     -- Could be a more detailed explanation or an example (maps to JSON "example_sentence")
     urdu_meaning TEXT,                    -- Dedicated column for Urdu meaning
@@ -132,3 +132,247 @@ CREATE TABLE topic_words (
        created_at TIMESTAMPTZ DEFAULT NOW(),
        CONSTRAINT topic_words_topic_fk_word_fk_key UNIQUE (topic_fk, word_fk) -- Prevents duplicate links
      );
+
+-- Clone one ingested section (with its content elements and list items) to many topics.
+-- Called via RPC by supa_ingestv2.clone_section_to_topics so fan-out cost does not depend on template size.
+-- conflict_behavior: 'replace' swaps out a same-type section in place, 'skip' keeps it, 'append' adds after the last section.
+CREATE OR REPLACE FUNCTION clone_section_to_topics(
+    source_section_pk INTEGER,
+    target_topic_pks INTEGER[],
+    conflict_behavior TEXT DEFAULT 'replace'
+)
+RETURNS TABLE (target_topic_fk INTEGER, cloned_section_pk INTEGER, was_skipped BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    source_type VARCHAR(50);
+    source_title VARCHAR(255);
+BEGIN
+    SELECT s.section_type_xml, s.title INTO source_type, source_title
+    FROM Sections s WHERE s.section_pk = source_section_pk;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Section % not found', source_section_pk;
+    END IF;
+
+    -- One row per target topic, with new primary keys reserved up front so children can be mapped
+    CREATE TEMP TABLE clone_targets ON COMMIT DROP AS
+    SELECT t.topic_pk,
+           conflict.section_pk AS conflicting_section_pk,
+           CASE
+               WHEN conflict.section_pk IS NOT NULL AND conflict_behavior = 'replace' THEN conflict.order_in_topic
+               ELSE (SELECT COALESCE(MAX(s.order_in_topic), 0) + 1 FROM Sections s WHERE s.topic_fk = t.topic_pk)
+           END AS section_order,
+           CASE
+               WHEN conflict.section_pk IS NOT NULL AND conflict_behavior = 'skip' THEN NULL
+               ELSE nextval(pg_get_serial_sequence('sections', 'section_pk'))::INTEGER
+           END AS new_section_pk
+    FROM (SELECT DISTINCT unnest(target_topic_pks) AS topic_pk) t
+    LEFT JOIN LATERAL (
+        SELECT s.section_pk, s.order_in_topic
+        FROM Sections s
+        WHERE s.topic_fk = t.topic_pk
+          AND s.section_type_xml = source_type
+          AND s.section_pk <> source_section_pk
+        ORDER BY s.order_in_topic
+        LIMIT 1
+    ) conflict ON TRUE;
+
+    CREATE TEMP TABLE clone_element_map ON COMMIT DROP AS
+    SELECT ce.element_pk AS source_element_pk,
+           ct.new_section_pk,
+           nextval(pg_get_serial_sequence('content_elements', 'element_pk'))::INTEGER AS new_element_pk
+    FROM Content_Elements ce
+    CROSS JOIN clone_targets ct
+    WHERE ce.section_fk = source_section_pk
+      AND ct.new_section_pk IS NOT NULL;
+
+    IF conflict_behavior = 'replace' THEN
+        -- Content_Elements and List_Items cascade
+        DELETE FROM Sections s
+        USING clone_targets ct
+        WHERE s.section_pk = ct.conflicting_section_pk;
+    END IF;
+
+    INSERT INTO Sections (section_pk, topic_fk, section_type_xml, title, order_in_topic)
+    SELECT ct.new_section_pk, ct.topic_pk, source_type, source_title, ct.section_order
+    FROM clone_targets ct
+    WHERE ct.new_section_pk IS NOT NULL;
+
+    INSERT INTO Content_Elements (element_pk, section_fk, element_type, xml_id_attribute, title_attribute,
+                                  text_content, attribute_level, attribute_type, formula_type, order_in_section)
+    SELECT m.new_element_pk, m.new_section_pk, ce.element_type, ce.xml_id_attribute, ce.title_attribute,
+           ce.text_content, ce.attribute_level, ce.attribute_type, ce.formula_type, ce.order_in_section
+    FROM clone_element_map m
+    JOIN Content_Elements ce ON ce.element_pk = m.source_element_pk;
+
+    INSERT INTO List_Items (parent_content_element_fk, item_text, order_in_list)
+    SELECT m.new_element_pk, li.item_text, li.order_in_list
+    FROM clone_element_map m
+    JOIN List_Items li ON li.parent_content_element_fk = m.source_element_pk;
+
+    RETURN QUERY
+    SELECT ct.topic_pk, COALESCE(ct.new_section_pk, ct.conflicting_section_pk), ct.new_section_pk IS NULL
+    FROM clone_targets ct;
+END;
+$$;
+
+-- Bulk upsert of enrichment rows (built by word_ingest.EnrichmentIngester) in one statement.
+-- Relies on the UNIQUE (word, topic_fk) constraint already used by process_single_enrichment.
+-- was_inserted comes from xmax = 0, so callers get new vs updated counts from the response.
+-- With p_update_existing = FALSE existing pairs are left untouched and not returned.
+CREATE OR REPLACE FUNCTION upsert_topic_enrichments(
+    p_rows JSONB,
+    p_update_existing BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE (word TEXT, topic_fk INTEGER, was_inserted BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF p_update_existing THEN
+        RETURN QUERY
+        INSERT INTO topic_enrichments AS te (word, topic_fk, book_fk, explanation, urdu_meaning, term_type,
+                                             example_sentence, key_principle, real_world_example,
+                                             related_concepts, raw_json)
+        SELECT r.word, r.topic_fk, r.book_fk, r.explanation, r.urdu_meaning, r.term_type,
+               r.example_sentence, r.key_principle, r.real_world_example, r.related_concepts, r.raw_json
+        FROM jsonb_populate_recordset(NULL::topic_enrichments, p_rows) r
+        ON CONFLICT (word, topic_fk) DO UPDATE SET
+            book_fk = EXCLUDED.book_fk,
+            explanation = EXCLUDED.explanation,
+            urdu_meaning = EXCLUDED.urdu_meaning,
+            term_type = EXCLUDED.term_type,
+            example_sentence = EXCLUDED.example_sentence,
+            key_principle = EXCLUDED.key_principle,
+            real_world_example = EXCLUDED.real_world_example,
+            related_concepts = EXCLUDED.related_concepts,
+            raw_json = EXCLUDED.raw_json
+        RETURNING te.word::TEXT, te.topic_fk, (te.xmax = 0);
+    ELSE
+        RETURN QUERY
+        INSERT INTO topic_enrichments AS te (word, topic_fk, book_fk, explanation, urdu_meaning, term_type,
+                                             example_sentence, key_principle, real_world_example,
+                                             related_concepts, raw_json)
+        SELECT r.word, r.topic_fk, r.book_fk, r.explanation, r.urdu_meaning, r.term_type,
+               r.example_sentence, r.key_principle, r.real_world_example, r.related_concepts, r.raw_json
+        FROM jsonb_populate_recordset(NULL::topic_enrichments, p_rows) r
+        ON CONFLICT (word, topic_fk) DO NOTHING
+        RETURNING te.word::TEXT, te.topic_fk, TRUE;
+    END IF;
+END;
+$$;
+
+-- Enrichment statistics for one book, aggregated server-side so the response stays small
+-- regardless of how many terms the book has. Shape matches EnrichmentIngester.get_enrichment_stats.
+CREATE OR REPLACE FUNCTION get_enrichment_stats(p_book_pk INTEGER)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'total_enrichments',
+        (SELECT COUNT(*) FROM topic_enrichments te WHERE te.book_fk = p_book_pk),
+        'enrichments_by_topic',
+        COALESCE((
+            SELECT jsonb_object_agg(g.topic_key, g.enrichment_count)
+            FROM (
+                SELECT t.topic_xml_id || ': ' || t.title AS topic_key, COUNT(*) AS enrichment_count
+                FROM topic_enrichments te
+                JOIN Topics t ON t.topic_pk = te.topic_fk
+                WHERE te.book_fk = p_book_pk
+                GROUP BY t.topic_xml_id, t.title
+            ) g
+        ), '{}'::JSONB),
+        'enrichments_by_type',
+        COALESCE((
+            SELECT jsonb_object_agg(g.term_type, g.enrichment_count)
+            FROM (
+                SELECT COALESCE(NULLIF(te.term_type, ''), 'unspecified') AS term_type, COUNT(*) AS enrichment_count
+                FROM topic_enrichments te
+                WHERE te.book_fk = p_book_pk
+                GROUP BY 1
+            ) g
+        ), '{}'::JSONB)
+    );
+$$;
+
+-- Shared cross-book lexicon. Common term data ("atom", "energy", "mass") is stored once in
+-- lexemes; words becomes the thin per-book overlay: it links to its lexeme and only keeps
+-- fields that differ for that book (NULL = inherit). Read merged data through book_words.
+CREATE TABLE IF NOT EXISTS lexemes (
+    lexeme_pk SERIAL PRIMARY KEY,
+    lemma TEXT NOT NULL UNIQUE,           -- Normalized term, same normalization as words.word_text
+    meaning TEXT,
+    explanation TEXT,
+    urdu_meaning TEXT,
+    term_type VARCHAR(50),
+    properties JSONB,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE words ADD COLUMN IF NOT EXISTS lexeme_fk INTEGER REFERENCES lexemes(lexeme_pk);
+CREATE INDEX IF NOT EXISTS idx_words_lexeme_fk ON words(lexeme_fk);
+-- Terms are unique per book, not globally, so every book can carry its own row for a shared lexeme
+ALTER TABLE words DROP CONSTRAINT IF EXISTS words_word_text_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_words_word_text_book_fk ON words(word_text, book_fk);
+
+CREATE OR REPLACE VIEW book_words AS
+SELECT w.word_pk,
+       w.word_text,
+       w.book_fk,
+       w.lexeme_fk,
+       COALESCE(w.meaning, l.meaning) AS meaning,
+       COALESCE(w.explanation, l.explanation) AS explanation,
+       COALESCE(w.urdu_meaning, l.urdu_meaning) AS urdu_meaning,
+       COALESCE(w.term_type, l.term_type) AS term_type,
+       COALESCE(l.properties, '{}'::JSONB) || COALESCE(w.properties, '{}'::JSONB) AS properties,
+       (w.meaning IS NOT NULL OR w.explanation IS NOT NULL OR w.urdu_meaning IS NOT NULL
+        OR w.term_type IS NOT NULL OR w.properties IS NOT NULL) AS has_book_override
+FROM words w
+LEFT JOIN lexemes l ON l.lexeme_pk = w.lexeme_fk;
+
+-- Ingest a batch of words for one book against the shared lexicon (used by word_ingest_gem).
+-- Unknown terms create a lexeme from this book's data; known terms reuse it and the per-book
+-- row stores only the fields that differ. Returns each word's word_pk for topic_words linking.
+CREATE OR REPLACE FUNCTION upsert_book_words(p_book_pk INTEGER, p_rows JSONB)
+RETURNS TABLE (word_text TEXT, word_pk INTEGER, lexeme_created BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    new_lemmas TEXT[];
+BEGIN
+    WITH inserted AS (
+        INSERT INTO lexemes (lemma, meaning, explanation, urdu_meaning, term_type, properties)
+        SELECT i.word_text, i.meaning, i.explanation, i.urdu_meaning, i.term_type, i.properties
+        FROM jsonb_to_recordset(p_rows) AS i(word_text TEXT, meaning TEXT, explanation TEXT,
+                                             urdu_meaning TEXT, term_type VARCHAR(50), properties JSONB)
+        ON CONFLICT (lemma) DO NOTHING
+        RETURNING lemma
+    )
+    SELECT COALESCE(array_agg(lemma), '{}') INTO new_lemmas FROM inserted;
+
+    RETURN QUERY
+    INSERT INTO words AS w (word_text, book_fk, lexeme_fk, meaning, explanation, urdu_meaning, term_type, properties)
+    SELECT i.word_text, p_book_pk, l.lexeme_pk,
+           NULLIF(i.meaning, l.meaning),
+           NULLIF(i.explanation, l.explanation),
+           NULLIF(i.urdu_meaning, l.urdu_meaning),
+           NULLIF(i.term_type, l.term_type),
+           CASE WHEN i.properties IS NOT DISTINCT FROM l.properties THEN NULL ELSE i.properties END
+    FROM jsonb_to_recordset(p_rows) AS i(word_text TEXT, meaning TEXT, explanation TEXT,
+                                         urdu_meaning TEXT, term_type VARCHAR(50), properties JSONB)
+    JOIN lexemes l ON l.lemma = i.word_text
+    ON CONFLICT (word_text, book_fk) DO UPDATE SET
+        lexeme_fk = EXCLUDED.lexeme_fk,
+        meaning = EXCLUDED.meaning,
+        explanation = EXCLUDED.explanation,
+        urdu_meaning = EXCLUDED.urdu_meaning,
+        term_type = EXCLUDED.term_type,
+        properties = EXCLUDED.properties,
+        updated_at = NOW()
+    RETURNING w.word_text, w.word_pk, w.word_text = ANY(new_lemmas);
+END;
+$$;
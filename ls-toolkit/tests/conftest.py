@@ -0,0 +1,90 @@
+import importlib
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# The scripts import their siblings directly (e.g. `from qbank_reader import ...`)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'tools')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class ExecutedQuery:
+    """One executed query: the table or RPC name and the builder calls that led to execute()"""
+
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    @property
+    def methods(self):
+        return [method for method, _, _ in self.calls]
+
+    def args(self, method):
+        return next(args for name, args, _ in self.calls if name == method)
+
+    def kwargs(self, method):
+        return next(kwargs for name, _, kwargs in self.calls if name == method)
+
+    def all_args(self, method):
+        return [args for name, args, _ in self.calls if name == method]
+
+
+class FakeQuery:
+    def __init__(self, client, name, calls):
+        self._client = client
+        self._name = name
+        self._calls = calls
+
+    def _chain(self, method, *args, **kwargs):
+        return FakeQuery(self._client, self._name, self._calls + [(method, args, kwargs)])
+
+    @property
+    def not_(self):
+        return self._chain('not_')
+
+    def __getattr__(self, method):
+        return lambda *args, **kwargs: self._chain(method, *args, **kwargs)
+
+    def execute(self):
+        query = ExecutedQuery(self._name, self._calls)
+        self._client.executed.append(query)
+        return SimpleNamespace(data=self._client.respond(query))
+
+
+class FakeSupabase:
+    """
+    Stands in for the Supabase client: every table()/rpc() chain is recorded in
+    `executed` when it runs, and `respond(query)` supplies its data (or raises).
+    """
+
+    def __init__(self, respond=None):
+        self.executed = []
+        self.respond = respond or (lambda query: [])
+
+    def table(self, name):
+        return FakeQuery(self, name, [])
+
+    def rpc(self, name, params):
+        return FakeQuery(self, name, [('rpc', (params,), {})])
+
+    def queries(self, name):
+        return [query for query in self.executed if query.name == name]
+
+
+@pytest.fixture
+def fake_supabase():
+    return FakeSupabase
+
+
+@pytest.fixture
+def import_script(tmp_path, monkeypatch):
+    """Imports a script that creates its Supabase client (and log file in the cwd) at import time"""
+    def load(name):
+        pytest.importorskip('supabase')
+        monkeypatch.chdir(tmp_path)
+        return importlib.import_module(name)
+    return load
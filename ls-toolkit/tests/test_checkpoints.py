@@ -0,0 +1,46 @@
+from enrich import CsvCheckpointWriter, load_checkpoint
+from wordex import load_completed_topics, write_topic_result
+
+
+def test_enrich_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / 'enriched.csv')
+    writer = CsvCheckpointWriter(path)
+    writer.write({'term': 'Atom', 'topic_id': '1.1', 'enrichment_data': {'urdu_meaning': 'ایٹم'}})
+    writer.close()
+    writer = CsvCheckpointWriter(path, append=True)
+    writer.write({'term': 'Ion', 'topic_id': '1.1', 'enrichment_data': {'note': 'a, "quoted"\nvalue'}})
+    writer.close()
+
+    rows = load_checkpoint(path)
+    assert [(row['term'], row['topic_id']) for row in rows] == [('Atom', '1.1'), ('Ion', '1.1')]
+    assert 'ایٹم' in rows[0]['enrichment_data']
+
+
+def test_enrich_checkpoint_drops_a_half_written_row(tmp_path):
+    path = tmp_path / 'enriched.csv'
+    writer = CsvCheckpointWriter(str(path))
+    writer.write({'term': 'Atom', 'topic_id': '1.1', 'enrichment_data': {}})
+    writer.close()
+    complete = path.read_bytes()
+    path.write_bytes(complete + b'Ion,1.1,"{""expl')
+
+    assert [row['term'] for row in load_checkpoint(str(path))] == ['Atom']
+    assert path.read_bytes() == complete
+
+
+def test_missing_checkpoints_are_empty(tmp_path):
+    assert load_checkpoint(str(tmp_path / 'none.csv')) == []
+    assert load_completed_topics(str(tmp_path / 'none.txt')) == {}
+
+
+def test_wordex_topics_round_trip_and_truncate(tmp_path):
+    path = tmp_path / 'terms.txt'
+    with open(path, 'w', encoding='utf-8') as f:
+        write_topic_result(f, '1.1', ['Atom', 'Isotope'])
+        write_topic_result(f, '1.2', [])
+    complete = path.read_bytes()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('[Topic 1.3]\nMolecule,Comp')
+
+    assert load_completed_topics(str(path)) == {'1.1': ['Atom', 'Isotope'], '1.2': []}
+    assert path.read_bytes() == complete
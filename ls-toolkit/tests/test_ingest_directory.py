@@ -0,0 +1,85 @@
+import importlib
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+    pytest.importorskip('supabase')
+    monkeypatch.chdir(tmp_path)  # supa_ingestv2 logs to ./ingestion.log
+    return importlib.import_module('supa_ingestv2'), importlib.import_module('ingest_directory')
+
+
+class FakeBuilder:
+    """A postgrest-style builder: chained calls and the .not_ property return builders"""
+
+    def __init__(self, log):
+        self.log = log
+
+    @property
+    def not_(self):
+        return self
+
+    def table(self, name):
+        return self
+
+    def delete(self):
+        return self
+
+    def in_(self, column, values):
+        return self
+
+    def execute(self):
+        self.log.append(threading.current_thread().name)
+        return 'done'
+
+
+def test_throttles_builders_reached_through_properties(modules):
+    _, ingest_directory = modules
+    log = []
+
+    class CountingSemaphore:
+        entered = 0
+
+        def __enter__(self):
+            CountingSemaphore.entered += 1
+
+        def __exit__(self, *exc):
+            return False
+
+    client = ingest_directory.ThrottledClient(FakeBuilder(log), CountingSemaphore())
+    assert client.table('MCQ_Options').delete().not_.in_('option_letter', ['A']).execute() == 'done'
+    assert isinstance(client.not_, ingest_directory.ThrottledClient)
+    assert CountingSemaphore.entered == 1 and len(log) == 1
+
+
+def test_ingests_chapters_in_threads_and_restores_the_client(tmp_path, modules, monkeypatch):
+    supa_ingestv2, ingest_directory = modules
+    chapters = tmp_path / 'chapters'
+    chapters.mkdir()
+    (chapters / 'phy-chap-10.xml').write_text('<chapter id="10"><title>Waves & Sound</title></chapter>')
+    (chapters / 'phy-chap-2.xml').write_text('<chapter><title>Kinematics</title></chapter>')
+    (chapters / 'phy-chap-3.xml').write_text('<chapter><title>Broken')
+
+    log = []
+    original = FakeBuilder(log)
+    monkeypatch.setattr(supa_ingestv2, 'supabase', original)
+    seen = []
+
+    def fake_process(root, details, book_pk=None):
+        client = supa_ingestv2.supabase
+        assert isinstance(client, ingest_directory.ThrottledClient)
+        client.table('topics').delete().not_.in_('topic_pk', [1]).execute()
+        seen.append((root.find('title').text, details['current_chapter_order'], book_pk))
+
+    monkeypatch.setattr(ingest_directory, 'get_or_create_book_pk', lambda details: 7)
+    monkeypatch.setattr(ingest_directory, 'process_parsed_xml', fake_process)
+
+    results = ingest_directory.ingest_directory(str(chapters), {'book_title': 'Physics'}, workers=2, max_requests=1)
+
+    assert supa_ingestv2.supabase is original
+    assert [(r['file'].rsplit('/', 1)[-1], r['status']) for r in results] == [
+        ('phy-chap-2.xml', 'ok'), ('phy-chap-3.xml', 'failed'), ('phy-chap-10.xml', 'ok')]
+    assert sorted(seen) == [('Kinematics', 1, 7), ('Waves & Sound', 10, 7)]
+    assert len(log) == 2
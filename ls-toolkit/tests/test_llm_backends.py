@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from argparse import Namespace
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import llm_cache
+from llm_backends import BackendError, BackendRouter, DeepSeekChatBackend, LLMBackend, OllamaGenerateBackend
+from llm_cache import LLMCache
+from llm_stub_server import make_handler
+from llm_telemetry import LLMTelemetry
+
+
+@pytest.fixture
+def stub_server():
+    """Starts in-process llm_stub_server instances; yields a factory returning their base URLs"""
+    servers = []
+
+    def start(latency=0.0, error_rate=0.0, text='stub,response'):
+        args = Namespace(latency=latency, jitter=0.0, error_rate=error_rate, error_status=503,
+                         invalid_rate=0.0, text=text, verbose=False)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.setattr(llm_cache, '_default_cache', cache)
+    monkeypatch.setattr(llm_cache, '_cache_disabled', False)
+    yield cache
+    cache.close()
+
+
+def deepseek(url, **kwargs):
+    return DeepSeekChatBackend('test-key', endpoint=f"{url}/v1/chat/completions", model='stub-chat', **kwargs)
+
+
+def ollama(url, **kwargs):
+    return OllamaGenerateBackend(host=url, model='stub-local', **kwargs)
+
+
+def test_completion_is_cached_only_once_remembered(stub_server):
+    url = stub_server()
+    telemetry = LLMTelemetry()
+    router = BackendRouter([deepseek(url)], telemetry=telemetry)
+
+    first = router.complete('Now analyze: "Atom"', system='sys', label='atom')
+    assert json.loads(first.text)['explanation'] == 'Stub explanation of Atom.'
+    assert not first.cached and first.prompt_tokens > 0
+    assert not router.complete('Now analyze: "Atom"', system='sys').cached
+
+    first.remember()
+    again = router.complete('Now analyze: "Atom"', system='sys', label='atom')
+    assert again.cached and again.text == first.text
+    assert router.backend_requests == 2
+    assert [(r['cached'], r['backend_requests']) for r in telemetry.records] == [(False, 1), (False, 1), (True, 0)]
+
+    different = router.complete('Now analyze: "Atom"', system='sys', max_tokens=10)
+    assert not different.cached, "request parameters are part of the cache key"
+
+
+def test_failover_to_the_next_backend(stub_server):
+    broken, healthy = stub_server(error_rate=1.0), stub_server()
+    telemetry = LLMTelemetry()
+    router = BackendRouter([deepseek(broken), ollama(healthy)], telemetry=telemetry)
+
+    completion = router.complete('hello', label='hi')
+    assert completion.backend == 'ollama'
+    assert completion.text == 'stub,response'
+    assert router.failovers == 1
+    assert telemetry.records[-1]['backend_requests'] == 2
+    assert router.backends[0].health()[2] == 1.0
+
+
+def test_every_backend_failing_raises_and_is_recorded(stub_server):
+    telemetry = LLMTelemetry()
+    router = BackendRouter([deepseek(stub_server(error_rate=1.0)), ollama(stub_server(error_rate=1.0))],
+                           telemetry=telemetry)
+    with pytest.raises(BackendError, match='deepseek.*ollama'):
+        router.complete('hello', label='hi', attempt=2)
+    record = telemetry.records[-1]
+    assert (record['ok'], record['attempt'], record['backend_requests']) == (False, 2, 2)
+    assert router.backend_requests == 2
+
+
+def test_degraded_backend_is_tried_last_until_its_cooldown(stub_server):
+    primary, secondary = deepseek(stub_server(error_rate=1.0)), ollama(stub_server())
+    router = BackendRouter([primary, secondary], min_samples=2, cooldown=0.2, telemetry=LLMTelemetry())
+
+    router.complete('one')
+    router.complete('two')
+    assert router.ordered_backends() == [secondary, primary]
+    requests_before = router.backend_requests
+    assert router.complete('three').backend == 'ollama'
+    assert router.backend_requests == requests_before + 1, "the degraded backend is not called first"
+
+    time.sleep(0.3)
+    assert router.ordered_backends() == [primary, secondary], "after the cooldown it is probed again"
+
+
+def test_hedge_races_a_slow_backend(stub_server):
+    slow, fast = stub_server(latency=1.0), stub_server()
+    router = BackendRouter([deepseek(slow), ollama(fast)], hedge_after=0.1, telemetry=LLMTelemetry())
+
+    start = time.perf_counter()
+    completion = router.complete('hello')
+    assert completion.backend == 'ollama'
+    assert time.perf_counter() - start < 0.9
+    assert router.hedges == 1
+
+
+def test_empty_reply_is_a_backend_error(stub_server):
+    router = BackendRouter([ollama(stub_server(text=''))], telemetry=LLMTelemetry())
+    with pytest.raises(BackendError, match='no completion'):
+        router.complete('hello')
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoTextBackend(LLMBackend):
+        def build_payload(self, prompt, system, temperature, max_tokens):
+            return {'prompt': prompt}
+
+        def cache_key(self, payload):
+            return LLMCache.make_key(self.endpoint, self.model, payload['prompt'])
+
+    with pytest.raises(TypeError, match='extract_text'):
+        NoTextBackend('http://127.0.0.1:9/generate', 'm')
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from llm_cache import LLMCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite3'), max_age_seconds=0, max_bytes=0, evict_every=0)
+    yield cache
+    cache.close()
+
+
+def test_key_covers_everything_that_shapes_the_response():
+    key = LLMCache.make_key('http://x/v1', 'm', [{'role': 'user', 'content': 'hi'}], {'temperature': 0.3})
+    assert key == LLMCache.make_key('http://x/v1', 'm', [{'role': 'user', 'content': 'hi'}], {'temperature': 0.3})
+    assert key != LLMCache.make_key('http://y/v1', 'm', [{'role': 'user', 'content': 'hi'}], {'temperature': 0.3})
+    assert key != LLMCache.make_key('http://x/v1', 'n', [{'role': 'user', 'content': 'hi'}], {'temperature': 0.3})
+    assert key != LLMCache.make_key('http://x/v1', 'm', [{'role': 'user', 'content': 'hi!'}], {'temperature': 0.3})
+    assert key != LLMCache.make_key('http://x/v1', 'm', [{'role': 'user', 'content': 'hi'}], {'temperature': 0.7})
+    assert (LLMCache.make_key('e', 'm', 'p', {'a': 1, 'b': 2})
+            == LLMCache.make_key('e', 'm', 'p', {'b': 2, 'a': 1}))
+
+
+def test_get_put_and_stats(cache):
+    assert cache.get('k1') is None
+    cache.put('k1', 'e', 'm', '{"text": "اردو"}')
+    assert cache.get('k1') == '{"text": "اردو"}'
+    assert cache.get_first(['missing', 'k1']) == (1, '{"text": "اردو"}')
+    assert (cache.hits, cache.misses, cache.writes) == (2, 1, 1)
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    first = LLMCache(path)
+    first.put('k', 'e', 'm', 'response')
+    first.close()
+    second = LLMCache(path)
+    assert second.get('k') == 'response'
+    second.close()
+
+
+def test_expired_entries_are_misses_and_evicted(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite3'), max_age_seconds=60, max_bytes=0)
+    cache.put('old', 'e', 'm', 'x')
+    cache.put('new', 'e', 'm', 'y')
+    cache._conn.execute('UPDATE responses SET created_at = ? WHERE key = ?', (time.time() - 120, 'old'))
+    cache._conn.commit()
+
+    assert cache.get('old') is None
+    assert cache.evict() == 1
+    assert cache.get('new') == 'y'
+    cache.close()
+
+
+def test_size_limit_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite3'), max_age_seconds=0, max_bytes=25, evict_every=0)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, 'e', 'm', key * 10)
+        time.sleep(0.01)
+    assert cache.get('a') == 'a' * 10  # 'b' is now the least recently used
+
+    assert cache.evict() == 1
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+    cache.close()
+
+
+def test_put_evicts_every_n_writes(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite3'), max_age_seconds=0, max_bytes=30, evict_every=4)
+    for n in range(3):
+        cache.put(f"k{n}", 'e', 'm', 'x' * 10)
+    cache.put('k3', 'e', 'm', 'x' * 10)
+    assert cache.evicted == 1
+    for n in range(4, 8):
+        cache.put(f"k{n}", 'e', 'm', 'x' * 10)
+    assert cache.evicted == 5
+    assert 'evicted; 3 entries' in cache.summary()
+    cache.close()
+
+
+def test_shared_between_threads(cache):
+    def worker(n):
+        for i in range(50):
+            cache.put(f"{n}-{i}", 'e', 'm', str(i))
+            assert cache.get(f"{n}-{i}") == str(i)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.writes == 200
+    assert cache.hits == 200
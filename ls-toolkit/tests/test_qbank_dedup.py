@@ -0,0 +1,116 @@
+import importlib
+import json
+
+import pytest
+
+from qbank_dedup import QuestionDeduper, dedupe_questions, shingle, jaccard
+
+ACID = "Which of the following is a strong acid that ionizes completely in water?"
+ACID_REWORDED = "Which of the following is a strong acid which ionizes completely in water ?"
+BOND = "Define a covalent bond and give two examples of molecules that contain one."
+
+
+def mcq(q_txt, yr_app=None, exam_ref=None, q_type='MCQ'):
+    return {'q_txt': q_txt, 'q_type': q_type, 'yr_app': yr_app or [], 'exam_ref': exam_ref or []}
+
+
+def test_shingle_similarity():
+    assert jaccard(shingle(ACID), shingle(ACID_REWORDED)) >= 0.8
+    assert jaccard(shingle(ACID), shingle(BOND)) < 0.3
+    assert shingle('') == frozenset()
+
+
+def test_near_duplicates_merge_into_first_occurrence():
+    questions = [mcq(ACID, [2019], ['BISE-LHR']), mcq(BOND, [2020]), mcq(ACID_REWORDED, [2016, 2019], ['BISE-GRW'])]
+    canonicals, report = dedupe_questions(questions)
+
+    assert [q['q_txt'] for q in canonicals] == [ACID, BOND]
+    assert canonicals[0]['yr_app'] == [2016, 2019]
+    assert canonicals[0]['exam_ref'] == ['BISE-LHR', 'BISE-GRW']
+    assert questions[0]['yr_app'] == [2019], "input questions must not be modified"
+    assert report['duplicates_removed'] == 1
+    assert report['clusters'][0]['canonical_index'] == 0
+    assert report['clusters'][0]['duplicates'][0]['index'] == 2
+
+
+def test_different_question_types_never_merge():
+    canonicals, _ = dedupe_questions([mcq(ACID), mcq(ACID, q_type='SHORT')])
+    assert len(canonicals) == 2
+
+
+def test_only_questions_in_the_same_topic_merge():
+    deduper = QuestionDeduper()
+    assert deduper.add(mcq(ACID), partition=('chem-ix', '1', '1.1')) == (0, True)
+    assert deduper.add(mcq(ACID_REWORDED), partition=('chem-ix', '2', '2.1')) == (1, True)
+    assert deduper.add(mcq(ACID_REWORDED), partition=('chem-ix', '1', '1.1')) == (0, False)
+
+
+def test_deduper_spans_every_add():
+    deduper = QuestionDeduper()
+    assert deduper.add(mcq(ACID, [2019]), index=10) == (0, True)
+    for index in range(11, 50):
+        deduper.add(mcq(f"Unrelated filler question number {index} about periodic trends"), index=index)
+    position, is_new = deduper.add(mcq(ACID_REWORDED, [2021]), index=50)
+    assert (position, is_new) == (0, False)
+    assert deduper.canonicals[0]['yr_app'] == [2019, 2021]
+    assert deduper.total == 41
+
+
+def run_stream(tmp_path, monkeypatch, rows, **kwargs):
+    """Streams `rows` through process_qbank_stream with the database calls faked; returns the writes"""
+    pytest.importorskip('supabase')
+    monkeypatch.chdir(tmp_path)  # qbank_ingest logs to ./qbank_ingestion.log
+    qbank_ingest = importlib.import_module('qbank_ingest')
+
+    bank = tmp_path / 'bank.jsonl'
+    bank.write_text(''.join(json.dumps(row) + '\n' for row in rows), encoding='utf-8')
+
+    writes = []
+
+    def fake_upsert(client, batch, topic_pk, lookups):
+        writes.append((topic_pk, [(index, q['q_txt'], list(q['yr_app'])) for index, q in batch]))
+        return len(batch)
+
+    monkeypatch.setattr(qbank_ingest, 'get_lookup_tables', lambda client: {})
+    monkeypatch.setattr(qbank_ingest, 'validate_lookup_codes', lambda client, questions, lookups: lookups)
+    monkeypatch.setattr(qbank_ingest, 'get_topic_pk', lambda client, book, chap, topic: {'1': 11, '2': 22}[chap])
+    monkeypatch.setattr(qbank_ingest, 'upsert_question_batch', fake_upsert)
+
+    qbank_ingest.process_qbank_stream(str(bank), **kwargs)
+    return writes
+
+
+def in_topic(q, chapter):
+    return dict(q, book='chem-ix', chap_num=chapter, topic_num=f"{chapter}.1")
+
+
+def test_stream_merges_within_a_topic_and_rewrites_flushed_canonicals(tmp_path, monkeypatch):
+    rows = [
+        in_topic(mcq(ACID, [2019]), 1),
+        in_topic(mcq(BOND, [2020]), 1),
+        in_topic(mcq(ACID_REWORDED, [2023]), 1),
+        in_topic(mcq(ACID_REWORDED, [2022]), 2),
+    ]
+    report_path = tmp_path / 'report.json'
+    writes = run_stream(tmp_path, monkeypatch, rows, batch_size=1, dedup_report_path=str(report_path))
+
+    assert writes == [
+        (11, [(1, ACID, [2019])]),
+        (11, [(2, BOND, [2020])]),
+        # The duplicate is folded into the already written question when its topic ends
+        (11, [(1, ACID, [2019, 2023])]),
+        # A rewording in another topic is that topic's own question
+        (22, [(4, ACID_REWORDED, [2022])]),
+    ]
+    report = json.loads(report_path.read_text(encoding='utf-8'))
+    assert (report['total_questions'], report['canonical_questions'], report['duplicates_removed']) == (4, 3, 1)
+    assert [(c['topic_pk'], c['canonical_index']) for c in report['clusters']] == [(11, 1)]
+
+
+def test_stream_only_merges_within_each_run_of_a_topic(tmp_path, monkeypatch, caplog):
+    rows = [in_topic(mcq(ACID), 1), in_topic(mcq(BOND), 2), in_topic(mcq(ACID_REWORDED), 1)]
+    writes = run_stream(tmp_path, monkeypatch, rows, batch_size=10)
+
+    assert [(topic_pk, [index for index, _, _ in batch]) for topic_pk, batch in writes] == [
+        (11, [1]), (22, [2]), (11, [3])]
+    assert 'resumes at question #3' in caplog.text
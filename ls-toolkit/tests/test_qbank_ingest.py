@@ -0,0 +1,140 @@
+import functools
+import json
+
+import pytest
+
+LOOKUP_TABLES = {
+    'Question_Types': [{'type_code': 'MCQ', 'question_type_pk': 1}],
+    'Cognitive_Levels': [{'level_code': 'RECALL', 'cognitive_level_pk': 2}],
+    'Difficulty_Levels': [{'difficulty_code': 'EASY', 'difficulty_pk': 3}],
+}
+
+
+@pytest.fixture
+def qbank_ingest(import_script, monkeypatch):
+    module = import_script('qbank_ingest')
+    # Keep lookups out of the shared memo and the on-disk cache next to the script
+    monkeypatch.setattr(module, '_lookup_memo', {})
+    monkeypatch.setattr(module, 'get_lookup_tables', functools.partial(module.get_lookup_tables, cache_path=None))
+    return module
+
+
+def write_bank(path, questions):
+    path.write_text(''.join(
+        json.dumps(dict(q, book='chem-ix', chap_num=1, topic_num='1.1')) + '\n' for q in questions
+    ), encoding='utf-8')
+    return str(path)
+
+
+def question(q_txt, q_type='MCQ', cog_lvl='RECALL', diff='EASY', **fields):
+    return dict(q_txt=q_txt, q_type=q_type, cog_lvl=cog_lvl, diff=diff, **fields)
+
+
+def test_unknown_lookup_code_aborts_before_any_insert(tmp_path, qbank_ingest, fake_supabase, monkeypatch):
+    client = fake_supabase(lambda query: LOOKUP_TABLES.get(query.name, []))
+    monkeypatch.setattr(qbank_ingest, 'supabase', client)
+    bank = write_bank(tmp_path / 'bank.jsonl', [question('Q1'), question('Q2', q_type='ESSAY')])
+
+    qbank_ingest.process_qbank_stream(bank)
+
+    # Initial fetch plus one refresh in case the code was added after the cache was written
+    assert [query.name for query in client.executed] == list(LOOKUP_TABLES) * 2
+    assert all(query.methods == ['select'] for query in client.executed)
+
+
+def test_refresh_picks_up_a_newly_added_code(qbank_ingest, fake_supabase):
+    fetches = []
+
+    def respond(query):
+        fetches.append(query.name)
+        rows = list(LOOKUP_TABLES[query.name])
+        if query.name == 'Question_Types' and fetches.count('Question_Types') > 1:
+            rows.append({'type_code': 'SHORT', 'question_type_pk': 4})
+        return rows
+
+    client = fake_supabase(respond)
+    lookups = qbank_ingest.get_lookup_tables(client)
+    lookups = qbank_ingest.validate_lookup_codes(client, [question('Q', q_type='SHORT')], lookups)
+    assert lookups['question_types'] == {'MCQ': 1, 'SHORT': 4}
+
+    with pytest.raises(ValueError, match=r"cog_lvl: \['ANALYZE'\]"):
+        qbank_ingest.validate_lookup_codes(client, [question('Q', cog_lvl='ANALYZE')], lookups)
+
+
+def mcq(q_txt, *options):
+    return question(q_txt, opts=[{'txt': text, 'correct': i == 0} for i, text in enumerate(options)])
+
+
+def test_delete_stale_options_only_targets_letters_the_new_version_lacks(qbank_ingest, fake_supabase):
+    client = fake_supabase()
+    written = [
+        (1, mcq('Q1', 'a', 'b', 'c'), 101),
+        (2, mcq('Q2', 'a', 'b', 'c'), 102),
+        (3, mcq('Q3', 'a', 'b'), 103),
+        (4, question('Q4', q_type='SHORT'), 104),
+    ]
+
+    assert qbank_ingest.delete_stale_options(client, written) == set()
+
+    deletes = [(q.all_args('in_'), 'not_' in q.methods) for q in client.queries('MCQ_Options')]
+    assert deletes == [
+        ([('question_fk', [101, 102]), ('option_letter', ['A', 'B', 'C'])], True),
+        ([('question_fk', [103]), ('option_letter', ['A', 'B'])], True),
+        # No longer an MCQ: every old option goes
+        ([('question_fk', [104])], False),
+    ]
+    assert all(q.methods[0] == 'delete' for q in client.queries('MCQ_Options'))
+
+
+def test_failed_cleanup_is_reported_per_question(qbank_ingest, fake_supabase):
+    def respond(query):
+        if query.args('in_') == ('question_fk', [103]):
+            raise RuntimeError('timeout')
+        return []
+
+    written = [(1, mcq('Q1', 'a', 'b', 'c'), 101), (3, mcq('Q3', 'a', 'b'), 103)]
+    assert qbank_ingest.delete_stale_options(fake_supabase(respond), written) == {3}
+
+
+def test_source_hash_is_stored_only_after_children_succeed(qbank_ingest, fake_supabase):
+    topic_pk = 11
+    lookups = {'question_types': {'MCQ': 1, 'SHORT': 4}, 'cognitive_levels': {'RECALL': 2},
+               'difficulty_levels': {'EASY': 3}}
+    edited = mcq('Edited question', 'a', 'b')
+    failing = mcq('Question whose options fail', 'a', 'b', 'c')
+    short = question('Short question', q_type='SHORT', ans_detail={'txt': 'answer'})
+    unchanged = mcq('Unchanged question', 'a', 'b')
+
+    def content_hash(q):
+        return qbank_ingest.question_content_hash(q, topic_pk)
+
+    pks = {content_hash(q): pk for q, pk in ((edited, 1), (failing, 2), (short, 3), (unchanged, 4))}
+
+    def respond(query):
+        if query.name == 'Questions' and 'select' in query.methods:
+            return [{'content_hash': content_hash(edited), 'source_hash': 'older version'},
+                    {'content_hash': content_hash(unchanged), 'source_hash': qbank_ingest.question_source_hash(unchanged)}]
+        if query.name == 'Questions':
+            return [{'content_hash': row['content_hash'], 'question_pk': pks[row['content_hash']]}
+                    for row in query.args('upsert')[0]]
+        if query.name == 'MCQ_Options' and 'upsert' in query.methods:
+            if any(row['question_fk'] == 2 for row in query.args('upsert')[0]):
+                raise RuntimeError('options rejected')
+        return []
+
+    client = fake_supabase(respond)
+    batch = [(1, edited), (2, failing), (3, short), (4, unchanged)]
+
+    assert qbank_ingest.upsert_question_batch(client, batch, topic_pk, lookups) == 3
+
+    question_upserts = [q.args('upsert')[0] for q in client.queries('Questions') if 'upsert' in q.methods]
+    first, last = question_upserts[0], question_upserts[-1]
+    assert [row['question_text'] for row in first] == ['Edited question', 'Question whose options fail', 'Short question']
+    assert all(row['source_hash'] is None for row in first)
+    assert [(row['question_text'], row['source_hash']) for row in last] == [
+        ('Edited question', qbank_ingest.question_source_hash(edited)),
+        ('Short question', qbank_ingest.question_source_hash(short)),
+    ]
+    # Only the updated question is cleaned up, and only beyond its new letters
+    deletes = [q for q in client.queries('MCQ_Options') if 'delete' in q.methods]
+    assert [q.all_args('in_') for q in deletes] == [[('question_fk', [1]), ('option_letter', ['A', 'B'])]]
@@ -0,0 +1,88 @@
+import io
+import json
+
+import pytest
+
+from qbank_reader import StreamDecodeError, iter_json_values, iter_qbank_records
+
+
+def decode(text, chunk_size=4, **kwargs):
+    return list(iter_json_values(io.StringIO(text), chunk_size=chunk_size, **kwargs))
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('{"a": 1}\n{"a": 2}\n', [{'a': 1}, {'a': 2}]),
+    ('{"a": 1}{"b": [1, 2]}', [{'a': 1}, {'b': [1, 2]}]),
+    ('[{"a": 1}, {"a": 2}]', [{'a': 1}, {'a': 2}]),
+    ('  [ ]  ', []),
+    ('{"q": "line one\nline two"}', [{'q': 'line one\nline two'}]),
+])
+def test_layouts(text, expected):
+    assert decode(text) == expected
+
+
+def test_scalars_split_across_chunks():
+    text = '[100, -2.5e10, true, false, null, "x"]\n12345'
+    expected = [100, -2.5e10, True, False, None, 'x', 12345]
+    for chunk_size in range(1, len(text) + 1):
+        assert decode(text, chunk_size) == expected, chunk_size
+
+
+def test_unicode_escape_split_across_chunks():
+    text = '{"ur": "\\u0627\\u0631\\u062f\\u0648"}'
+    for chunk_size in range(1, len(text) + 1):
+        assert decode(text, chunk_size) == [{'ur': 'اردو'}]
+
+
+def test_error_reports_file_offset():
+    text = '{"a": 1}\n{"a": 2}\n{"a": 3,, "b": 4}\n{"a": 5}\n'
+    bad = text.index(',,') + 1
+    reference = pytest.raises(json.JSONDecodeError, json.loads, text[text.index('{"a": 3'):]).value
+    for chunk_size in (1, 3, 64):
+        with pytest.raises(StreamDecodeError) as raised:
+            decode(text, chunk_size)
+        assert raised.value.pos == bad
+        assert raised.value.lineno == 3
+        assert raised.value.colno == reference.colno
+
+
+def test_error_raised_before_reading_the_rest():
+    class CountingReader(io.StringIO):
+        reads = 0
+
+        def read(self, size=-1):
+            self.reads += 1
+            return super().read(size)
+
+    f = CountingReader('{"a": tru e}' + ' ' * 10000 + '{}')
+    with pytest.raises(StreamDecodeError):
+        list(iter_json_values(f, chunk_size=16))
+    assert f.reads < 5
+
+
+def test_truncated_input_fails_at_eof():
+    with pytest.raises(StreamDecodeError):
+        decode('{"a": [1, 2')
+
+
+def test_value_size_cap():
+    with pytest.raises(StreamDecodeError, match='exceeds 32 characters'):
+        decode('{"q": "' + 'x' * 100 + '"}', max_value_chars=32)
+
+
+def test_qbank_records_from_concatenated_and_flat_files(tmp_path):
+    path = tmp_path / 'bank.json'
+    path.write_text(
+        '{"meta": {"book": "chem-ix", "chap_num": 1, "topic_num": "1.1"}, "qs": [{"q_txt": "A"}, {"q_txt": "B"}]}\n'
+        '{"meta": {"book": "chem-ix", "chap_num": 2, "topic_num": "2.1"}, "qs": [{"q_txt": "C"}]}\n'
+        '{"book": "phy-ix", "chap_num": 3, "topic_num": "3.4", "q_txt": "D"}\n'
+        '7\n',
+        encoding='utf-8'
+    )
+    records = [(location, q['q_txt']) for location, q in iter_qbank_records(str(path))]
+    assert records == [
+        (('chem-ix', '1', '1.1'), 'A'),
+        (('chem-ix', '1', '1.1'), 'B'),
+        (('chem-ix', '2', '2.1'), 'C'),
+        (('phy-ix', '3', '3.4'), 'D'),
+    ]
@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from qbank_store import BlueprintError, QuestionStore, iter_bits, largest_remainder
+
+
+def build_store():
+    store = QuestionStore()
+    number = 0
+    for chapter in (1, 2, 3):
+        for q_type, marks in (('MCQ', 1), ('SHORT', 2), ('LONG', 8)):
+            for cog_lvl in ('RECALL', 'UNDERSTAND', 'APPLY', 'APPLY'):
+                number += 1
+                store.add({'q_txt': f"Q{number}", 'chap_num': chapter, 'topic_num': f"{chapter}.1",
+                           'q_type': q_type, 'marks': marks, 'cog_lvl': cog_lvl,
+                           'is_imp': number % 5 == 0, 'tags': ['numerical'] if number % 3 == 0 else []})
+    return store
+
+
+def test_helpers():
+    assert list(iter_bits(0b101001)) == [0, 3, 5]
+    assert largest_remainder(5, [1, 1, 1]) == [2, 2, 1]
+    assert sum(largest_remainder(7, [0.2, 0.5, 0.3])) == 7
+
+
+def test_mask_filters():
+    store = build_store()
+    assert len(store) == 36
+    assert store.count(chapter=1) == 12
+    assert store.count(chapter='1', q_type='MCQ') == 4
+    assert store.count(chapter=[1, 2], q_type='LONG', cog_lvl='APPLY') == 4
+    assert store.count(tags='numerical') == 12
+    assert store.count(is_imp=1) == 7
+    assert [q['q_txt'] for q in store.select(store.mask(chapter=3, q_type='LONG', cog_lvl='RECALL'))] == ['Q33']
+    with pytest.raises(KeyError):
+        store.mask(colour='red')
+
+
+def test_assemble_respects_filters_cog_mix_and_seed():
+    store = build_store()
+    blueprint = {
+        'filters': {'chapter': [1, 2]},
+        'cog_mix': {'APPLY': 0.5},
+        'slots': [{'q_type': 'MCQ', 'count': 4}, {'q_type': 'LONG', 'marks': 8, 'count': 2}],
+    }
+    paper = store.assemble(blueprint, seed=7)
+
+    questions = [q for slot in paper for q in slot['questions']]
+    assert [len(slot['questions']) for slot in paper] == [4, 2]
+    assert len({q['q_txt'] for q in questions}) == 6
+    assert all(q['chap_num'] in (1, 2) for q in questions)
+    assert all(q['q_type'] == 'MCQ' for q in paper[0]['questions'])
+    assert sum(q['cog_lvl'] == 'APPLY' for q in questions) == 3
+    assert store.assemble(blueprint, seed=7) == paper
+
+
+def test_assemble_tops_up_when_a_quota_cannot_be_met():
+    store = build_store()
+    paper = store.assemble({'filters': {'chapter': 1}, 'cog_mix': {'RECALL': 1.0},
+                            'slots': [{'q_type': 'MCQ', 'count': 3}]}, seed=1)
+    assert len(paper[0]['questions']) == 3
+
+
+def test_assemble_fails_when_the_pool_is_too_small():
+    with pytest.raises(BlueprintError):
+        build_store().assemble({'filters': {'chapter': 1}, 'slots': [{'q_type': 'LONG', 'count': 5}]})
+
+
+class FakeQuery:
+    """Just enough of the postgrest builder for from_supabase; pages are capped like PostgREST max-rows"""
+
+    def __init__(self, rows, max_rows):
+        self.rows = rows
+        self.max_rows = max_rows
+        self.after = 0
+        self.calls = 0
+
+    def table(self, name):
+        return self
+
+    def select(self, columns):
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, count):
+        self.count = min(count, self.max_rows)
+        return self
+
+    def execute(self):
+        self.calls += 1
+        return SimpleNamespace(data=[r for r in self.rows if r['question_pk'] > self.after][:self.count])
+
+
+def test_from_supabase_reads_past_short_pages():
+    rows = [{
+        'question_pk': pk, 'question_text': f"Q{pk}", 'marks': 1, 'tags': [], 'is_important_for_exam': False,
+        'question_type_fk': 1, 'cognitive_level_fk': 2, 'difficulty_fk': 3,
+        'topics': {'topic_xml_id': '1.1', 'chapters': {'chapter_number_display': '1'}},
+    } for pk in range(1, 26)]
+    lookups = {'question_types': {'MCQ': 1}, 'cognitive_levels': {'APPLY': 2}, 'difficulty_levels': {'EASY': 3}}
+    client = FakeQuery(rows, max_rows=10)
+
+    store = QuestionStore.from_supabase(client, lookups, page_size=1000)
+
+    assert len(store) == 25
+    assert client.calls == 4
+    assert store.count(chapter=1, q_type='MCQ', cog_lvl='APPLY', diff='EASY') == 25
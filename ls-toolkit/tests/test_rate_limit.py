@@ -0,0 +1,63 @@
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter, TokenBucket, estimate_tokens
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', fake.monotonic)
+    monkeypatch.setattr(rate_limit.time, 'sleep', fake.sleep)
+    return fake
+
+
+def test_bucket_starts_full_and_refills_at_rate(clock):
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60, clock.now) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1, clock.now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, clock.now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, clock.now + 120) == 0
+    assert bucket.tokens == 60, "refill is capped at one minute's allowance"
+
+
+def test_oversized_request_waits_for_a_full_bucket_only(clock):
+    bucket = TokenBucket(100)
+    bucket.take(100)
+    assert bucket.wait_time(1000, clock.now) == pytest.approx(60.0)
+
+
+def test_limiter_bursts_then_paces_requests(clock):
+    limiter = RateLimiter(requests_per_minute=120)
+    for _ in range(120):
+        limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()
+    limiter.acquire()
+    assert sum(clock.sleeps) == pytest.approx(1.0)
+
+
+def test_limiter_paces_by_tokens(clock):
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=6000)
+    limiter.acquire(6000)
+    limiter.acquire(600)
+    assert sum(clock.sleeps) == pytest.approx(6.0)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 1
+    assert estimate_tokens('x' * 400) == 100
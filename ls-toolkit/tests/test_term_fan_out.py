@@ -0,0 +1,69 @@
+import json
+
+from enrich import TermFanOut, normalize_term
+
+
+class ListWriter:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append((row['topic_id'], row['term'], row['enrichment_data']))
+
+
+TERMS = {
+    '1.1': ['Atom', 'Ion'],
+    '1.2': ['atom', 'Molecule'],
+    '1.3': ['Covalent  Bond', 'ION'],
+}
+
+
+def test_each_normalised_term_is_enriched_once():
+    fan_out = TermFanOut(TERMS, ListWriter())
+    assert normalize_term(' Covalent  BOND ') == 'covalent bond'
+    assert fan_out.jobs == [('1.1', 'Atom'), ('1.1', 'Ion'), ('1.2', 'Molecule'), ('1.3', 'Covalent  Bond')]
+    assert len(fan_out.occurrences) == 6
+
+
+def test_rows_are_written_in_input_order_as_jobs_resolve():
+    writer = ListWriter()
+    fan_out = TermFanOut(TERMS, writer)
+
+    fan_out.resolve(2, {'id': 'molecule'})
+    fan_out.resolve(1, {'id': 'ion'})
+    assert writer.rows == [], "nothing may be written before the first term resolves"
+
+    fan_out.resolve(0, {'id': 'atom'})
+    assert [(topic, term) for topic, term, _ in writer.rows] == [
+        ('1.1', 'Atom'), ('1.1', 'Ion'), ('1.2', 'atom'), ('1.2', 'Molecule')]
+
+    fan_out.resolve(3, {'id': 'bond'})
+    assert [(topic, term, data['id']) for topic, term, data in writer.rows[4:]] == [
+        ('1.3', 'Covalent  Bond', 'bond'), ('1.3', 'ION', 'ion')]
+
+
+def test_failed_and_unrun_jobs_write_no_rows():
+    writer = ListWriter()
+    fan_out = TermFanOut(TERMS, writer)
+    fan_out.limit(2)
+    fan_out.resolve(0, None)
+    fan_out.resolve(1, {'id': 'ion'})
+    fan_out.finish()
+    assert [(topic, term) for topic, term, _ in writer.rows] == [('1.1', 'Ion'), ('1.3', 'ION')]
+
+
+def test_resume_reuses_existing_enrichments():
+    existing = [
+        {'term': 'Atom', 'topic_id': '1.1', 'enrichment_data': json.dumps({'id': 'atom'})},
+        {'term': 'Ion', 'topic_id': '1.1', 'enrichment_data': json.dumps({'id': 'ion'})},
+    ]
+    writer = ListWriter()
+    fan_out = TermFanOut(TERMS, writer, existing)
+    assert fan_out.reused == 2
+    assert fan_out.jobs == [('1.2', 'Molecule'), ('1.3', 'Covalent  Bond')]
+
+    fan_out.resolve(0, {'id': 'molecule'})
+    fan_out.resolve(1, {'id': 'bond'})
+    assert [(topic, term, data['id']) for topic, term, data in writer.rows] == [
+        ('1.2', 'atom', 'atom'), ('1.2', 'Molecule', 'molecule'),
+        ('1.3', 'Covalent  Bond', 'bond'), ('1.3', 'ION', 'ion')]
@@ -0,0 +1,81 @@
+import csv
+import json
+
+import pytest
+
+
+@pytest.fixture
+def word_ingest(import_script):
+    return import_script('word_ingest')
+
+
+def enrichment(word, topic_fk, explanation):
+    return {'word': word, 'topic_fk': topic_fk, 'book_fk': 1, 'explanation': explanation}
+
+
+def test_batch_is_one_rpc_with_later_repeats_winning(word_ingest, fake_supabase):
+    def respond(query):
+        rows = query.args('rpc')[0]['p_rows']
+        return [{'word': row['word'], 'topic_fk': row['topic_fk'], 'was_inserted': row['word'] != 'atom'}
+                for row in rows]
+
+    client = fake_supabase(respond)
+    ingester = word_ingest.EnrichmentIngester(client, book_pk=1)
+    ingester._process_batch([
+        enrichment('atom', 5, 'first'),
+        enrichment('ion', 5, 'charged'),
+        enrichment('atom', 5, 'second'),
+        enrichment('atom', 6, 'other topic'),
+    ], update_existing=True)
+
+    assert [query.name for query in client.executed] == ['upsert_topic_enrichments']
+    params = client.executed[0].args('rpc')[0]
+    assert params['p_update_existing'] is True
+    assert [(row['word'], row['topic_fk'], row['explanation']) for row in params['p_rows']] == [
+        ('atom', 5, 'second'), ('ion', 5, 'charged'), ('atom', 6, 'other topic')]
+    assert (ingester.stats['successful_inserts'], ingester.stats['updates']) == (1, 2)
+
+
+def test_skipped_existing_rows_are_not_counted(word_ingest, fake_supabase):
+    client = fake_supabase(lambda query: [{'word': 'ion', 'topic_fk': 5, 'was_inserted': True}])
+    stats = {'successful_inserts': 0, 'updates': 0, 'errors': 0}
+    word_ingest.EnrichmentIngester(client, book_pk=1)._process_batch(
+        [enrichment('atom', 5, 'x'), enrichment('ion', 5, 'y')], update_existing=False, stats=stats)
+
+    assert client.executed[0].args('rpc')[0]['p_update_existing'] is False
+    assert stats == {'successful_inserts': 1, 'updates': 0, 'errors': 0}
+
+
+def test_failed_rpc_counts_the_whole_batch_as_errors(word_ingest, fake_supabase):
+    def respond(query):
+        raise RuntimeError('statement timeout')
+
+    ingester = word_ingest.EnrichmentIngester(fake_supabase(respond), book_pk=1)
+    ingester._process_batch([enrichment('atom', 5, 'x'), enrichment('ion', 5, 'y')], update_existing=True)
+    assert ingester.stats['errors'] == 2
+
+
+def test_csv_rows_are_resolved_and_batched(tmp_path, word_ingest, fake_supabase):
+    def respond(query):
+        if query.name == 'chapters':
+            return {'chapter_pk': 40}
+        if query.name == 'topics':
+            return {'topic_pk': 50 + int(query.args('eq')[1].split('.')[1])}
+        return [dict(row, was_inserted=True) for row in query.args('rpc')[0]['p_rows']]
+
+    csv_path = tmp_path / 'enriched.csv'
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['term', 'topic_id', 'enrichment_data'])
+        for term, topic in (('Atom', '1.1'), ('Ion', '1.2'), ('Isotope', '1.1')):
+            writer.writerow([term, topic, json.dumps({'explanation': term, 'properties': {}})])
+
+    client = fake_supabase(respond)
+    ingester = word_ingest.EnrichmentIngester(client, book_pk=1)
+    ingester.process_enrichments_csv(str(csv_path), batch_size=2)
+
+    batches = [query.args('rpc')[0]['p_rows'] for query in client.queries('upsert_topic_enrichments')]
+    assert [[(row['word'], row['topic_fk']) for row in batch] for batch in batches] == [
+        [('Atom', 51), ('Ion', 52)], [('Isotope', 51)]]
+    assert len(client.queries('topics')) == 2, "topic lookups are cached"
+    assert ingester.stats['successful_inserts'] == 3
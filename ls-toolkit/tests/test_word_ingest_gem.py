@@ -0,0 +1,109 @@
+import pytest
+
+
+@pytest.fixture
+def word_ingest_gem(import_script):
+    return import_script('word_ingest_gem')
+
+
+def item(word, topic_pk, meaning='m'):
+    return {'normalized_word_text': word, 'meaning': meaning, 'explanation_detail': '', 'urdu_meaning': '',
+            'term_type': 'concept', 'properties': {}, 'topic_pk': topic_pk, 'book_fk': 2}
+
+
+def word_rows(pks, created=()):
+    """upsert_book_words response rows, newest PK first (the RPC does not preserve input order)"""
+    return [{'word_text': word, 'word_pk': pk, 'lexeme_created': word in created}
+            for word, pk in sorted(pks.items(), key=lambda entry: -entry[1])]
+
+
+def test_links_use_the_pks_returned_by_the_rpc(word_ingest_gem, fake_supabase):
+    def respond(query):
+        if query.name == 'upsert_book_words':
+            return word_rows({'atom': 7, 'ion': 9})
+        return [{'topic_fk': 5, 'word_fk': 9}]  # Only one link was new
+
+    client = fake_supabase(respond)
+    ingester = word_ingest_gem.WordDefinitionIngester(client, book_pk=2)
+    ingester._process_batch([item('atom', 5), item('ion', 5), item('atom', 5), item('atom', 6, meaning='later')])
+
+    assert [query.name for query in client.executed] == ['upsert_book_words', 'topic_words']
+    params = client.executed[0].args('rpc')[0]
+    assert params['p_book_pk'] == 2
+    assert [(row['word_text'], row['meaning']) for row in params['p_rows']] == [('atom', 'later'), ('ion', 'm')]
+
+    links = client.executed[1]
+    assert links.args('upsert')[0] == [{'topic_fk': 5, 'word_fk': 7}, {'topic_fk': 5, 'word_fk': 9},
+                                       {'topic_fk': 6, 'word_fk': 7}]
+    assert links.kwargs('upsert') == {'on_conflict': 'topic_fk, word_fk', 'ignore_duplicates': True}
+    assert (ingester.stats['words_upserted'], ingester.stats['topic_word_links_created']) == (2, 1)
+
+
+def test_words_missing_from_the_response_get_no_link(word_ingest_gem, fake_supabase):
+    client = fake_supabase(lambda query: word_rows({'atom': 7}) if query.name == 'upsert_book_words' else [])
+    word_ingest_gem.WordDefinitionIngester(client, book_pk=2)._process_batch([item('atom', 5), item('ion', 5)])
+    assert client.queries('topic_words')[0].args('upsert')[0] == [{'topic_fk': 5, 'word_fk': 7}]
+
+
+def test_failed_word_upsert_writes_no_links(word_ingest_gem, fake_supabase):
+    def respond(query):
+        raise RuntimeError('permission denied')
+
+    client = fake_supabase(respond)
+    ingester = word_ingest_gem.WordDefinitionIngester(client, book_pk=2)
+    ingester._process_batch([item('atom', 5), item('ion', 5)])
+    assert [query.name for query in client.executed] == ['upsert_book_words']
+    assert ingester.stats['errors'] == 2
+
+
+def shared_lexicon_rpc(lexicon, next_pk):
+    """Fake upsert_book_words: lexemes are shared by every book, words rows are per book"""
+    def respond(query):
+        if query.name != 'upsert_book_words':
+            return []
+        rows = []
+        for row in query.args('rpc')[0]['p_rows']:
+            created = row['word_text'] not in lexicon
+            lexicon.add(row['word_text'])
+            rows.append({'word_text': row['word_text'], 'word_pk': next(next_pk), 'lexeme_created': created})
+        return rows
+    return respond
+
+
+def test_second_book_reuses_the_shared_lexemes(word_ingest_gem, fake_supabase):
+    lexicon = {'atom'}
+    client = fake_supabase(shared_lexicon_rpc(lexicon, iter(range(1, 100))))
+
+    chemistry = word_ingest_gem.WordDefinitionIngester(client, book_pk=1)
+    chemistry._process_batch([item('atom', 5), item('ion', 5), item('isotope', 6)])
+    physics = word_ingest_gem.WordDefinitionIngester(client, book_pk=2)
+    physics._process_batch([item('atom', 9), item('ion', 9), item('wave', 9)])
+
+    assert (chemistry.stats['lexemes_created'], chemistry.stats['lexemes_reused']) == (2, 1)
+    assert (physics.stats['lexemes_created'], physics.stats['lexemes_reused']) == (1, 2)
+    assert [query.args('rpc')[0]['p_book_pk'] for query in client.queries('upsert_book_words')] == [1, 2]
+
+
+@pytest.mark.parametrize('pipelined', [False, True])
+def test_lexeme_counts_add_up_over_a_csv_run(tmp_path, word_ingest_gem, fake_supabase, pipelined):
+    rpc = shared_lexicon_rpc({'atom', 'ion'}, iter(range(1, 100)))
+
+    def respond(query):
+        if query.name == 'chapters':
+            return {'chapter_pk': 40}
+        if query.name == 'topics':
+            return {'topic_pk': 51}
+        return rpc(query)
+
+    csv_path = tmp_path / 'enriched.csv'
+    csv_path.write_text('term,topic_id,enrichment_data\n' + ''.join(
+        f'{term},1.1,"{{""explanation"": ""{term}""}}"\n' for term in ('Atom', 'Ion', 'Isotope', 'Mole', 'Atom')
+    ), encoding='utf-8')
+
+    ingester = word_ingest_gem.WordDefinitionIngester(fake_supabase(respond), book_pk=3)
+    ingester.ingest_from_csv(str(csv_path), batch_size=2, pipelined=pipelined, workers=2)
+
+    stats = ingester.stats
+    assert stats['csv_rows_processed'] == 5
+    assert (stats['words_upserted'], stats['lexemes_created'], stats['lexemes_reused']) == (5, 2, 3)
+    assert stats['errors'] == 0
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Parallel Directory Ingestion
+Ingests a book that arrives as per-chapter XML files (e.g. physics-IX-chap-N) in one run.
+Each worker thread parses and ingests one chapter, so parsing overlaps with other chapters'
+network I/O without pickling trees between processes. A global cap limits in-flight
+Supabase requests, and per-file timing/failures are reported in one summary.
+
+Like ingest_book.py, relative paths such as ../physics/... may be given relative to this
+tools/ directory; the script can be run from any working directory.
+
+Usage:
+    python ingest_directory.py ../physics/chapters --book-details physics-book.json
+    python ingest_directory.py "../physics/phy-IX-clean-chap-*.xml" --book-details physics-book.json --workers 4 --max-requests 8
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
+
+import supa_ingestv2
+from supa_ingestv2 import get_or_create_book_pk, load_xml_root, process_parsed_xml
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottledClient:
+    """
+    Wraps the Supabase client so every execute() call holds a slot in a shared semaphore.
+    Query builders are wrapped as they are chained, including those reached through
+    properties such as .not_, so the cap applies to all callers.
+    """
+
+    def __init__(self, target, semaphore: threading.Semaphore):
+        self._target = target
+        self._semaphore = semaphore
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            if hasattr(attr, 'execute'):
+                return ThrottledClient(attr, self._semaphore)
+            return attr
+
+        def wrapper(*args, **kwargs):
+            if name == 'execute':
+                with self._semaphore:
+                    return attr(*args, **kwargs)
+            result = attr(*args, **kwargs)
+            # Keep wrapping builders until execute() is reached
+            if hasattr(result, 'execute'):
+                return ThrottledClient(result, self._semaphore)
+            return result
+
+        return wrapper
+
+
+def natural_sort_key(path: str) -> List[Any]:
+    """Sort chap-2 before chap-10"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', path)]
+
+
+def resolve_path(path: str) -> str:
+    """Paths that do not exist relative to the working directory are tried relative to tools/"""
+    if os.path.isabs(path) or glob.glob(path):
+        return path
+    candidate = os.path.join(TOOLS_DIR, path)
+    return candidate if glob.glob(candidate) else path
+
+
+def collect_xml_files(source: str) -> List[str]:
+    """Resolve a directory or glob pattern to a naturally sorted list of XML files"""
+    source = resolve_path(source)
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, '*.xml'))
+    else:
+        paths = glob.glob(source)
+    return sorted((p for p in paths if os.path.isfile(p)), key=natural_sort_key)
+
+
+def chapter_order_for(root, position: int) -> int:
+    """Use a numeric chapter id when present, otherwise the file's position in the sorted list"""
+    chapter_id = (root.get('id') or '').strip()
+    return int(chapter_id) if chapter_id.isdigit() else position
+
+
+def ingest_file(xml_file_path: str, book_details: Dict[str, Any], book_pk: int,
+                position: int) -> Dict[str, Any]:
+    """Thread-pool worker: parse and ingest one chapter file"""
+    result = {
+        'file': xml_file_path,
+        'parse_seconds': 0.0,
+        'ingest_seconds': 0.0,
+        'status': 'failed',
+        'error': None
+    }
+    start = time.perf_counter()
+    try:
+        root = load_xml_root(xml_file_path)
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+    finally:
+        result['parse_seconds'] = time.perf_counter() - start
+
+    chapter_details = dict(book_details)
+    chapter_details['current_chapter_order'] = chapter_order_for(root, position)
+
+    start = time.perf_counter()
+    try:
+        process_parsed_xml(root, chapter_details, book_pk=book_pk)
+        result['status'] = 'ok'
+    except Exception as e:
+        result['error'] = str(e)
+    result['ingest_seconds'] = time.perf_counter() - start
+    return result
+
+
+def ingest_directory(source: str, book_details: Dict[str, Any], workers: int = 4,
+                     max_requests: int = 8) -> List[Dict[str, Any]]:
+    """
+    Parse and ingest every chapter file matched by source (a directory or glob).
+
+    Returns one result dict per file with parse/ingest timings, status and error.
+    """
+    xml_files = collect_xml_files(source)
+    if not xml_files:
+        logger.error(f"No XML files found for: {source}")
+        return []
+
+    logger.info(f"Found {len(xml_files)} XML files")
+    # supa_ingestv2 reads its module-level client, so throttle it for this run only
+    original_client = supa_ingestv2.supabase
+    supa_ingestv2.supabase = ThrottledClient(original_client, threading.Semaphore(max_requests))
+    results = []
+    try:
+        # Resolve the book once so concurrent chapters do not race to create it
+        book_pk = get_or_create_book_pk(book_details)
+        logger.info(f"Ingesting {len(xml_files)} files into book {book_pk} "
+                    f"({workers} workers, max {max_requests} in-flight requests)")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(ingest_file, xml_file_path, book_details, book_pk, position)
+                for position, xml_file_path in enumerate(xml_files, start=1)
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if result['status'] == 'ok':
+                    logger.info(f"Finished {result['file']} in {result['ingest_seconds']:.1f}s")
+                else:
+                    logger.error(f"Failed {result['file']}: {result['error']}")
+    finally:
+        supa_ingestv2.supabase = original_client
+
+    results.sort(key=lambda r: natural_sort_key(r['file']))
+    return results
+
+
+def print_summary(results: List[Dict[str, Any]], total_seconds: float):
+    """Print one table covering every file"""
+    print("\n" + "=" * 80)
+    print(f"{'File':<40} {'Status':<8} {'Parse s':>8} {'Ingest s':>9}")
+    print("-" * 80)
+    for r in results:
+        print(f"{os.path.basename(r['file']):<40} {r['status']:<8} {r['parse_seconds']:>8.2f} {r['ingest_seconds']:>9.2f}")
+    failures = [r for r in results if r['status'] != 'ok']
+    print("-" * 80)
+    print(f"Files: {len(results)}, succeeded: {len(results) - len(failures)}, failed: {len(failures)}, "
+          f"wall time: {total_seconds:.1f}s")
+    for r in failures:
+        print(f"  ✗ {r['file']}: {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Ingest a directory (or glob) of per-chapter XML files concurrently'
+    )
+    parser.add_argument('source', help='Directory of chapter XML files, or a glob pattern')
+    parser.add_argument('--book-details', required=True,
+                        help='JSON file with book details (same keys as ingest_book.py)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Chapters ingested concurrently (default: 4)')
+    parser.add_argument('--max-requests', type=int, default=8,
+                        help='Global cap on in-flight Supabase requests (default: 8)')
+
+    args = parser.parse_args()
+
+    with open(resolve_path(args.book_details), 'r', encoding='utf-8') as f:
+        book_details = json.load(f)
+
+    start = time.perf_counter()
+    results = ingest_directory(args.source, book_details, workers=args.workers, max_requests=args.max_requests)
+    print_summary(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Local LLM Stub Server
+Speaks both the DeepSeek/OpenAI chat API (POST /v1/chat/completions) and Ollama's
+POST /api/generate, with configurable latency, jitter and error rate, so wordex,
+enrich and simpex (and backend failover/hedging) can be exercised offline.
+
+Enrichment prompts get well-formed answers: a single-term prompt ('Now analyze: "X"')
+returns one enrichment object, a batch prompt ('TERMS:' list) returns a JSON array,
+and a repair prompt ('Now repair: "X"') returns just the fields it lists. With
+--invalid-rate, that fraction of enrichments comes back with broken fields.
+Anything else gets --text.
+
+Usage:
+    python llm_stub_server.py --port 8765 --latency 0.3 --error-rate 0.1
+    python ../enrich.py terms.txt --apikey x --deepseek-url http://127.0.0.1:8765/v1/chat/completions
+    python ../enrich.py terms.txt --apikey x --backend ollama --ollama-host http://127.0.0.1:8766 \
+        --fallback deepseek --deepseek-url http://127.0.0.1:8765/v1/chat/completions --hedge-after 1
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_enrichment(term: str) -> dict:
+    return {
+        "explanation": f"Stub explanation of {term}.",
+        "urdu_meaning": f"{term} (اردو)",
+        "term_type": "concept",
+        "example_sentence": f"The lesson introduces {term}.",
+        "properties": {
+            "key_principle": f"Principle behind {term}",
+            "related_concepts": [],
+            "real_world_example": f"Everyday example of {term}"
+        }
+    }
+
+
+def broken_enrichment(term: str, invalid_rate: float) -> dict:
+    """An enrichment that, with probability invalid_rate, lacks a field and has an invalid property"""
+    enrichment = stub_enrichment(term)
+    if random.random() < invalid_rate:
+        del enrichment['example_sentence']
+        enrichment['properties']['related_concepts'] = "not a list"
+    return enrichment
+
+
+def stub_repair(term: str, fields: list) -> dict:
+    full = stub_enrichment(term)
+    patch = {}
+    for field in fields:
+        if field.startswith('properties.'):
+            name = field.split('.', 1)[1]
+            patch.setdefault('properties', {})[name] = full['properties'][name]
+        else:
+            patch[field] = full[field]
+    return patch
+
+
+def stub_reply(prompt: str, default_text: str, invalid_rate: float = 0.0) -> str:
+    repair = re.findall(r'Now repair: "(.*?)"', prompt)
+    if repair:
+        fields = re.findall(r'^- (\S+)$', prompt.split('MISSING OR INVALID FIELDS:\n', 1)[1], re.MULTILINE)
+        return json.dumps(stub_repair(repair[-1], fields), ensure_ascii=False)
+    if 'TERMS:\n' in prompt:
+        terms = re.findall(r'^\d+\. (.+)$', prompt.split('TERMS:\n', 1)[1], re.MULTILINE)
+        return json.dumps([dict(broken_enrichment(term, invalid_rate), term=term) for term in terms],
+                          ensure_ascii=False)
+    single = re.findall(r'Now analyze: "(.*?)"', prompt)
+    if single:
+        return json.dumps(broken_enrichment(single[-1], invalid_rate), ensure_ascii=False)
+    return default_text
+
+
+def make_handler(args):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def _send(self, status: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            time.sleep(max(0.0, args.latency + random.uniform(-args.jitter, args.jitter)))
+            if random.random() < args.error_rate:
+                self._send(args.error_status, {"error": "stub failure"})
+                return
+
+            if self.path.rstrip('/').endswith('/api/generate'):
+                prompt = request.get('prompt', '')
+                text = stub_reply(prompt, args.text, args.invalid_rate)
+                self._send(200, {
+                    "model": request.get('model'),
+                    "response": text,
+                    "done": True,
+                    "prompt_eval_count": len(prompt) // 4,
+                    "eval_count": len(text) // 4
+                })
+            elif self.path.rstrip('/').endswith('/chat/completions'):
+                prompt = (request.get('messages') or [{}])[-1].get('content', '')
+                text = stub_reply(prompt, args.text, args.invalid_rate)
+                prompt_tokens = sum(len(m.get('content', '')) for m in request.get('messages', [])) // 4
+                self._send(200, {
+                    "model": request.get('model'),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(text) // 4,
+                        "total_tokens": prompt_tokens + len(text) // 4
+                    }
+                })
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stub for the DeepSeek chat and Ollama generate APIs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds per response (default: 0.2)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds added to latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail (default: 0)')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status for failures (default: 503)')
+    parser.add_argument('--invalid-rate', type=float, default=0.0,
+                        help='Fraction of enrichments returned with missing/invalid fields (default: 0)')
+    parser.add_argument('--text', default='stub,response', help='Reply for prompts that are not enrichment requests')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f"🧪 LLM stub listening on http://{args.host}:{args.port} "
+          f"(latency {args.latency}s ±{args.jitter}s, {args.error_rate:.0%} errors)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
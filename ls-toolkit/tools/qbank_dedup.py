@@ -0,0 +1,232 @@
+"""
+Near-duplicate detection for question banks.
+
+Banks assembled from many past papers repeat the same question with small
+wording changes. Question texts are shingled, reduced to MinHash signatures and
+bucketed with LSH banding, so candidate pairs are found in roughly linear time;
+candidates are then confirmed with an exact Jaccard check on their shingles.
+Only questions of the same type in the same topic are compared, so a reworded
+question in another chapter keeps its own row. Duplicates are folded into the
+first occurrence (the canonical question), whose `yr_app` / `exam_ref` metadata
+is extended with theirs.
+
+Usage:
+    python qbank_dedup.py qbank.json --report dedup_report.json
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import zlib
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from qbank_reader import iter_qbank_records
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', (text or '').lower()).split())
+
+
+def shingle(text: str, k: int = 5) -> FrozenSet[int]:
+    """Character k-gram shingles of the normalized text, hashed to 32-bit ints"""
+    normalized = normalize_text(text)
+    if len(normalized) <= k:
+        return frozenset([zlib.crc32(normalized.encode('utf-8'))]) if normalized else frozenset()
+    return frozenset(
+        zlib.crc32(normalized[i:i + k].encode('utf-8'))
+        for i in range(len(normalized) - k + 1)
+    )
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHashLSH:
+    """
+    MinHash signatures with LSH banding.
+
+    With the default 16 bands of 4 rows, pairs at Jaccard 0.8 become candidates
+    with probability > 0.99 while pairs below ~0.4 rarely do.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._buckets: Dict[Tuple[Any, int, Tuple[int, ...]], List[Any]] = {}
+
+    def signature(self, shingles: FrozenSet[int]) -> Tuple[int, ...]:
+        if not shingles:
+            return tuple([_MERSENNE_PRIME] * self.num_perm)
+        values = list(shingles)
+        return tuple(
+            min([(a * x + b) % _MERSENNE_PRIME for x in values])
+            for a, b in self._perms
+        )
+
+    def _band_keys(self, signature: Tuple[int, ...], partition: Any):
+        for band in range(self.bands):
+            yield partition, band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def query(self, signature: Tuple[int, ...], partition: Any = None) -> List[Any]:
+        """Keys sharing at least one band with the signature, in insertion order"""
+        seen = {}
+        for band_key in self._band_keys(signature, partition):
+            for key in self._buckets.get(band_key, ()):
+                seen.setdefault(key, None)
+        return list(seen)
+
+    def insert(self, key: Any, signature: Tuple[int, ...], partition: Any = None):
+        for band_key in self._band_keys(signature, partition):
+            self._buckets.setdefault(band_key, []).append(key)
+
+
+def _merge_list(canonical: Dict[str, Any], duplicate: Dict[str, Any], field: str):
+    merged = list(canonical.get(field) or [])
+    for value in duplicate.get(field) or []:
+        if value not in merged:
+            merged.append(value)
+    if field == 'yr_app':
+        merged.sort()
+    canonical[field] = merged
+
+
+class QuestionDeduper:
+    """
+    Incremental near-duplicate detection (same partition and `q_type`, `q_txt` Jaccard >= threshold).
+
+    Questions are fed one at a time and compared against every canonical question
+    seen so far, so a streamed bank is deduplicated as a whole, not per batch.
+    Memory grows with the number of distinct questions, not with the file.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16):
+        self.threshold = threshold
+        self.lsh = MinHashLSH(num_perm=num_perm, bands=bands)
+        self.canonicals: List[Dict[str, Any]] = []
+        self.total = 0
+        self._shingles: List[FrozenSet[int]] = []
+        self._source_indexes: List[Any] = []
+        self._clusters: Dict[int, List[Dict[str, Any]]] = {}
+
+    def add(self, q: Dict[str, Any], index: Any = None, partition: Any = None) -> Tuple[int, bool]:
+        """
+        Registers a question and returns (canonical position, is_new). A new question is
+        stored as a copy in self.canonicals; a duplicate's `yr_app` / `exam_ref` are merged
+        into the canonical it matched. `index` identifies the question in the report
+        (default: the order of add() calls); `partition` is the question's topic (e.g. its
+        (book, chap_num, topic_num) or topic PK), and only questions sharing it are merged.
+        """
+        index = self.total if index is None else index
+        self.total += 1
+        shingles = shingle(q.get('q_txt'))
+        signature = self.lsh.signature(shingles)
+        bucket = (partition, q.get('q_type'))
+
+        best: Optional[Tuple[float, int]] = None
+        for candidate in self.lsh.query(signature, partition=bucket):
+            similarity = jaccard(shingles, self._shingles[candidate])
+            if similarity >= self.threshold and (best is None or similarity > best[0]):
+                best = (similarity, candidate)
+
+        if best is None:
+            position = len(self.canonicals)
+            self.lsh.insert(position, signature, partition=bucket)
+            self.canonicals.append(dict(q))
+            self._shingles.append(shingles)
+            self._source_indexes.append(index)
+            return position, True
+
+        similarity, position = best
+        canonical = self.canonicals[position]
+        _merge_list(canonical, q, 'yr_app')
+        _merge_list(canonical, q, 'exam_ref')
+        self._clusters.setdefault(position, []).append({
+            'index': index,
+            'similarity': round(similarity, 3),
+            'q_txt': q.get('q_txt'),
+        })
+        return position, False
+
+    def report(self) -> Dict[str, Any]:
+        """Totals and every cluster (canonical question plus the duplicates folded into it)"""
+        return {
+            'total_questions': self.total,
+            'canonical_questions': len(self.canonicals),
+            'duplicates_removed': self.total - len(self.canonicals),
+            'threshold': self.threshold,
+            'clusters': [
+                {
+                    'canonical_index': self._source_indexes[pos],
+                    'q_txt': self.canonicals[pos].get('q_txt'),
+                    'yr_app': self.canonicals[pos].get('yr_app'),
+                    'exam_ref': self.canonicals[pos].get('exam_ref'),
+                    'duplicates': duplicates,
+                }
+                for pos, duplicates in sorted(self._clusters.items())
+            ],
+        }
+
+
+def dedupe_questions(questions: List[Dict[str, Any]], threshold: float = 0.8,
+                     num_perm: int = 64, bands: int = 16) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Collapses near-duplicate questions of one topic (same `q_type`, `q_txt` Jaccard >= threshold).
+
+    Returns the canonical questions in their original order, with duplicates'
+    `yr_app` / `exam_ref` merged in, and a report describing every cluster.
+    Canonical dicts are copies; the input list is left untouched.
+    """
+    deduper = QuestionDeduper(threshold=threshold, num_perm=num_perm, bands=bands)
+    for q in questions:
+        deduper.add(q)
+    return deduper.canonicals, deduper.report()
+
+
+def log_dedup_report(report: Dict[str, Any], report_path: Optional[str] = None):
+    """Log a one-line summary and optionally write the full report as JSON"""
+    logger.info(f"Dedup: {report['total_questions']} questions -> {report['canonical_questions']} canonical "
+                f"({report['duplicates_removed']} near-duplicates in {len(report['clusters'])} clusters)")
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"Dedup report written to {report_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report near-duplicate questions in a question bank file')
+    parser.add_argument('qbank_file', help='Question bank JSON file')
+    parser.add_argument('--report', default='dedup_report.json', help='Where to write the JSON report')
+    parser.add_argument('--threshold', type=float, default=0.8, help='Jaccard similarity threshold (default: 0.8)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Banks are often several {meta, qs} documents concatenated, so stream them
+    deduper = QuestionDeduper(threshold=args.threshold)
+    try:
+        for index, (location, q) in enumerate(iter_qbank_records(args.qbank_file), start=1):
+            deduper.add(q, index, partition=location)
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid JSON in {args.qbank_file}: {e}; the report covers the first {deduper.total} questions")
+    log_dedup_report(deduper.report(), args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 import logging
 import os
+import hashlib
 import json
+import sys
+import time
 from supabase import create_client, Client
-from typing import Dict, Any, Optional
+from qbank_dedup import QuestionDeduper, log_dedup_report, normalize_text
+from qbank_reader import iter_qbank_records
+from typing import Dict, Any, List, Optional, Set, Tuple
 
 # --- Basic Setup ---
 logging.basicConfig(
@@ -29,20 +34,70 @@ logger.info(f"Connected to Supabase project at {SUPABASE_URL}")
 
 # --- Helper Functions ---
 
-def get_lookup_tables(supabase_client: Client) -> Dict[str, Dict[str, int]]:
+# --- Lookup Table Cache ---
+# Lookup codes change rarely, so they are cached on disk and shared by every run.
+# Bump LOOKUP_CACHE_VERSION whenever LOOKUP_MAP or the cache layout changes.
+LOOKUP_CACHE_PATH = os.environ.get(
+    "QBANK_LOOKUP_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".qbank_lookup_cache.json")
+)
+LOOKUP_CACHE_TTL_SECONDS = int(os.environ.get("QBANK_LOOKUP_CACHE_TTL", 24 * 60 * 60))
+LOOKUP_CACHE_VERSION = 1
+
+LOOKUP_MAP = {
+    'question_types': ('Question_Types', 'type_code', 'question_type_pk'),
+    'cognitive_levels': ('Cognitive_Levels', 'level_code', 'cognitive_level_pk'),
+    'difficulty_levels': ('Difficulty_Levels', 'difficulty_code', 'difficulty_pk'),
+}
+
+# JSON field holding the code for each lookup table
+LOOKUP_FIELDS = {
+    'question_types': 'q_type',
+    'cognitive_levels': 'cog_lvl',
+    'difficulty_levels': 'diff',
+}
+
+_lookup_memo: Dict[str, Dict[str, int]] = {}
+
+def _read_lookup_cache(cache_path: str, ttl_seconds: int) -> Optional[Dict[str, Dict[str, int]]]:
+    """Returns the cached lookups if the file exists, matches this version/project and is fresh."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get('version') != LOOKUP_CACHE_VERSION or cached.get('supabase_url') != SUPABASE_URL:
+        return None
+    if time.time() - cached.get('fetched_at', 0) > ttl_seconds:
+        return None
+    lookups = cached.get('lookups')
+    if not isinstance(lookups, dict) or set(lookups) != set(LOOKUP_MAP):
+        return None
+    return lookups
+
+def _write_lookup_cache(cache_path: str, lookups: Dict[str, Dict[str, int]]):
+    try:
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': LOOKUP_CACHE_VERSION,
+                'supabase_url': SUPABASE_URL,
+                'fetched_at': time.time(),
+                'lookups': lookups,
+            }, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write lookup cache {cache_path}: {e}")
+
+def fetch_lookup_tables(supabase_client: Client) -> Dict[str, Dict[str, int]]:
     """
     Fetches all lookup tables (Question_Types, Cognitive_Levels, Difficulty_Levels)
-    and caches them in a dictionary for performance.
+    from the database.
     """
     cache = {}
-    lookup_map = {
-        'question_types': ('Question_Types', 'type_code', 'question_type_pk'),
-        'cognitive_levels': ('Cognitive_Levels', 'level_code', 'cognitive_level_pk'),
-        'difficulty_levels': ('Difficulty_Levels', 'difficulty_code', 'difficulty_pk'),
-    }
-
-    logger.info("Caching lookup tables...")
-    for key, (table_name, code_col, pk_col) in lookup_map.items():
+    logger.info("Fetching lookup tables...")
+    for key, (table_name, code_col, pk_col) in LOOKUP_MAP.items():
         try:
             response = supabase_client.table(table_name).select(f"{code_col}, {pk_col}").execute()
             if response.data:
@@ -56,6 +111,64 @@ def get_lookup_tables(supabase_client: Client) -> Dict[str, Dict[str, int]]:
             raise
     return cache
 
+def get_lookup_tables(supabase_client: Client, refresh: bool = False,
+                      cache_path: Optional[str] = LOOKUP_CACHE_PATH,
+                      ttl_seconds: int = LOOKUP_CACHE_TTL_SECONDS) -> Dict[str, Dict[str, int]]:
+    """
+    Returns the lookup code -> PK mappings, from memory, then the on-disk cache,
+    then the database. Pass refresh=True to bypass both caches, or cache_path=None
+    to disable the disk cache.
+    """
+    if _lookup_memo and not refresh:
+        return _lookup_memo
+
+    lookups = None
+    if cache_path and not refresh:
+        lookups = _read_lookup_cache(cache_path, ttl_seconds)
+        if lookups is not None:
+            logger.info(f"Loaded lookup tables from cache {cache_path}")
+
+    if lookups is None:
+        lookups = fetch_lookup_tables(supabase_client)
+        if cache_path:
+            _write_lookup_cache(cache_path, lookups)
+
+    _lookup_memo.clear()
+    _lookup_memo.update(lookups)
+    return _lookup_memo
+
+def find_unknown_codes(questions, lookups: Dict[str, Dict[str, int]]) -> Dict[str, Set[Any]]:
+    """
+    Collects codes that do not resolve to a lookup PK (including missing ones),
+    keyed by JSON field. `questions` may be any iterable of question dicts.
+    """
+    unknown: Dict[str, Set[Any]] = {}
+    for q in questions:
+        for key, field in LOOKUP_FIELDS.items():
+            code = q.get(field)
+            if code not in lookups[key]:
+                unknown.setdefault(field, set()).add(code)
+    return unknown
+
+def validate_lookup_codes(supabase_client: Client, questions,
+                          lookups: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    """
+    Ensures every question's q_type/cog_lvl/diff resolves before anything is inserted.
+
+    Unknown codes trigger one refresh from the database (the cache may predate a
+    newly added code); if they are still unknown a ValueError is raised.
+    Returns the (possibly refreshed) lookups. `questions` must be re-iterable.
+    """
+    unknown = find_unknown_codes(questions, lookups)
+    if unknown:
+        logger.info("Unknown lookup codes found, refreshing lookup tables from database")
+        lookups = get_lookup_tables(supabase_client, refresh=True)
+        unknown = find_unknown_codes(questions, lookups)
+    if unknown:
+        details = "; ".join(f"{field}: {sorted(map(str, codes))}" for field, codes in unknown.items())
+        raise ValueError(f"Unknown lookup codes: {details}")
+    return lookups
+
 def get_topic_pk(supabase_client: Client, book_title: str, chapter_num: str, topic_num: str) -> Optional[int]:
     """
     Finds the primary key of a topic based on book title, chapter, and topic number.
@@ -90,11 +203,241 @@ def get_topic_pk(supabase_client: Client, book_title: str, chapter_num: str, top
         logger.error(f"An error occurred while finding the topic_pk: {e}")
         return None
 
+# --- Row Builders ---
+
+def question_content_hash(q: Dict[str, Any], topic_pk: int) -> str:
+    """
+    Natural key of a question: its topic, type and normalised text. Re-importing the
+    same question (even with whitespace/punctuation edits) maps to the same row.
+    """
+    key = f"{topic_pk}|{q.get('q_type')}|{normalize_text(q.get('q_txt'))}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def question_source_hash(q: Dict[str, Any]) -> str:
+    """Fingerprint of the full JSON question (options and answer included), used to skip unchanged rows."""
+    return hashlib.sha256(json.dumps(q, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def build_question_row(q: Dict[str, Any], topic_pk: int, lookups: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """Maps a JSON question onto a `Questions` row."""
+    return {
+        'topic_fk': topic_pk,
+        'question_type_fk': lookups['question_types'].get(q.get('q_type')),
+        'cognitive_level_fk': lookups['cognitive_levels'].get(q.get('cog_lvl')),
+        'difficulty_fk': lookups['difficulty_levels'].get(q.get('diff')),
+        'question_text': q.get('q_txt'),
+        'marks': q.get('marks'),
+        'tags': q.get('tags'),
+        'keywords': q.get('keywords'),
+        'year_appeared': q.get('yr_app'),
+        'exam_references': q.get('exam_ref'),
+        'is_important_for_exam': q.get('is_imp', False),
+        'is_frequently_asked': q.get('is_freq', False),
+        'content_hash': question_content_hash(q, topic_pk),
+        'source_hash': question_source_hash(q),
+    }
+
+def build_option_rows(q: Dict[str, Any], question_pk: int) -> List[Dict[str, Any]]:
+    """Builds `MCQ_Options` rows for an MCQ question."""
+    if q.get('q_type') != 'MCQ':
+        return []
+    options = []
+    for i, opt in enumerate(q.get('opts', [])):
+        options.append({
+            'question_fk': question_pk,
+            'option_letter': chr(ord('A') + i),
+            'option_text': opt.get('txt'),
+            'is_correct': opt.get('correct', False),
+            'explanation_if_wrong': q.get('ans_exp') if not opt.get('correct') else None
+        })
+    return options
+
+def build_answer_rows(q: Dict[str, Any], question_pk: int) -> List[Dict[str, Any]]:
+    """Builds the `Question_Answers` row for LONG/SHORT/NUMERICAL questions."""
+    if q.get('q_type') not in ['LONG', 'SHORT', 'NUMERICAL']:
+        return []
+    ans_detail = q.get('ans_detail', {})
+    return [{
+        'question_fk': question_pk,
+        'answer_text': ans_detail.get('txt'),
+        'explanation': ans_detail.get('exp'),
+        'total_marks': q.get('marks'),
+        # You can expand this to handle JSON fields like 'answer_points'
+    }]
+
+def _question_label(index: int, q: Dict[str, Any]) -> str:
+    return f"#{index} ({(q.get('q_txt') or 'N/A')[:50]}...)"
+
+# --- Bulk Upsert Helpers ---
+
+def get_existing_source_hashes(supabase_client: Client, content_hashes: List[str]) -> Dict[str, str]:
+    """Returns content_hash -> source_hash for questions already in the database."""
+    if not content_hashes:
+        return {}
+    response = supabase_client.table('Questions').select('content_hash, source_hash').in_('content_hash', content_hashes).execute()
+    return {row['content_hash']: row['source_hash'] for row in response.data or []}
+
+def upsert_questions_bulk(supabase_client: Client, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Upserts question rows on `content_hash` in one request and returns content_hash -> PK.
+    Raises if the response does not contain every row.
+    """
+    response = supabase_client.table('Questions').upsert(rows, on_conflict='content_hash').execute()
+    pks = {row['content_hash']: row['question_pk'] for row in response.data or []}
+    if len(pks) != len(rows):
+        raise Exception(f"Bulk upsert returned {len(pks)} rows for {len(rows)} questions")
+    return pks
+
+def upsert_child_rows(supabase_client: Client, table_name: str, on_conflict: str,
+                      rows_by_question: List[Tuple[int, Dict[str, Any], List[Dict[str, Any]]]]) -> Set[int]:
+    """
+    Upserts option/answer rows for many questions in one request, falling back to
+    one request per question on failure. Returns the indexes of questions whose rows failed.
+    """
+    all_rows = [row for _, _, rows in rows_by_question for row in rows]
+    if not all_rows:
+        return set()
+
+    try:
+        supabase_client.table(table_name).upsert(all_rows, on_conflict=on_conflict).execute()
+        return set()
+    except Exception as e:
+        logger.warning(f"Bulk upsert into {table_name} failed ({e}); retrying row by row")
+
+    failed_indexes = set()
+    for index, q, rows in rows_by_question:
+        if not rows:
+            continue
+        try:
+            supabase_client.table(table_name).upsert(rows, on_conflict=on_conflict).execute()
+        except Exception as row_error:
+            logger.error(f"Failed to upsert {table_name} for question {_question_label(index, q)}: {row_error}")
+            failed_indexes.add(index)
+    return failed_indexes
+
+def delete_stale_options(supabase_client: Client, written: List[Tuple[int, Dict[str, Any], int]]) -> Set[int]:
+    """
+    Deletes `MCQ_Options` rows an earlier version of each question had but the new one
+    does not (an option removed in an edit, or a question that is no longer an MCQ).
+    Questions are grouped by their new option letters, so this is one delete per
+    distinct option count. Returns the indexes of questions whose cleanup failed.
+    """
+    questions_by_letters: Dict[Tuple[str, ...], List[Tuple[int, int]]] = {}
+    for index, q, pk in written:
+        letters = tuple(row['option_letter'] for row in build_option_rows(q, pk))
+        questions_by_letters.setdefault(letters, []).append((index, pk))
+
+    failed_indexes = set()
+    for letters, questions in questions_by_letters.items():
+        query = supabase_client.table('MCQ_Options').delete().in_('question_fk', [pk for _, pk in questions])
+        if letters:
+            query = query.not_.in_('option_letter', list(letters))
+        try:
+            query.execute()
+        except Exception as e:
+            logger.error(f"Failed to delete stale options for {len(questions)} questions: {e}")
+            failed_indexes.update(index for index, _ in questions)
+    return failed_indexes
+
+def upsert_question_batch(supabase_client: Client, batch: List[Tuple[int, Dict[str, Any]]],
+                          topic_pk: int, lookups: Dict[str, Dict[str, int]]) -> int:
+    """
+    Idempotently writes a batch of (index, question) pairs.
+
+    One select finds questions already stored (by content hash); those whose source
+    hash is unchanged are skipped entirely. The rest are written with three bulk
+    upserts: questions, then all MCQ options, then all answers; options dropped
+    from updated questions are deleted. If a bulk request fails, the batch falls
+    back to per-row upserts so each failing question is still reported individually.
+
+    The source hash is only stored once a question's options and answers are
+    written, so a question whose children failed is retried on the next import.
+    Returns the number of questions fully processed, unchanged ones included.
+    """
+    # Exact repeats within a batch would make one upsert touch the same row twice
+    rows_by_hash: Dict[str, Tuple[int, Dict[str, Any], Dict[str, Any]]] = {}
+    for index, q in batch:
+        row = build_question_row(q, topic_pk, lookups)
+        if row['content_hash'] in rows_by_hash:
+            logger.warning(f"Skipping question {_question_label(index, q)}: same content as "
+                           f"question #{rows_by_hash[row['content_hash']][0]}")
+            continue
+        rows_by_hash[row['content_hash']] = (index, q, row)
+
+    existing = get_existing_source_hashes(supabase_client, list(rows_by_hash))
+    pending = [
+        (index, q, row) for content_hash, (index, q, row) in rows_by_hash.items()
+        if existing.get(content_hash) != row['source_hash']
+    ]
+    unchanged = len(rows_by_hash) - len(pending)
+    if not pending:
+        logger.info(f"All {unchanged} questions unchanged, nothing to write")
+        return unchanged
+
+    # 1. Questions without their source hash yet, PKs are matched back by content hash
+    written: List[Tuple[int, Dict[str, Any], int]] = []
+    try:
+        pks = upsert_questions_bulk(supabase_client, [dict(row, source_hash=None) for _, _, row in pending])
+        written = [(index, q, pks[row['content_hash']]) for index, q, row in pending]
+    except Exception as e:
+        logger.warning(f"Bulk question upsert failed ({e}); retrying batch row by row")
+        for index, q, row in pending:
+            try:
+                pk = upsert_questions_bulk(supabase_client, [dict(row, source_hash=None)])[row['content_hash']]
+                written.append((index, q, pk))
+            except Exception as row_error:
+                logger.error(f"Failed to upsert question {_question_label(index, q)}: {row_error}")
+
+    updated = sum(1 for _, _, row in pending if row['content_hash'] in existing)
+    logger.info(f"Questions: {len(pending) - updated} new, {updated} updated, {unchanged} unchanged")
+    if not written:
+        return unchanged
+
+    # 2 & 3. Options and answers for the written questions
+    options_by_question = [(index, q, build_option_rows(q, pk)) for index, q, pk in written]
+    answers_by_question = [(index, q, build_answer_rows(q, pk)) for index, q, pk in written]
+
+    failed_indexes = upsert_child_rows(supabase_client, 'MCQ_Options', 'question_fk, option_letter', options_by_question)
+    failed_indexes |= upsert_child_rows(supabase_client, 'Question_Answers', 'question_fk', answers_by_question)
+    updated_indexes = {index for index, _, row in pending if row['content_hash'] in existing}
+    failed_indexes |= delete_stale_options(
+        supabase_client, [(index, q, pk) for index, q, pk in written if index in updated_indexes]
+    )
+
+    # 4. Mark complete questions as imported; the rest keep a NULL source hash and are rewritten next time
+    written_indexes = {index for index, _, _ in written}
+    complete_rows = [row for index, _, row in pending if index in written_indexes and index not in failed_indexes]
+    if complete_rows:
+        try:
+            upsert_questions_bulk(supabase_client, complete_rows)
+        except Exception as e:
+            logger.warning(f"Failed to store source hashes ({e}); these questions will be rewritten on the next import")
+
+    return unchanged + len(written) - len(failed_indexes)
+
+# --- Deduplication ---
+
+def dedupe_batch(batch: List[Tuple[int, Dict[str, Any]]], deduper: QuestionDeduper) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Feeds (index, question) pairs to `deduper`, which remembers every canonical
+    question seen so far, and returns the pairs that are new canonicals. Their
+    questions are the deduper's copies, so metadata merged from later duplicates
+    lands on them.
+    """
+    kept = []
+    for index, q in batch:
+        position, is_new = deduper.add(q, index)
+        if is_new:
+            kept.append((index, deduper.canonicals[position]))
+    return kept
+
 # --- Main Ingestion Logic ---
 
-def process_qbank_json(file_path: str):
+def process_qbank_json(file_path: str, batch_size: int = 100, dedupe: bool = True,
+                       dedup_report_path: Optional[str] = None):
     """
     Processes a given JSON question bank file and ingests it into the new SQL schema.
+    Questions are written in bulk batches of `batch_size`. With `dedupe`, near-duplicate
+    questions are folded into one canonical question before anything is inserted.
     """
     logger.info(f"Starting ingestion for file: {file_path}")
 
@@ -134,76 +477,184 @@ def process_qbank_json(file_path: str):
         logger.critical("Failed to load lookup tables from database. Aborting.")
         return
 
-    # Process each question
+    # Fail fast on codes that would otherwise be inserted as NULL foreign keys
+    try:
+        lookups = validate_lookup_codes(supabase, questions, lookups)
+    except ValueError as e:
+        logger.critical(f"{e}. Aborting before any question is inserted.")
+        return
+
+    indexed_questions = list(enumerate(questions, start=1))
+    if dedupe:
+        deduper = QuestionDeduper()
+        indexed_questions = dedupe_batch(indexed_questions, deduper)
+        log_dedup_report(deduper.report(), dedup_report_path)
+
+    # Process questions in bulk batches
     questions_processed = 0
-    for q in questions:
+    for start in range(0, len(indexed_questions), batch_size):
+        batch = indexed_questions[start:start + batch_size]
         try:
-            # 1. Prepare data for the `Questions` table
-            question_data = {
-                'topic_fk': topic_pk,
-                'question_type_fk': lookups['question_types'].get(q.get('q_type')),
-                'cognitive_level_fk': lookups['cognitive_levels'].get(q.get('cog_lvl')),
-                'difficulty_fk': lookups['difficulty_levels'].get(q.get('diff')),
-                'question_text': q.get('q_txt'),
-                'marks': q.get('marks'),
-                'tags': q.get('tags'),
-                'keywords': q.get('keywords'),
-                'year_appeared': q.get('yr_app'),
-                'exam_references': q.get('exam_ref'),
-                'is_important_for_exam': q.get('is_imp', False),
-                'is_frequently_asked': q.get('is_freq', False),
-            }
-
-            # Insert question and get its new primary key
-            response = supabase.table('Questions').insert(question_data).execute()
-            if not response.data:
-                logger.error(f"Failed to insert question: {q.get('q_txt')[:50]}...")
-                logger.error(f"Error details: {response.error}")
-                continue
+            questions_processed += upsert_question_batch(supabase, batch, topic_pk, lookups)
+        except Exception as e:
+            logger.error(f"Failed to process batch starting at question #{batch[0][0]}: {e}")
+
+    logger.info(f"--- Ingestion complete for {file_path}. ---")
+    logger.info(f"Successfully processed {questions_processed} out of {len(indexed_questions)} questions "
+                f"({len(questions) - len(indexed_questions)} near-duplicates merged).")
 
-            question_pk = response.data[0]['question_pk']
-            logger.info(f"Inserted question with PK: {question_pk}")
-
-            # 2. Handle answers and options based on question type
-            if q.get('q_type') == 'MCQ':
-                # Insert options into `MCQ_Options`
-                options_to_insert = []
-                for i, opt in enumerate(q.get('opts', [])):
-                    option_letter = chr(ord('A') + i)
-                    options_to_insert.append({
-                        'question_fk': question_pk,
-                        'option_letter': option_letter,
-                        'option_text': opt.get('txt'),
-                        'is_correct': opt.get('correct', False),
-                        'explanation_if_wrong': q.get('ans_exp') if not opt.get('correct') else None
-                    })
-                if options_to_insert:
-                    supabase.table('MCQ_Options').insert(options_to_insert).execute()
-
-            elif q.get('q_type') in ['LONG', 'SHORT', 'NUMERICAL']:
-                # Insert detailed answer into `Question_Answers`
-                ans_detail = q.get('ans_detail', {})
-                answer_data = {
-                    'question_fk': question_pk,
-                    'answer_text': ans_detail.get('txt'),
-                    'explanation': ans_detail.get('exp'),
-                    'total_marks': q.get('marks'),
-                    # You can expand this to handle JSON fields like 'answer_points'
-                }
-                supabase.table('Question_Answers').insert(answer_data).execute()
-
-            questions_processed += 1
 
+# --- Streaming Multi-Topic Ingestion ---
+
+def process_qbank_stream(file_path: str, batch_size: int = 100, dedupe: bool = True,
+                         dedup_report_path: Optional[str] = None):
+    """
+    Streams a (possibly multi-topic) question bank file into the database.
+
+    Questions are read topic by topic and flushed with upsert_question_batch once
+    `batch_size` is reached, so one file can hold an entire board's bank. With
+    `dedupe`, near-duplicates are merged within each topic, across its batches (a
+    reworded question in another topic keeps its own row, like its content hash); a
+    canonical question that was already written when a later duplicate extended its
+    `yr_app` / `exam_ref` is written again when the topic ends. The near-duplicate
+    index is dropped at that point, so memory is bounded by the largest topic, not
+    the file. Files should therefore keep each topic's questions together; a topic
+    that reappears later is still written, but only merged within each run. The
+    dedup report keeps every cluster in memory, so only request it when needed.
+
+    A first pass over the file validates lookup codes, so a bad code aborts the
+    run before any insert.
+    """
+    logger.info(f"Starting streaming ingestion for file: {file_path}")
+
+    try:
+        lookups = get_lookup_tables(supabase)
+    except Exception:
+        logger.critical("Failed to load lookup tables from database. Aborting.")
+        return
+
+    # Validation pass: only the distinct code combinations are kept in memory
+    try:
+        fields = list(LOOKUP_FIELDS.values())
+        code_combinations = {tuple(q.get(field) for field in fields) for _, q in iter_qbank_records(file_path)}
+        lookups = validate_lookup_codes(supabase, [dict(zip(fields, codes)) for codes in code_combinations], lookups)
+    except FileNotFoundError:
+        logger.critical(f"File not found: {file_path}")
+        return
+    except json.JSONDecodeError as e:
+        logger.critical(f"Invalid JSON in file {file_path}: {e}")
+        return
+    except ValueError as e:
+        logger.critical(f"{e}. Aborting before any question is inserted.")
+        return
+
+    topic_pk_cache: Dict[Tuple[str, str, str], Optional[int]] = {}
+    stats = {'read': 0, 'processed': 0, 'missing_topic': 0, 'rewritten': 0}
+    dedup_report = {'total_questions': 0, 'canonical_questions': 0, 'duplicates_removed': 0,
+                    'threshold': None, 'clusters': []}
+    current_topic: Optional[int] = None
+    finished_topics: Set[int] = set()
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    # State of the current topic only: its near-duplicate index, the deduper positions of
+    # the pending questions, canonical position -> index once flushed, and the flushed
+    # canonicals a later duplicate extended
+    deduper = QuestionDeduper() if dedupe else None
+    pending_positions: List[int] = []
+    written_canonicals: Dict[int, int] = {}
+    stale_canonicals: Dict[int, int] = {}
+
+    def write(topic_pk: int, batch: List[Tuple[int, Dict[str, Any]]]) -> int:
+        try:
+            return upsert_question_batch(supabase, batch, topic_pk, lookups)
         except Exception as e:
-            logger.error(f"Failed to process a question ({q.get('q_txt', 'N/A')[:50]}...): {e}")
+            logger.error(f"Failed to process batch starting at question #{batch[0][0]}: {e}")
+            return 0
 
-    logger.info(f"--- Ingestion complete for {file_path}. ---")
-    logger.info(f"Successfully processed {questions_processed} out of {len(questions)} questions.")
+    def flush():
+        nonlocal pending, pending_positions
+        if pending:
+            stats['processed'] += write(current_topic, pending)
+        for position, (index, _) in zip(pending_positions, pending):
+            written_canonicals[position] = index
+        pending, pending_positions = [], []
+
+    def finish_topic():
+        """Flush the current topic, rewrite its extended canonicals and drop its index"""
+        nonlocal deduper, written_canonicals, stale_canonicals
+        flush()
+        if not deduper:
+            return
+        if stale_canonicals:
+            logger.info(f"Rewriting {len(stale_canonicals)} already written questions of topic {current_topic} "
+                        f"with metadata merged from later duplicates")
+            stale = [(index, deduper.canonicals[position]) for position, index in stale_canonicals.items()]
+            for start in range(0, len(stale), batch_size):
+                stats['rewritten'] += write(current_topic, stale[start:start + batch_size])
+        report = deduper.report()
+        for key in ('total_questions', 'canonical_questions', 'duplicates_removed'):
+            dedup_report[key] += report[key]
+        dedup_report['threshold'] = report['threshold']
+        if dedup_report_path:
+            dedup_report['clusters'] += [dict(cluster, topic_pk=current_topic) for cluster in report['clusters']]
+        deduper = QuestionDeduper()
+        written_canonicals, stale_canonicals = {}, {}
+
+    try:
+        for index, (location, q) in enumerate(iter_qbank_records(file_path), start=1):
+            stats['read'] += 1
+
+            if location not in topic_pk_cache:
+                topic_pk_cache[location] = get_topic_pk(supabase, *location)
+            topic_pk = topic_pk_cache[location]
+            if not topic_pk:
+                logger.error(f"No topic for question {_question_label(index, q)} at {location}")
+                stats['missing_topic'] += 1
+                continue
+
+            if topic_pk != current_topic:
+                if current_topic is not None:
+                    finish_topic()
+                    finished_topics.add(current_topic)
+                if topic_pk in finished_topics:
+                    logger.warning(f"Topic {location} resumes at question #{index} after other topics; "
+                                   f"near-duplicates are only merged within each run of a topic")
+                current_topic = topic_pk
+
+            if deduper:
+                position, is_new = deduper.add(q, index)
+                if not is_new:
+                    if position in written_canonicals:
+                        stale_canonicals[position] = written_canonicals[position]
+                    continue
+                q = deduper.canonicals[position]
+                pending_positions.append(position)
+
+            pending.append((index, q))
+            if len(pending) >= batch_size:
+                flush()
+
+    except FileNotFoundError:
+        logger.critical(f"File not found: {file_path}")
+        return
+    except json.JSONDecodeError as e:
+        logger.critical(f"Invalid JSON in file {file_path}: {e}")
+    finally:
+        if current_topic is not None:
+            finish_topic()
+
+    if dedupe:
+        log_dedup_report(dedup_report, dedup_report_path)
+
+    logger.info(f"--- Streaming ingestion complete for {file_path}. ---")
+    logger.info(f"Successfully processed {stats['processed']} out of {stats['read']} questions "
+                f"across {len(topic_pk_cache)} topics ({stats['missing_topic']} without a topic, "
+                f"{dedup_report['duplicates_removed']} near-duplicates merged, "
+                f"{stats['rewritten']} questions rewritten with merged metadata).")
 
 
 # --- Main Execution Block ---
 if __name__ == "__main__":
-    # The JSON file to be processed.
-    # Make sure this file is in the same directory as the script.
-    qbank_file = "qbank.json"
-    process_qbank_json(qbank_file)
+    # The question bank file to be processed (.json, .jsonl or concatenated meta/qs documents).
+    # Make sure this file is in the same directory as the script, or pass its path.
+    qbank_file = sys.argv[1] if len(sys.argv) > 1 else "qbank.json"
+    process_qbank_stream(qbank_file)
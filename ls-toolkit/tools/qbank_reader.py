@@ -0,0 +1,145 @@
+"""
+Readers for question bank files.
+
+A bank may be a single `{"meta": ..., "qs": [...]}` document, several such
+documents concatenated, JSON Lines, or a top-level array of records that each
+carry their own `book`, `chap_num` and `topic_num`. Files are decoded
+incrementally so memory is bounded by the largest single value.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Numbers and literals are not self-delimiting: "10" may be the start of "100"
+_SCALAR_DELIMITERS = frozenset(' \t\r\n,]}')
+# Errors this close to the end of the buffer may just be a value cut off by the chunk
+# boundary ('fals', '-', '\\u12'); they are retried once more input arrives
+_TRUNCATION_SLACK = 6
+# Largest single value (e.g. one legacy {"meta", "qs"} document) held in memory
+MAX_VALUE_CHARS = 64 * 1024 * 1024
+
+
+class StreamDecodeError(json.JSONDecodeError):
+    """JSONDecodeError whose position is an offset into the whole file, not the decode buffer"""
+
+    def __init__(self, msg: str, pos: int, lineno: int, colno: int):
+        ValueError.__init__(self, f"{msg}: line {lineno} column {colno} (char {pos})")
+        self.msg = msg
+        self.doc = ''
+        self.pos = pos
+        self.lineno = lineno
+        self.colno = colno
+
+    def __reduce__(self):
+        return self.__class__, (self.msg, self.pos, self.lineno, self.colno)
+
+
+def iter_json_values(f, chunk_size: int = 64 * 1024, max_value_chars: int = MAX_VALUE_CHARS) -> Iterator[Any]:
+    """
+    Incrementally decodes JSON values from a file object, reading it in chunks.
+
+    Handles JSON Lines, concatenated documents and a single top-level array
+    (whose elements are yielded one at a time), so memory stays bounded by the
+    largest single value rather than the file size. Raw newlines inside strings
+    (common in hand-edited banks) are tolerated.
+
+    Invalid JSON raises StreamDecodeError with its file offset as soon as more
+    input cannot fix it, and so does a value longer than `max_value_chars`.
+    """
+    decoder = json.JSONDecoder(strict=False)
+    buffer = ''
+    # Stream position of buffer[0], for error reporting
+    offset = 0
+    line = 1
+    line_start = 0
+    read_size = chunk_size
+    in_array = False
+    eof = False
+
+    def consume(count: int):
+        nonlocal buffer, offset, line, line_start
+        removed = buffer[:count]
+        newlines = removed.count('\n')
+        if newlines:
+            line += newlines
+            line_start = offset + removed.rfind('\n') + 1
+        offset += count
+        buffer = buffer[count:]
+
+    def skip_whitespace():
+        consume(len(buffer) - len(buffer.lstrip()))
+
+    def stream_error(msg: str, pos: int) -> StreamDecodeError:
+        newlines = buffer.count('\n', 0, pos)
+        if newlines:
+            colno = pos - buffer.rfind('\n', 0, pos)
+        else:
+            colno = offset + pos - line_start + 1
+        return StreamDecodeError(msg, offset + pos, line + newlines, colno)
+
+    while True:
+        skip_whitespace()
+        if in_array and buffer[:1] == ',':
+            consume(1)
+            skip_whitespace()
+        if buffer[:1] == '[' and not in_array:
+            in_array = True
+            consume(1)
+            skip_whitespace()
+        if in_array and buffer[:1] == ']':
+            in_array = False
+            consume(1)
+            skip_whitespace()
+
+        if buffer:
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError as e:
+                truncated = e.msg.startswith('Unterminated string') or e.pos >= len(buffer) - _TRUNCATION_SLACK
+                if eof or not truncated:
+                    raise stream_error(e.msg, e.pos) from None
+            else:
+                if (eof or isinstance(value, (dict, list, str))
+                        or (end < len(buffer) and buffer[end] in _SCALAR_DELIMITERS)):
+                    consume(end)
+                    read_size = chunk_size
+                    yield value
+                    continue
+            if len(buffer) > max_value_chars:
+                raise stream_error(f"Value exceeds {max_value_chars} characters", 0)
+
+        if eof:
+            return
+        chunk = f.read(read_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+        # Grow reads while a single value spans several chunks
+        read_size *= 2
+
+
+def iter_qbank_records(file_path: str) -> Iterator[Tuple[Tuple[str, str, str], Dict[str, Any]]]:
+    """
+    Yields ((book, chap_num, topic_num), question) pairs from a question bank file.
+
+    Each record may carry its own `book`, `chap_num` and `topic_num` (JSON Lines or
+    a streamed array), or be a legacy `{"meta": ..., "qs": [...]}` document whose
+    meta applies to all of its questions. Several legacy documents may be concatenated.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for value in iter_json_values(f):
+            if not isinstance(value, dict):
+                logger.warning(f"Skipping non-object JSON value in {file_path}")
+                continue
+
+            if 'qs' in value:
+                meta = value.get('meta', {})
+                location = (meta.get('book'), str(meta.get('chap_num')), meta.get('topic_num'))
+                for q in value.get('qs', []):
+                    yield location, q
+            else:
+                yield (value.get('book'), str(value.get('chap_num')), value.get('topic_num')), value
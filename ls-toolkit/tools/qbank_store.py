@@ -0,0 +1,303 @@
+"""
+In-memory question store for paper assembly.
+
+The question bank is loaded once into column lists, and every filterable
+attribute (chapter, topic, q_type, cog_lvl, diff, marks, is_imp, tags) gets a
+bitmap index: one Python int per value whose set bits are the row numbers
+holding it. Filters are bitwise AND/OR over those ints, so a blueprint such as
+"5 MCQ, 2 LONG of 8 marks, 40% APPLY, chapters 1-3" is answered in
+milliseconds without a Supabase query per slot. Sampling is seeded, so the same
+blueprint and seed always produce the same paper.
+
+Blueprint JSON:
+    {
+        "filters": {"chapter": [1, 2, 3]},
+        "cog_mix": {"APPLY": 0.4},
+        "slots": [
+            {"q_type": "MCQ", "count": 5},
+            {"q_type": "LONG", "marks": 8, "count": 2}
+        ]
+    }
+
+Usage:
+    python qbank_store.py ../chemistry/qbank.json --blueprint blueprint.json --seed 7
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from qbank_reader import iter_qbank_records
+
+logger = logging.getLogger(__name__)
+
+# Indexed attributes and the JSON field each one is read from
+INDEXED_FIELDS = {
+    'chapter': 'chap_num',
+    'topic': 'topic_num',
+    'q_type': 'q_type',
+    'cog_lvl': 'cog_lvl',
+    'diff': 'diff',
+    'marks': 'marks',
+    'is_imp': 'is_imp',
+}
+
+
+class BlueprintError(ValueError):
+    """Raised when the bank cannot satisfy a blueprint slot"""
+
+
+def iter_bits(mask: int) -> Iterable[int]:
+    """Row numbers set in a bitmap, in ascending order"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _normalize(attribute: str, value: Any) -> Any:
+    # Chapters arrive as 1 or "1" depending on the source
+    if attribute in ('chapter', 'topic'):
+        return str(value)
+    if attribute == 'is_imp':
+        return bool(value)
+    return value
+
+
+def largest_remainder(total: int, weights: List[float]) -> List[int]:
+    """Split `total` into integers proportional to `weights`, summing exactly to `total`"""
+    weight_sum = sum(weights)
+    if total <= 0 or weight_sum <= 0:
+        return [0] * len(weights)
+    exact = [total * w / weight_sum for w in weights]
+    counts = [int(x) for x in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+class QuestionStore:
+    """Columnar question bank with bitmap indexes per attribute"""
+
+    def __init__(self):
+        self.questions: List[Dict[str, Any]] = []
+        self.columns: Dict[str, List[Any]] = {attribute: [] for attribute in INDEXED_FIELDS}
+        self.indexes: Dict[str, Dict[Any, int]] = {attribute: {} for attribute in INDEXED_FIELDS}
+        self.tag_index: Dict[str, int] = {}
+        self.all_rows = 0
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def add(self, q: Dict[str, Any], chapter: Any = None, topic: Any = None):
+        """Append one question; chapter/topic default to the question's own fields"""
+        row = len(self.questions)
+        bit = 1 << row
+        self.questions.append(q)
+        self.all_rows |= bit
+
+        values = {attribute: q.get(field) for attribute, field in INDEXED_FIELDS.items()}
+        if chapter is not None:
+            values['chapter'] = chapter
+        if topic is not None:
+            values['topic'] = topic
+
+        for attribute, value in values.items():
+            value = _normalize(attribute, value)
+            self.columns[attribute].append(value)
+            index = self.indexes[attribute]
+            index[value] = index.get(value, 0) | bit
+
+        for tag in q.get('tags') or []:
+            self.tag_index[tag] = self.tag_index.get(tag, 0) | bit
+
+    @classmethod
+    def from_records(cls, records: Iterable[Tuple[Tuple[str, str, str], Dict[str, Any]]]) -> 'QuestionStore':
+        """Build from ((book, chap_num, topic_num), question) pairs, as yielded by iter_qbank_records"""
+        store = cls()
+        for (_, chapter, topic), q in records:
+            store.add(q, chapter=chapter, topic=topic)
+        return store
+
+    @classmethod
+    def from_file(cls, file_path: str) -> 'QuestionStore':
+        start = time.perf_counter()
+        store = cls.from_records(iter_qbank_records(file_path))
+        logger.info(f"Loaded {len(store)} questions from {file_path} in {time.perf_counter() - start:.2f}s")
+        return store
+
+    @classmethod
+    def from_supabase(cls, supabase_client, lookups: Dict[str, Dict[str, int]],
+                      book_pk: Optional[int] = None, page_size: int = 1000) -> 'QuestionStore':
+        """
+        Build from the Questions table, one paginated pass. `lookups` is the
+        code -> PK mapping from qbank_ingest.get_lookup_tables; FKs are mapped back to codes.
+        """
+        codes = {key: {pk: code for code, pk in mapping.items()} for key, mapping in lookups.items()}
+        store = cls()
+        last_pk = 0
+        while True:
+            query = supabase_client.table('Questions').select(
+                'question_pk, question_text, marks, tags, is_important_for_exam, '
+                'question_type_fk, cognitive_level_fk, difficulty_fk, '
+                'topics!inner(topic_xml_id, chapters!inner(chapter_number_display))'
+            ).gt('question_pk', last_pk)
+            if book_pk is not None:
+                query = query.eq('book_fk', book_pk)
+            rows = query.order('question_pk').limit(page_size).execute().data or []
+            # Only an empty page ends the scan; a short one may be capped by PostgREST's max-rows
+            if not rows:
+                break
+
+            for row in rows:
+                topic = row['topics']
+                store.add({
+                    'question_pk': row['question_pk'],
+                    'q_txt': row['question_text'],
+                    'q_type': codes['question_types'].get(row['question_type_fk']),
+                    'cog_lvl': codes['cognitive_levels'].get(row['cognitive_level_fk']),
+                    'diff': codes['difficulty_levels'].get(row['difficulty_fk']),
+                    'marks': row['marks'],
+                    'tags': row['tags'],
+                    'is_imp': row['is_important_for_exam'],
+                }, chapter=topic['chapters']['chapter_number_display'], topic=topic['topic_xml_id'])
+
+            last_pk = rows[-1]['question_pk']
+        logger.info(f"Loaded {len(store)} questions from Supabase")
+        return store
+
+    def mask(self, **criteria) -> int:
+        """
+        Bitmap of rows matching every criterion. Each value may be a scalar or a
+        list (any of). `tags` matches questions carrying any of the given tags.
+        """
+        result = self.all_rows
+        for attribute, wanted in criteria.items():
+            if wanted is None:
+                continue
+            values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            if attribute == 'tags':
+                index = self.tag_index
+            elif attribute in self.indexes:
+                index = self.indexes[attribute]
+                values = [_normalize(attribute, v) for v in values]
+            else:
+                raise KeyError(f"Unknown attribute: {attribute}")
+
+            matched = 0
+            for value in values:
+                matched |= index.get(value, 0)
+            result &= matched
+        return result
+
+    def count(self, **criteria) -> int:
+        return bin(self.mask(**criteria)).count('1')
+
+    def select(self, mask: int) -> List[Dict[str, Any]]:
+        return [self.questions[row] for row in iter_bits(mask)]
+
+    def sample(self, mask: int, k: int, rng: random.Random) -> List[int]:
+        """k distinct rows from the bitmap, chosen with the given generator"""
+        rows = list(iter_bits(mask))
+        if k > len(rows):
+            raise BlueprintError(f"Need {k} questions but only {len(rows)} match")
+        return sorted(rng.sample(rows, k))
+
+    def assemble(self, blueprint: Dict[str, Any], seed: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Pick questions for every blueprint slot without repeats.
+
+        `cog_mix` maps cognitive levels to their share of the whole paper; the
+        quota is spread over slots in proportion to their counts, and the rest of
+        each slot is drawn from levels outside the mix. If a slot cannot meet its
+        quota it is topped up from the slot's remaining pool (with a warning);
+        a BlueprintError is raised only when the slot's pool itself is too small.
+
+        Returns one dict per slot: the slot spec and its chosen questions.
+        """
+        rng = random.Random(seed)
+        base_mask = self.mask(**blueprint.get('filters', {}))
+        slots = blueprint.get('slots', [])
+        cog_mix: Dict[str, float] = blueprint.get('cog_mix', {})
+
+        # Paper-wide quota per cognitive level, spread across slots by slot size
+        slot_counts = [slot['count'] for slot in slots]
+        paper_total = sum(slot_counts)
+        quotas_by_level = {
+            level: largest_remainder(round(paper_total * share), slot_counts)
+            for level, share in cog_mix.items()
+        }
+        other_levels_mask = self.all_rows & ~self.mask(cog_lvl=list(cog_mix)) if cog_mix else self.all_rows
+
+        used = 0
+        paper = []
+        for slot_number, slot in enumerate(slots):
+            criteria = {k: v for k, v in slot.items() if k not in ('count', 'label')}
+            slot_mask = base_mask & self.mask(**criteria) & ~used
+            if bin(slot_mask).count('1') < slot['count']:
+                raise BlueprintError(f"Slot {slot_number + 1} {criteria} needs {slot['count']} questions "
+                                     f"but only {bin(slot_mask).count('1')} are available")
+
+            chosen: List[int] = []
+            for level, quotas in quotas_by_level.items():
+                chosen += self._sample_up_to(slot_mask & self.mask(cog_lvl=level), quotas[slot_number], rng,
+                                             f"slot {slot_number + 1} {level}")
+            remaining = slot['count'] - len(chosen)
+            chosen_mask = sum(1 << row for row in chosen)
+            chosen += self._sample_up_to(slot_mask & other_levels_mask & ~chosen_mask, remaining, rng,
+                                         f"slot {slot_number + 1} other levels")
+
+            # Top up from anything left in the slot when a quota could not be met
+            shortfall = slot['count'] - len(chosen)
+            if shortfall:
+                chosen_mask = sum(1 << row for row in chosen)
+                chosen += self.sample(slot_mask & ~chosen_mask, shortfall, rng)
+
+            for row in chosen:
+                used |= 1 << row
+            paper.append({'slot': slot, 'questions': [self.questions[row] for row in sorted(chosen)]})
+        return paper
+
+    def _sample_up_to(self, mask: int, k: int, rng: random.Random, label: str) -> List[int]:
+        available = bin(mask).count('1')
+        if available < k:
+            logger.warning(f"Only {available} questions for {label}, wanted {k}; topping up from the slot")
+            k = available
+        return self.sample(mask, k, rng) if k else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Assemble a model paper from a question bank blueprint')
+    parser.add_argument('qbank_file', help='Question bank file (.json, .jsonl or concatenated meta/qs documents)')
+    parser.add_argument('--blueprint', required=True, help='Blueprint JSON file')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible papers')
+    parser.add_argument('--output', '-o', help='Write the assembled paper as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = QuestionStore.from_file(args.qbank_file)
+    with open(args.blueprint, 'r', encoding='utf-8') as f:
+        blueprint = json.load(f)
+
+    start = time.perf_counter()
+    paper = store.assemble(blueprint, seed=args.seed)
+    logger.info(f"Assembled paper in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for number, part in enumerate(paper, start=1):
+        slot = part['slot']
+        print(f"\n{slot.get('label', f'Slot {number}')}: {slot['count']} x "
+              f"{', '.join(f'{k}={v}' for k, v in slot.items() if k not in ('count', 'label'))}")
+        for q in part['questions']:
+            print(f"  [{q.get('cog_lvl')}/{q.get('diff')}/{q.get('marks')}] {(q.get('q_txt') or '')[:90]}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(paper, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -53,6 +53,13 @@ class ProcessingConfig:
         'true_false': ['true_false', 'tf_question', 'boolean']
     }
 
+    # Descendant tags that reveal a question's type, checked in this order
+    QUESTION_CHILD_TAGS = {
+        'MCQ': ['choice', 'option'],
+        'FILL_BLANKS': ['blank'],
+        'TRUE_FALSE': ['true', 'false']
+    }
+
 config = ProcessingConfig()
 
 # --- Animation Registry (existing) ---
@@ -183,6 +190,13 @@ def get_formatted_text(element_xml) -> str:
 
     return " ".join(filter(None, text_parts)).strip()
 
+def load_xml_root(xml_file_path: str):
+    """Read an XML file, escape stray ampersands and return the parsed root element"""
+    with open(xml_file_path, 'r', encoding='utf-8') as f:
+        xml_str = re.sub(r'&(?!(amp|lt|gt|quot|apos|#\d+|#x[0-9a-fA-F]+);)', '&amp;', f.read())
+
+    return ET.fromstring(xml_str)
+
 # --- Enhanced Section Management ---
 def get_topic_pk(book_pk: int, chapter_number: str, topic_xml_id: str) -> Optional[int]:
     """Get topic primary key from book, chapter, and topic identifiers"""
@@ -213,6 +227,38 @@ def get_topic_pk(book_pk: int, chapter_number: str, topic_xml_id: str) -> Option
         logger.error(f"Error getting topic_pk: {str(e)}")
         return None
 
+def get_topic_pks(book_pk: int, chapter_number: str,
+                  topic_xml_ids: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Resolve several topics of one chapter in a single query
+
+    Returns a mapping of topic_xml_id -> topic_pk. When topic_xml_ids is None,
+    every topic in the chapter is returned. Missing topics are simply absent.
+    """
+    try:
+        chapter_response = supabase.table("chapters").select("chapter_pk").eq(
+            "book_fk", book_pk
+        ).eq("chapter_number_display", chapter_number).execute()
+
+        if not chapter_response.data:
+            logger.error(f"Chapter {chapter_number} not found in book {book_pk}")
+            return {}
+
+        chapter_pk = chapter_response.data[0]["chapter_pk"]
+
+        query = supabase.table("topics").select("topic_pk, topic_xml_id").eq("chapter_fk", chapter_pk)
+        if topic_xml_ids is not None:
+            if not topic_xml_ids:
+                return {}
+            query = query.in_("topic_xml_id", list(set(topic_xml_ids)))
+        topic_response = query.order("order_in_chapter").execute()
+
+        return {topic["topic_xml_id"]: topic["topic_pk"] for topic in topic_response.data or []}
+
+    except Exception as e:
+        logger.error(f"Error getting topic_pks for chapter {chapter_number}: {str(e)}")
+        return {}
+
 def get_existing_sections(topic_pk: int) -> List[Dict[str, Any]]:
     """Get all existing sections for a topic"""
     try:
@@ -225,6 +271,24 @@ def get_existing_sections(topic_pk: int) -> List[Dict[str, Any]]:
         logger.error(f"Error getting existing sections: {str(e)}")
         return []
 
+def get_existing_sections_for_topics(topic_pks: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Get existing sections for several topics in one query, grouped by topic_pk"""
+    sections_by_topic: Dict[int, List[Dict[str, Any]]] = {topic_pk: [] for topic_pk in topic_pks}
+    if not topic_pks:
+        return sections_by_topic
+
+    try:
+        response = supabase.table("sections").select(
+            "section_pk, topic_fk, section_type_xml, title, order_in_topic"
+        ).in_("topic_fk", list(set(topic_pks))).order("order_in_topic").execute()
+
+        for section in response.data or []:
+            sections_by_topic.setdefault(section.pop("topic_fk"), []).append(section)
+    except Exception as e:
+        logger.error(f"Error getting existing sections for topics: {str(e)}")
+
+    return sections_by_topic
+
 def find_conflicting_section(existing_sections: List[Dict[str, Any]],
                            new_section_type: str) -> Optional[Dict[str, Any]]:
     """Find if there's a conflicting section of the same type"""
@@ -300,56 +364,13 @@ def add_section_to_topic(section_xml_file: str, book_pk: int, chapter_number: st
             raise Exception(f"Topic {topic_xml_id} not found")
 
         # Parse section XML
-        with open(section_xml_file, 'r', encoding='utf-8') as f:
-            xml_str = re.sub(r'&(?!(amp|lt|gt|quot|apos|#\d+|#x[0-9a-fA-F]+);)', '&amp;', f.read())
-
-        root = ET.fromstring(xml_str)
+        root = load_xml_root(section_xml_file)
 
         # Validate root is a section
         if root.tag.lower() != 'section':
             raise Exception(f"Expected <section> root tag, found <{root.tag}>")
 
-        section_type = root.get("type", "UNKNOWN")
-        section_title = root.get("title", f"Section {section_type}")
-
-        # Check for existing sections and conflicts
-        existing_sections = get_existing_sections(topic_pk)
-        conflicting_section = find_conflicting_section(existing_sections, section_type)
-
-        if conflicting_section:
-            resolution = determine_conflict_resolution(section_type, conflict_behavior)
-            logger.info(f"Found conflicting section {conflicting_section['section_pk']} of type {section_type}")
-            logger.info(f"Resolution strategy: {resolution}")
-
-            if resolution == 'replace':
-                logger.info(f"Replacing existing section {conflicting_section['section_pk']}")
-                delete_section_completely(conflicting_section['section_pk'])
-                # Use the same order as the deleted section
-                section_order = conflicting_section['order_in_topic']
-            elif resolution == 'skip':
-                logger.info(f"Skipping section addition due to existing section")
-                return conflicting_section['section_pk']
-            # For 'append', continue with normal processing
-
-        # Determine section order
-        if section_order is None:
-            section_order = get_max_section_order(topic_pk) + 1
-
-        # Create section
-        section_data = {
-            "topic_fk": topic_pk,
-            "section_type_xml": section_type,
-            "title": section_title,
-            "order_in_topic": section_order
-        }
-        section_pk = insert_and_return_pk("sections", section_data, "section_pk")
-        logger.info(f"Created Section - PK: {section_pk}, Type: '{section_type}'")
-
-        # Process section content with enhanced processing
-        elements_processed = process_section_content_enhanced(root, section_pk, section_type)
-        logger.info(f"Section {section_pk} added successfully with {elements_processed} elements")
-
-        return section_pk
+        return upsert_section_to_topic(topic_pk, root, section_order, conflict_behavior)
 
     except Exception as e:
         logger.error(f"Error adding section to topic: {str(e)}")
@@ -357,10 +378,17 @@ def add_section_to_topic(section_xml_file: str, book_pk: int, chapter_number: st
 
 def add_sections_to_multiple_topics(section_xml_file: str, book_pk: int,
                                    topic_mappings: List[Dict[str, str]],
-                                   conflict_behavior: Optional[str] = None) -> Dict[str, List]:
+                                   conflict_behavior: Optional[str] = None,
+                                   clone: bool = False) -> Dict[str, List]:
     """
     Add the same section to multiple topics with enhanced conflict resolution
+
+    With clone=True the template is ingested once and copied server-side to the
+    remaining topics (see clone_section_to_topics).
     """
+    if clone:
+        return clone_section_to_topics(section_xml_file, book_pk, topic_mappings, conflict_behavior)
+
     successful_additions = []
     failed_additions = []
     skipped_additions = []
@@ -405,44 +433,210 @@ def add_sections_to_multiple_topics(section_xml_file: str, book_pk: int,
         'failed': failed_additions
     }
 
+def clone_section_to_topics(section_xml_file: str, book_pk: int,
+                            topic_mappings: List[Dict[str, str]],
+                            conflict_behavior: Optional[str] = None) -> Dict[str, List]:
+    """
+    Ingest a template section once and clone it to every other target topic
+
+    The template is parsed and inserted into the first target topic as usual, then
+    the clone_section_to_topics RPC (see supa-schema.sql) copies the section, its
+    content_elements and list_items to the remaining topics with INSERT ... SELECT,
+    so the fan-out costs one request regardless of template size.
+
+    Returns the same successful/skipped/failed dictionary as add_sections_to_multiple_topics.
+    """
+    successful_additions = []
+    failed_additions = []
+    skipped_additions = []
+
+    try:
+        root = load_xml_root(section_xml_file)
+        if root.tag.lower() != 'section':
+            raise Exception(f"Expected <section> root tag, found <{root.tag}>")
+
+        section_type = root.get("type", "UNKNOWN")
+        resolution = determine_conflict_resolution(section_type, conflict_behavior)
+        if resolution not in ('replace', 'skip'):
+            resolution = 'append'
+
+        # Resolve every target topic, one query per chapter
+        topic_ids_by_chapter: Dict[str, List[str]] = {}
+        for mapping in topic_mappings:
+            topic_ids_by_chapter.setdefault(mapping['chapter_number'], []).append(mapping['topic_xml_id'])
+
+        targets = []
+        seen_topic_pks = set()
+        for chapter_number, topic_xml_ids in topic_ids_by_chapter.items():
+            topic_pks = get_topic_pks(book_pk, chapter_number, topic_xml_ids)
+            for topic_xml_id in topic_xml_ids:
+                topic_pk = topic_pks.get(topic_xml_id)
+                if not topic_pk:
+                    failed_additions.append({'topic_xml_id': topic_xml_id, 'error': f'Topic {topic_xml_id} not found'})
+                elif topic_pk not in seen_topic_pks:
+                    seen_topic_pks.add(topic_pk)
+                    targets.append((topic_xml_id, topic_pk))
+
+        if not targets:
+            logger.error("No target topics found for section cloning")
+            return {'successful': [], 'skipped': [], 'failed': failed_additions}
+
+        sections_by_topic = get_existing_sections_for_topics([topic_pk for _, topic_pk in targets])
+
+        # With 'skip', topics that already have this section type are left alone
+        if resolution == 'skip':
+            remaining_targets = []
+            for topic_xml_id, topic_pk in targets:
+                conflicting_section = find_conflicting_section(sections_by_topic[topic_pk], section_type)
+                if conflicting_section:
+                    successful_additions.append({
+                        'topic_xml_id': topic_xml_id,
+                        'section_pk': conflicting_section['section_pk']
+                    })
+                else:
+                    remaining_targets.append((topic_xml_id, topic_pk))
+            targets = remaining_targets
+
+        if not targets:
+            logger.info("All target topics already have this section, nothing to clone")
+            return {'successful': successful_additions, 'skipped': skipped_additions, 'failed': failed_additions}
+
+        # Ingest the template once
+        source_topic_xml_id, source_topic_pk = targets[0]
+        source_section_pk = upsert_section_to_topic(
+            source_topic_pk, root,
+            conflict_behavior=resolution,
+            existing_sections=sections_by_topic[source_topic_pk]
+        )
+        successful_additions.append({'topic_xml_id': source_topic_xml_id, 'section_pk': source_section_pk})
+
+        clone_targets = targets[1:]
+        if clone_targets:
+            logger.info(f"Cloning section {source_section_pk} to {len(clone_targets)} topics")
+            try:
+                response = supabase.rpc('clone_section_to_topics', {
+                    'source_section_pk': source_section_pk,
+                    'target_topic_pks': [topic_pk for _, topic_pk in clone_targets],
+                    'conflict_behavior': resolution
+                }).execute()
+                cloned = {row['target_topic_fk']: row for row in response.data or []}
+            except Exception as e:
+                logger.error(f"Server-side clone of section {source_section_pk} failed: {str(e)}")
+                cloned = {}
+                for topic_xml_id, _ in clone_targets:
+                    failed_additions.append({'topic_xml_id': topic_xml_id, 'error': str(e)})
+                clone_targets = []
+
+            for topic_xml_id, topic_pk in clone_targets:
+                row = cloned.get(topic_pk)
+                if not row:
+                    skipped_additions.append({
+                        'topic_xml_id': topic_xml_id,
+                        'reason': 'Clone returned no section'
+                    })
+                else:
+                    successful_additions.append({
+                        'topic_xml_id': topic_xml_id,
+                        'section_pk': row['cloned_section_pk']
+                    })
+
+    except Exception as e:
+        logger.error(f"Error cloning section to topics: {str(e)}")
+        failed_additions.append({'error': str(e)})
+
+    logger.info(f"Section clone completed: {len(successful_additions)} successful, "
+               f"{len(skipped_additions)} skipped, {len(failed_additions)} failed")
+
+    return {
+        'successful': successful_additions,
+        'skipped': skipped_additions,
+        'failed': failed_additions
+    }
+
 # --- Enhanced Content Processing ---
-def detect_question_type(element_xml) -> str:
-    """Detect the type of question from XML structure"""
-    tag_name = element_xml.tag.lower()
+def compile_question_patterns(patterns: Dict[str, List[str]]):
+    """
+    One regex for all tag-name patterns. Each type is a lookahead branch tried in
+    QUESTION_PATTERNS order, so the first type with a matching pattern wins and
+    match.lastgroup names it.
+    """
+    branches = [
+        f"(?=.*(?:{'|'.join(re.escape(pattern) for pattern in type_patterns)}))(?P<{q_type}>)"
+        for q_type, type_patterns in patterns.items()
+    ]
+    return re.compile('|'.join(branches), re.DOTALL)
 
-    # Check for explicit type attribute
-    if element_xml.get('type'):
-        return element_xml.get('type').upper()
+QUESTION_TAG_REGEX = compile_question_patterns(config.QUESTION_PATTERNS)
 
-    # Pattern matching for question types
-    for q_type, patterns in config.QUESTION_PATTERNS.items():
-        if any(pattern in tag_name for pattern in patterns):
-            return q_type.upper()
+# Tag name -> question type (None if no pattern matches), shared by every classifier
+_tag_name_types: Dict[str, Optional[str]] = {}
 
-    # Look for specific child elements that indicate question type
-    if element_xml.find('.//choice') is not None or element_xml.find('.//option') is not None:
-        return 'MCQ'
-    if element_xml.find('.//blank') is not None or '_____' in (element_xml.text or ''):
-        return 'FILL_BLANKS'
-    if element_xml.find('.//true') is not None or element_xml.find('.//false') is not None:
-        return 'TRUE_FALSE'
+class QuestionClassifier:
+    """
+    Classifies question elements with one subtree traversal each
 
-    return 'GENERIC_QUESTION'
+    Tag names are matched once against the precompiled QUESTION_TAG_REGEX and the
+    result is kept in a module-level map, and descendant tags are collected in a
+    single pass and checked against QUESTION_CHILD_TAGS.
+    counts holds the number of questions detected per type.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+
+    @staticmethod
+    def _type_from_tag_name(tag_name: str) -> Optional[str]:
+        if tag_name not in _tag_name_types:
+            match = QUESTION_TAG_REGEX.match(tag_name)
+            _tag_name_types[tag_name] = match.lastgroup.upper() if match else None
+        return _tag_name_types[tag_name]
+
+    def detect(self, element_xml) -> str:
+        """Detect the type of question from XML structure without updating counts"""
+        # Check for explicit type attribute
+        if element_xml.get('type'):
+            return element_xml.get('type').upper()
+
+        # Pattern matching for question types
+        tag_type = self._type_from_tag_name(element_xml.tag.lower())
+        if tag_type:
+            return tag_type
+
+        # Look for specific descendant elements that indicate question type
+        descendant_tags = {descendant.tag for descendant in element_xml.iter() if descendant is not element_xml}
+        for q_type, child_tags in config.QUESTION_CHILD_TAGS.items():
+            if descendant_tags.intersection(child_tags):
+                return q_type
+            if q_type == 'FILL_BLANKS' and '_____' in (element_xml.text or ''):
+                return q_type
+
+        return 'GENERIC_QUESTION'
+
+    def classify(self, element_xml) -> str:
+        """Detect the question type and record it in counts"""
+        question_type = self.detect(element_xml)
+        self.counts[question_type] = self.counts.get(question_type, 0) + 1
+        return question_type
+
+_default_classifier = QuestionClassifier()
+
+def detect_question_type(element_xml) -> str:
+    """Detect the type of question from XML structure"""
+    return _default_classifier.detect(element_xml)
 
 def process_question_bank_section(section_xml, section_fk: int) -> int:
     """Enhanced processing for question bank sections"""
     elements_processed = 0
     order_counter = 1
+    classifier = QuestionClassifier()
 
     try:
         for child_xml in section_xml:
             tag_name = child_xml.tag.lower()
 
-            # Detect question type
-            question_type = detect_question_type(child_xml)
-
             if 'question' in tag_name or 'mcq' in tag_name or 'exercise' in tag_name:
                 # Process as question with enhanced type detection
+                question_type = classifier.classify(child_xml)
                 elements_processed += process_enhanced_question(
                     child_xml, section_fk, order_counter, question_type
                 )
@@ -454,6 +648,7 @@ def process_question_bank_section(section_xml, section_fk: int) -> int:
                 )
                 order_counter = elements_processed + 1
 
+        logger.info(f"Question bank section {section_fk} question types: {classifier.counts}")
         return elements_processed
 
     except Exception as e:
@@ -969,10 +1164,7 @@ def update_existing_section(section_pk: int, section_xml_file: str) -> bool:
         logger.info(f"Deleted existing content for section {section_pk}")
 
         # Parse new section XML
-        with open(section_xml_file, 'r', encoding='utf-8') as f:
-            xml_str = re.sub(r'&(?!(amp|lt|gt|quot|apos|#\d+|#x[0-9a-fA-F]+);)', '&amp;', f.read())
-
-        root = ET.fromstring(xml_str)
+        root = load_xml_root(section_xml_file)
 
         # Update section metadata if provided
         if root.get("title") or root.get("type"):
@@ -1123,17 +1315,24 @@ def get_or_create_topic_pk(chapter_pk: int, topic_xml_id: str, topic_title: str,
         logger.error(f"Error in get_or_create_topic_pk: {str(e)}")
         raise
 
-def upsert_section_to_topic(topic_pk: int, section_xml, section_order: int,
-                           conflict_behavior: str = "append") -> int:
+def upsert_section_to_topic(topic_pk: int, section_xml, section_order: Optional[int] = None,
+                           conflict_behavior: Optional[str] = "append",
+                           existing_sections: Optional[List[Dict[str, Any]]] = None) -> int:
     """
-    Upsert section with conflict resolution - used by process_full_chapter
+    Upsert an already-parsed section element with conflict resolution
+
+    Used by process_full_chapter and the section helpers. When section_order is
+    None the section is appended after the topic's last section. Callers that
+    prefetched the topic's sections can pass them as existing_sections; the list
+    is kept in sync with any replacement or insert made here.
     """
     try:
         section_type = section_xml.get("type", "UNKNOWN")
         section_title = section_xml.get("title", f"Section {section_type}")
 
         # Check for existing sections and conflicts
-        existing_sections = get_existing_sections(topic_pk)
+        if existing_sections is None:
+            existing_sections = get_existing_sections(topic_pk)
         conflicting_section = find_conflicting_section(existing_sections, section_type)
 
         if conflicting_section:
@@ -1144,6 +1343,7 @@ def upsert_section_to_topic(topic_pk: int, section_xml, section_order: int,
             if resolution == 'replace':
                 logger.info(f"Replacing existing section {conflicting_section['section_pk']}")
                 delete_section_completely(conflicting_section['section_pk'])
+                existing_sections.remove(conflicting_section)
                 # Use the same order as the deleted section
                 section_order = conflicting_section['order_in_topic']
             elif resolution == 'skip':
@@ -1151,6 +1351,10 @@ def upsert_section_to_topic(topic_pk: int, section_xml, section_order: int,
                 return conflicting_section['section_pk']
             # For 'append', continue with normal processing
 
+        # Determine section order
+        if section_order is None:
+            section_order = max((section['order_in_topic'] for section in existing_sections), default=0) + 1
+
         # Create section
         section_data = {
             "topic_fk": topic_pk,
@@ -1160,6 +1364,12 @@ def upsert_section_to_topic(topic_pk: int, section_xml, section_order: int,
         }
         section_pk = insert_and_return_pk("sections", section_data, "section_pk")
         logger.info(f"Created Section - PK: {section_pk}, Type: '{section_type}'")
+        existing_sections.append({
+            "section_pk": section_pk,
+            "section_type_xml": section_type,
+            "title": section_title,
+            "order_in_topic": section_order
+        })
 
         # Process section content
         elements_processed = process_section_content_enhanced(section_xml, section_pk, section_type)
@@ -1247,14 +1457,26 @@ def process_full_chapter_agnostic(xml_file_path: str, book_details: Dict[str, An
     try:
         logger.info(f"Starting AGNOSTIC XML processing for: {xml_file_path}")
 
-        with open(xml_file_path, 'r', encoding='utf-8') as f:
-            xml_str = re.sub(r'&(?!(amp|lt|gt|quot|apos|#\d+|#x[0-9a-fA-F]+);)', '&amp;', f.read())
-
-        root = ET.fromstring(xml_str)
+        root = load_xml_root(xml_file_path)
         logger.info(f"Successfully parsed XML file: {xml_file_path}")
 
+    except Exception as e:
+        logger.error(f"Critical error in agnostic processing: {str(e)}")
+        raise
+
+    return process_parsed_xml(root, book_details)
+
+def process_parsed_xml(root, book_details: Dict[str, Any], book_pk: Optional[int] = None) -> Optional[int]:
+    """
+    Agnostic full processing of an already-parsed book or chapter root element
+
+    Pass book_pk when the book has already been resolved (e.g. by a caller
+    ingesting several chapter files concurrently) to skip get_or_create_book_pk.
+    """
+    try:
         # STEP 1: Get or create book (agnostic)
-        book_pk = get_or_create_book_pk(book_details)
+        if book_pk is None:
+            book_pk = get_or_create_book_pk(book_details)
         logger.info(f"Book PK (get/create): {book_pk}")
 
         # STEP 2: Handle different root elements agnostically
@@ -1489,6 +1711,10 @@ def add_multiple_sections_from_single_file(xml_file_path: str, book_pk: int,
     """
     Process XML file containing multiple sections targeted at different topics
 
+    The file is parsed once and each <section> element is processed in memory.
+    Target topics and their existing sections are resolved with one query each
+    for the whole file rather than once per section.
+
     XML Structure Expected:
     <sections>
         <section type="MEMORY_TECHNIQUES" target_topic="1.1">...</section>
@@ -1511,10 +1737,7 @@ def add_multiple_sections_from_single_file(xml_file_path: str, book_pk: int,
         logger.info(f"Processing batch sections from {xml_file_path}")
 
         # Parse XML
-        with open(xml_file_path, 'r', encoding='utf-8') as f:
-            xml_str = re.sub(r'&(?!(amp|lt|gt|quot|apos|#\d+|#x[0-9a-fA-F]+);)', '&amp;', f.read())
-
-        root = ET.fromstring(xml_str)
+        root = load_xml_root(xml_file_path)
 
         # Handle different root structures
         sections_to_process = []
@@ -1530,24 +1753,31 @@ def add_multiple_sections_from_single_file(xml_file_path: str, book_pk: int,
             logger.error("No sections found in the XML file")
             return {'successful': [], 'failed': [{'error': 'No sections found'}]}
 
-        # Process each section
+        # Determine target topics up front so they can be resolved together
+        targeted_sections = []
         for section_idx, section_elem in enumerate(sections_to_process):
-            try:
-                # Determine target topic
-                target_topic = (section_elem.get('target_topic') or
-                              section_elem.get('topic_id') or
-                              section_elem.get('for_topic'))
+            target_topic = (section_elem.get('target_topic') or
+                          section_elem.get('topic_id') or
+                          section_elem.get('for_topic'))
 
-                if not target_topic:
-                    logger.warning(f"Section {section_idx} has no target_topic, skipping")
-                    failed_additions.append({
-                        'section_index': section_idx,
-                        'error': 'No target_topic specified'
-                    })
-                    continue
+            if not target_topic:
+                logger.warning(f"Section {section_idx} has no target_topic, skipping")
+                failed_additions.append({
+                    'section_index': section_idx,
+                    'error': 'No target_topic specified'
+                })
+                continue
+
+            targeted_sections.append((target_topic, section_elem))
+
+        topic_pks = get_topic_pks(book_pk, chapter_number,
+                                  [target_topic for target_topic, _ in targeted_sections])
+        sections_by_topic = get_existing_sections_for_topics(list(topic_pks.values()))
 
-                # Get topic_pk
-                topic_pk = get_topic_pk(book_pk, chapter_number, target_topic)
+        # Process each section
+        for target_topic, section_elem in targeted_sections:
+            try:
+                topic_pk = topic_pks.get(target_topic)
                 if not topic_pk:
                     failed_additions.append({
                         'topic_xml_id': target_topic,
@@ -1555,32 +1785,18 @@ def add_multiple_sections_from_single_file(xml_file_path: str, book_pk: int,
                     })
                     continue
 
-                # Create temporary XML file for this section
-                temp_section_xml = create_temp_section_file(section_elem)
-
-                # Add section to topic
-                section_pk = add_section_to_topic(
-                    temp_section_xml,
-                    book_pk,
-                    chapter_number,
-                    target_topic,
-                    conflict_behavior=conflict_behavior
+                section_pk = upsert_section_to_topic(
+                    topic_pk,
+                    section_elem,
+                    conflict_behavior=conflict_behavior,
+                    existing_sections=sections_by_topic[topic_pk]
                 )
 
-                # Clean up temp file
-                os.unlink(temp_section_xml)
-
-                if section_pk:
-                    successful_additions.append({
-                        'topic_xml_id': target_topic,
-                        'section_pk': section_pk,
-                        'section_type': section_elem.get('type')
-                    })
-                else:
-                    failed_additions.append({
-                        'topic_xml_id': target_topic,
-                        'error': 'Section processing returned None'
-                    })
+                successful_additions.append({
+                    'topic_xml_id': target_topic,
+                    'section_pk': section_pk,
+                    'section_type': section_elem.get('type')
+                })
 
             except Exception as e:
                 logger.error(f"Error processing section for topic {target_topic}: {str(e)}")
@@ -1602,31 +1818,10 @@ def add_multiple_sections_from_single_file(xml_file_path: str, book_pk: int,
             'failed': [{'error': str(e)}]
         }
 
-def create_temp_section_file(section_elem) -> str:
-    """Create temporary XML file for a single section"""
-    import tempfile
-
-    # Create temporary file
-    temp_fd, temp_path = tempfile.mkstemp(suffix='.xml', prefix='temp_section_')
-
-    try:
-        # Create XML string for this section
-        section_xml = ET.tostring(section_elem, encoding='unicode')
-
-        # Write to temp file
-        with os.fdopen(temp_fd, 'w', encoding='utf-8') as temp_file:
-            temp_file.write(section_xml)
-
-        return temp_path
-
-    except Exception as e:
-        os.close(temp_fd)
-        os.unlink(temp_path)
-        raise
-
 def add_memory_techniques_to_all_topics_in_chapter(book_pk: int, chapter_number: str,
                                                   base_memory_techniques_file: str,
-                                                  conflict_behavior: str = "replace") -> Dict[str, List]:
+                                                  conflict_behavior: str = "replace",
+                                                  clone: bool = False) -> Dict[str, List]:
     """
     Add memory techniques to ALL topics in a chapter
 
@@ -1635,6 +1830,7 @@ def add_memory_techniques_to_all_topics_in_chapter(book_pk: int, chapter_number:
         chapter_number: Chapter number (e.g., "1")
         base_memory_techniques_file: Template memory techniques XML file
         conflict_behavior: How to handle existing memory techniques
+        clone: Ingest the template once and clone it server-side to the other topics
 
     Returns:
         Results dictionary
@@ -1671,7 +1867,8 @@ def add_memory_techniques_to_all_topics_in_chapter(book_pk: int, chapter_number:
             base_memory_techniques_file,
             book_pk,
             topic_mappings,
-            conflict_behavior
+            conflict_behavior,
+            clone=clone
         )
 
     except Exception as e:
@@ -1695,7 +1892,8 @@ if __name__ == "__main__":
     #     section_xml_file="memory-techniques-template.xml",  # Your base template
     #     book_pk=1,
     #     topic_mappings=memory_topic_list,
-    #     conflict_behavior="replace"  # Replace existing memory techniques
+    #     conflict_behavior="replace",  # Replace existing memory techniques
+    #     clone=True  # Ingest the template once, then copy it server-side to the other topics
     # )
     # print(f"Memory techniques added to: {len(results['successful'])} topics")
 
@@ -2,9 +2,14 @@ import logging
 from supabase import create_client
 import json
 import csv
+import gzip
 from datetime import datetime
 import os
-from typing import Dict, List, Optional, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Any
+
+from csv_pipeline import merge_stats, run_batch_pipeline
 
 # Setup logging
 logging.basicConfig(
@@ -36,45 +41,34 @@ class EnrichmentIngester:
             'missing_topics': set()
         }
 
-    def process_enrichments_csv(self, csv_path: str, update_existing: bool = True):
+    def process_enrichments_csv(self, csv_path: str, update_existing: bool = True, batch_size: int = 50,
+                                pipelined: bool = False, workers: int = 4, queue_size: int = 8):
         """
         Process enrichments CSV file
 
         Args:
             csv_path: Path to the CSV file
             update_existing: Whether to update existing enrichments
+            batch_size: Rows per bulk upsert
+            pipelined: Parse/resolve rows in a reader thread while `workers` threads
+                upload batches concurrently (at most `queue_size` batches buffered)
         """
         try:
             logger.info(f"Starting enrichment processing for: {csv_path}")
             logger.info(f"Book PK: {self.book_pk}, Update existing: {update_existing}")
 
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-
-                # Process in batches for efficiency
-                batch = []
-                batch_size = 50
-
-                for row_num, row in enumerate(reader, start=1):
-                    self.stats['total_processed'] += 1
-
-                    try:
-                        enrichment = self._process_row(row)
-                        if enrichment:
-                            batch.append(enrichment)
-
-                        # Process batch when it reaches size limit
-                        if len(batch) >= batch_size:
-                            self._process_batch(batch, update_existing)
-                            batch = []
-
-                    except Exception as e:
-                        logger.error(f"Error processing row {row_num}: {str(e)}")
-                        self.stats['errors'] += 1
-                        continue
-
-                # Process remaining items
-                if batch:
+            if pipelined:
+                deltas = run_batch_pipeline(
+                    lambda: self._iter_csv_batches(csv_path, batch_size),
+                    lambda batch, stats: self._process_batch(batch, update_existing, stats),
+                    lambda: {'successful_inserts': 0, 'updates': 0, 'errors': 0},
+                    workers=workers, queue_size=queue_size
+                )
+                # Merged in batch order once the reader thread has finished with self.stats
+                for delta in deltas:
+                    merge_stats(self.stats, delta)
+            else:
+                for batch in self._iter_csv_batches(csv_path, batch_size):
                     self._process_batch(batch, update_existing)
 
             self._print_summary()
@@ -86,6 +80,33 @@ class EnrichmentIngester:
             logger.error(f"Critical error processing enrichments: {str(e)}")
             raise
 
+    def _iter_csv_batches(self, csv_path: str, batch_size: int) -> Iterator[List[Dict]]:
+        """Read, decode and resolve CSV rows, yielding enrichment batches of up to batch_size"""
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            batch = []
+
+            for row_num, row in enumerate(reader, start=1):
+                self.stats['total_processed'] += 1
+
+                try:
+                    enrichment = self._process_row(row)
+                    if enrichment:
+                        batch.append(enrichment)
+
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+
+                except Exception as e:
+                    logger.error(f"Error processing row {row_num}: {str(e)}")
+                    self.stats['errors'] += 1
+                    continue
+
+            # Remaining items
+            if batch:
+                yield batch
+
     def process_single_enrichment(self, term: str, topic_id: str, enrichment_json: Dict[str, Any]):
         """
         Process a single enrichment - useful for real-time updates
@@ -242,60 +263,41 @@ class EnrichmentIngester:
 
         return None
 
-    def _process_batch(self, batch: List[Dict], update_existing: bool):
-        """Process a batch of enrichments"""
+    def _process_batch(self, batch: List[Dict], update_existing: bool, stats: Optional[Dict] = None):
+        """
+        Process a batch of enrichments with a single bulk upsert (upsert_topic_enrichments RPC).
+        New vs updated counts come from the rows the upsert returns and are added to
+        `stats` (self.stats by default; pipeline workers pass a per-batch dict).
+        """
         if not batch:
             return
+        stats = self.stats if stats is None else stats
+
+        # One upsert cannot touch the same (word, topic_fk) twice, so later rows win
+        unique_items = list({(item['word'], item['topic_fk']): item for item in batch}.values())
+        if len(unique_items) < len(batch):
+            logger.info(f"Collapsed {len(batch) - len(unique_items)} repeated (word, topic) rows in batch")
 
         try:
-            # Check for existing entries
-            words = [item['word'] for item in batch]
-            topic_fks = list(set(item['topic_fk'] for item in batch))
-
-            existing_response = self.supabase.table('topic_enrichments').select(
-                'word, topic_fk'
-            ).in_('word', words).in_('topic_fk', topic_fks).execute()
-
-            existing_set = set()
-            if existing_response.data:
-                existing_set = {(item['word'], item['topic_fk']) for item in existing_response.data}
-
-            # Separate new and existing items
-            new_items = []
-            update_items = []
-
-            for item in batch:
-                key = (item['word'], item['topic_fk'])
-                if key in existing_set:
-                    if update_existing:
-                        update_items.append(item)
-                else:
-                    new_items.append(item)
-
-            # Insert new items
-            if new_items:
-                response = self.supabase.table('topic_enrichments').insert(new_items).execute()
-                self.stats['successful_inserts'] += len(new_items)
-                logger.info(f"Inserted {len(new_items)} new enrichments")
-
-            # Update existing items
-            if update_items and update_existing:
-                # Update one by one due to composite key
-                for item in update_items:
-                    try:
-                        self.supabase.table('topic_enrichments').update(item).eq(
-                            'word', item['word']
-                        ).eq('topic_fk', item['topic_fk']).execute()
-                        self.stats['updates'] += 1
-                    except Exception as e:
-                        logger.error(f"Error updating enrichment for '{item['word']}': {str(e)}")
-                        self.stats['errors'] += 1
-
-                logger.info(f"Updated {len(update_items)} existing enrichments")
+            response = self.supabase.rpc('upsert_topic_enrichments', {
+                'p_rows': unique_items,
+                'p_update_existing': update_existing
+            }).execute()
+
+            returned = response.data or []
+            inserted = sum(1 for item in returned if item['was_inserted'])
+            updated = len(returned) - inserted
+            stats['successful_inserts'] += inserted
+            stats['updates'] += updated
+
+            message = f"Upserted batch: {inserted} new, {updated} updated"
+            if not update_existing:
+                message += f", {len(unique_items) - len(returned)} existing skipped"
+            logger.info(message)
 
         except Exception as e:
             logger.error(f"Error processing batch: {str(e)}")
-            self.stats['errors'] += len(batch)
+            stats['errors'] += len(batch)
 
     def _print_summary(self):
         """Print processing summary"""
@@ -309,79 +311,64 @@ class EnrichmentIngester:
             logger.warning(f"Missing topics: {sorted(self.stats['missing_topics'])}")
 
     def get_enrichment_stats(self) -> Dict:
-        """Get statistics about enrichments in the database"""
+        """
+        Get statistics about enrichments in the database.
+        Counts are grouped server-side by the get_enrichment_stats RPC, so this is one small response.
+        """
         try:
-            # Total enrichments
-            total_response = self.supabase.table('topic_enrichments').select(
-                'word', count='exact'
-            ).eq('book_fk', self.book_pk).execute()
-
-            # Enrichments by topic
-            by_topic_response = self.supabase.table('topic_enrichments').select(
-                'topic_fk, topics!inner(topic_xml_id, title)'
-            ).eq('book_fk', self.book_pk).execute()
-
-            # Group by topic
-            topic_counts = {}
-            if by_topic_response.data:
-                for item in by_topic_response.data:
-                    topic_info = item.get('topics', {})
-                    topic_id = topic_info.get('topic_xml_id', 'Unknown')
-                    topic_title = topic_info.get('title', 'Unknown')
-                    key = f"{topic_id}: {topic_title}"
-                    topic_counts[key] = topic_counts.get(key, 0) + 1
-
-            # Enrichments by type
-            by_type_response = self.supabase.table('topic_enrichments').select(
-                'term_type'
-            ).eq('book_fk', self.book_pk).execute()
-
-            type_counts = {}
-            if by_type_response.data:
-                for item in by_type_response.data:
-                    term_type = item.get('term_type') or 'unspecified'
-                    type_counts[term_type] = type_counts.get(term_type, 0) + 1
+            response = self.supabase.rpc('get_enrichment_stats', {'p_book_pk': self.book_pk}).execute()
+            stats = response.data or {}
 
             return {
-                'total_enrichments': total_response.count if hasattr(total_response, 'count') else 0,
-                'enrichments_by_topic': topic_counts,
-                'enrichments_by_type': type_counts
+                'total_enrichments': stats.get('total_enrichments', 0),
+                'enrichments_by_topic': stats.get('enrichments_by_topic') or {},
+                'enrichments_by_type': stats.get('enrichments_by_type') or {}
             }
 
         except Exception as e:
             logger.error(f"Error getting enrichment stats: {str(e)}")
             return {}
 
-    def validate_enrichments(self) -> Dict:
-        """Validate enrichments data quality"""
-        try:
-            # Get all enrichments
-            response = self.supabase.table('topic_enrichments').select(
-                'enrichment_pk, word, explanation, example_sentence, key_principle'
-            ).eq('book_fk', self.book_pk).execute()
-
-            issues = {
-                'missing_explanation': [],
-                'missing_example': [],
-                'missing_key_principle': [],
-                'short_explanation': []
-            }
-
-            if response.data:
-                for item in response.data:
-                    word = item.get('word', 'Unknown')
-
-                    if not item.get('explanation'):
-                        issues['missing_explanation'].append(word)
-                    elif len(item.get('explanation', '')) < 50:
-                        issues['short_explanation'].append(word)
+    def validate_enrichments(self, page_size: int = 1000, workers: int = 0) -> Dict:
+        """
+        Validate enrichments data quality.
 
-                    if not item.get('example_sentence'):
-                        issues['missing_example'].append(word)
+        Enrichments are streamed in keyset-paginated pages (by enrichment_pk) and checked
+        page by page, so memory stays bounded and the PostgREST row cap is never hit.
+        With workers > 0, pages are checked in a thread pool while the next page is fetched;
+        results are merged in page order either way.
+        """
+        issues = {
+            'missing_explanation': [],
+            'missing_example': [],
+            'missing_key_principle': [],
+            'short_explanation': []
+        }
 
-                    if not item.get('key_principle'):
-                        issues['missing_key_principle'].append(word)
+        def merge(page_issues: Dict[str, List[str]]):
+            for key, words in page_issues.items():
+                issues[key].extend(words)
 
+        try:
+            pages = iter_enrichment_pages(
+                self.supabase, 'enrichment_pk, word, explanation, example_sentence, key_principle',
+                book_pk=self.book_pk, page_size=page_size
+            )
+
+            if workers <= 0:
+                for page in pages:
+                    merge(check_enrichment_page(page))
+                return issues
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                in_flight = deque()
+                for page in pages:
+                    in_flight.append(pool.submit(check_enrichment_page, page))
+                    # Bound memory: never hold more pages than workers can check
+                    while len(in_flight) > workers:
+                        merge(in_flight.popleft().result())
+                while in_flight:
+                    merge(in_flight.popleft().result())
             return issues
 
         except Exception as e:
@@ -390,29 +377,98 @@ class EnrichmentIngester:
 
 
 # --- Utility Functions ---
-def export_enrichments_to_csv(book_pk: int, output_path: str):
-    """Export enrichments back to CSV for backup or editing"""
+def iter_enrichment_pages(client, columns: str, book_pk: Optional[int] = None,
+                          page_size: int = 1000) -> Iterator[List[Dict]]:
+    """
+    Yield topic_enrichments rows page by page using keyset pagination on enrichment_pk.
+    `columns` must include enrichment_pk. All books are read when book_pk is None.
+    Stops only on an empty page: a short page may just be capped by PostgREST's max-rows.
+    """
+    last_pk = 0
+    while True:
+        query = client.table('topic_enrichments').select(columns).gt('enrichment_pk', last_pk)
+        if book_pk is not None:
+            query = query.eq('book_fk', book_pk)
+        rows = query.order('enrichment_pk').limit(page_size).execute().data or []
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1]['enrichment_pk']
+
+
+def check_enrichment_page(rows: List[Dict]) -> Dict[str, List[str]]:
+    """Data quality checks for one page of enrichments"""
+    issues = {
+        'missing_explanation': [],
+        'missing_example': [],
+        'missing_key_principle': [],
+        'short_explanation': []
+    }
+
+    for item in rows:
+        word = item.get('word', 'Unknown')
+
+        if not item.get('explanation'):
+            issues['missing_explanation'].append(word)
+        elif len(item.get('explanation', '')) < 50:
+            issues['short_explanation'].append(word)
+
+        if not item.get('example_sentence'):
+            issues['missing_example'].append(word)
+
+        if not item.get('key_principle'):
+            issues['missing_key_principle'].append(word)
+
+    return issues
+
+
+def export_enrichments_to_csv(book_pk: Optional[int], output_path: str, page_size: int = 1000,
+                              compress: Optional[bool] = None):
+    """
+    Export enrichments back to CSV for backup or editing.
+
+    Rows are fetched with keyset pagination and written as each page arrives, so
+    exports are complete and memory stays bounded. Pass book_pk=None to export
+    every book (a book_fk column is added). Output is gzip-compressed when
+    compress is True, or when it is None and output_path ends with '.gz'.
+    The file is written to '<output_path>.part' and renamed once complete.
+    """
+    if compress is None:
+        compress = output_path.endswith('.gz')
+    fieldnames = ['term', 'topic_id', 'enrichment_data']
+    columns = 'enrichment_pk, word, topics!inner(topic_xml_id), raw_json'
+    if book_pk is None:
+        fieldnames.append('book_fk')
+        columns += ', book_fk'
+
+    part_path = f"{output_path}.part"
+    exported = 0
     try:
-        response = supabase.table('topic_enrichments').select(
-            'word, topics!inner(topic_xml_id), raw_json'
-        ).eq('book_fk', book_pk).execute()
-
-        if response.data:
-            with open(output_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=['term', 'topic_id', 'enrichment_data'])
-                writer.writeheader()
-
-                for item in response.data:
-                    writer.writerow({
+        opener = gzip.open if compress else open
+        with opener(part_path, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+
+            for page in iter_enrichment_pages(supabase, columns, book_pk=book_pk, page_size=page_size):
+                for item in page:
+                    row = {
                         'term': item['word'],
                         'topic_id': item['topics']['topic_xml_id'],
                         'enrichment_data': json.dumps(item['raw_json'])
-                    })
+                    }
+                    if book_pk is None:
+                        row['book_fk'] = item['book_fk']
+                    writer.writerow(row)
+                exported += len(page)
+                logger.info(f"Exported {exported} enrichments so far")
 
-            logger.info(f"Exported {len(response.data)} enrichments to {output_path}")
+        os.replace(part_path, output_path)
+        logger.info(f"Exported {exported} enrichments to {output_path}")
 
     except Exception as e:
         logger.error(f"Error exporting enrichments: {str(e)}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
 
 
 # --- Main Execution ---
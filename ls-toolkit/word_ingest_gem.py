@@ -3,7 +3,9 @@ from supabase import create_client, Client
 import json
 import csv
 import os
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
+
+from csv_pipeline import merge_stats, run_batch_pipeline
 
 # Setup logging (same as before)
 logging.basicConfig(
@@ -31,6 +33,8 @@ class WordDefinitionIngester:
             'csv_rows_processed': 0,
             'words_upserted': 0,
             'topic_word_links_created': 0, # Or processed
+            'lexemes_created': 0,
+            'lexemes_reused': 0,
             'errors': 0,
             'skipped_rows_missing_data': 0,
             'skipped_rows_missing_topic': set()
@@ -145,9 +149,16 @@ class WordDefinitionIngester:
             'book_fk': self.book_pk
         }
 
-    def _process_batch(self, batch: List[Dict]):
+    def _process_batch(self, batch: List[Dict], stats: Optional[Dict] = None):
+        """
+        Writes one batch in two round trips: the upsert_book_words RPC (shared lexicon plus
+        per-book `words` overlay, returning the PKs), then an ON CONFLICT DO NOTHING
+        upsert of the `topic_words` links.
+        Counters go to `stats` (self.stats by default, pipeline workers pass their own).
+        """
         if not batch:
             return
+        stats = self.stats if stats is None else stats
 
         words_to_upsert_dict: Dict[str, Dict] = {}
         for item in batch:
@@ -159,43 +170,32 @@ class WordDefinitionIngester:
                 'explanation': item['explanation_detail'],
                 'urdu_meaning': item['urdu_meaning'],
                 'term_type': item['term_type'],
-                'properties': item['properties'],
-                'book_fk': item['book_fk']
+                'properties': item['properties']
             }
 
         words_for_db = list(words_to_upsert_dict.values())
 
-        if words_for_db:
-            try:
-                response = self.supabase.table('words').upsert(
-                    words_for_db,
-                    # IMPORTANT CHANGE HERE:
-                    on_conflict='word_text, book_fk' # Target the composite unique key
-                ).execute()
-                self.stats['words_upserted'] += len(words_for_db) # Still an approximation
-                logger.info(f"Upserted {len(words_for_db)} records into 'words' table (or updated existing for same book).")
-            except Exception as e:
-                logger.error(f"Error upserting into 'words' table: {e}", exc_info=True)
-                self.stats['errors'] += len(words_for_db)
-                return
-
-        all_norm_words_in_batch = list(words_to_upsert_dict.keys())
+        # 1. Dedupe against the shared lexicon and upsert this book's overlay rows (upsert_book_words RPC);
+        #    the returned rows carry word_pk for new and existing words alike
         word_pk_map: Dict[str, int] = {}
-        if all_norm_words_in_batch:
-            try:
-                # IMPORTANT CHANGE HERE: Filter by self.book_pk
-                pk_response = self.supabase.table('words').select('word_text, word_pk').eq(
-                    'book_fk', self.book_pk # Ensure we get word_pks for the current book context
-                ).in_(
-                    'word_text', all_norm_words_in_batch
-                ).execute()
-
-                if pk_response.data:
-                    for record in pk_response.data:
-                        word_pk_map[record['word_text']] = record['word_pk']
-            except Exception as e:
-                logger.error(f"Error fetching word_pks for book {self.book_pk}: {e}", exc_info=True)
-                return
+        try:
+            response = self.supabase.rpc('upsert_book_words', {
+                'p_book_pk': self.book_pk,
+                'p_rows': words_for_db
+            }).execute()
+            created_lexemes = 0
+            for record in response.data or []:
+                word_pk_map[record['word_text']] = record['word_pk']
+                created_lexemes += 1 if record['lexeme_created'] else 0
+            stats['words_upserted'] += len(word_pk_map)
+            stats['lexemes_created'] += created_lexemes
+            stats['lexemes_reused'] += len(word_pk_map) - created_lexemes
+            logger.info(f"Upserted {len(word_pk_map)} words for book {self.book_pk} "
+                        f"({created_lexemes} new lexemes, {len(word_pk_map) - created_lexemes} already in the shared lexicon).")
+        except Exception as e:
+            logger.error(f"Error upserting into 'words' table: {e}", exc_info=True)
+            stats['errors'] += len(words_for_db)
+            return
 
         topic_word_links_to_create: List[Dict] = []
         processed_topic_word_pairs = set()
@@ -211,57 +211,47 @@ class WordDefinitionIngester:
             else:
                 logger.warning(f"Skipping topic_words link for '{norm_word}' as its word_pk was not found.")
 
-        if topic_word_links_to_create:
-            try:
-                # ON CONFLICT (topic_fk, word_fk) DO NOTHING behavior
-                # Supabase Python client's upsert will UPDATE on conflict.
-                # To truly DO NOTHING, we must filter existing links first.
-
-                # Fetch existing links for the topics and words in this batch to avoid re-inserting
-                current_topic_fks = list(set(link['topic_fk'] for link in topic_word_links_to_create))
-                current_word_fks = list(set(link['word_fk'] for link in topic_word_links_to_create))
-
-                if current_topic_fks and current_word_fks:
-                    existing_links_res = self.supabase.table('topic_words').select('topic_fk, word_fk').in_('topic_fk', current_topic_fks).in_('word_fk', current_word_fks).execute()
-                    existing_pairs = set()
-                    if existing_links_res.data:
-                        existing_pairs = set((link['topic_fk'], link['word_fk']) for link in existing_links_res.data)
-
-                    actual_new_links = [link for link in topic_word_links_to_create if (link['topic_fk'], link['word_fk']) not in existing_pairs]
-
-                    if actual_new_links:
-                        response = self.supabase.table('topic_words').insert(actual_new_links).execute()
-                        self.stats['topic_word_links_created'] += len(actual_new_links)
-                        logger.info(f"Inserted {len(actual_new_links)} new links into 'topic_words' table.")
-                    else:
-                        logger.info("No new topic_word links to create for this batch (all existing).")
-                else:
-                    logger.info("No valid topic_fks or word_fks to create links for in this batch.")
-
-            except Exception as e:
-                logger.error(f"Error inserting into 'topic_words' table: {e}", exc_info=True)
-                self.stats['errors'] += len(topic_word_links_to_create)
+        if not topic_word_links_to_create:
+            return
 
+        # 2. Links: ON CONFLICT (topic_fk, word_fk) DO NOTHING, only newly created rows come back
+        try:
+            response = self.supabase.table('topic_words').upsert(
+                topic_word_links_to_create,
+                on_conflict='topic_fk, word_fk',
+                ignore_duplicates=True
+            ).execute()
+            created = len(response.data or [])
+            stats['topic_word_links_created'] += created
+            logger.info(f"Inserted {created} new links into 'topic_words' table "
+                        f"({len(topic_word_links_to_create) - created} already existed).")
+        except Exception as e:
+            logger.error(f"Error inserting into 'topic_words' table: {e}", exc_info=True)
+            stats['errors'] += len(topic_word_links_to_create)
 
-    def ingest_from_csv(self, csv_path: str, batch_size: int = 50):
+    def ingest_from_csv(self, csv_path: str, batch_size: int = 50, pipelined: bool = False,
+                        workers: int = 4, queue_size: int = 8):
+        """
+        Ingests a CSV of enriched terms. With `pipelined`, rows are parsed and topics
+        resolved in a reader thread while `workers` threads upload batches concurrently,
+        with at most `queue_size` batches buffered in between.
+        """
         logger.info(f"Starting word definition ingestion from: {csv_path}")
         try:
-            with open(csv_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                batch: List[Dict] = []
-                for row_num, csv_row in enumerate(reader, start=1):
-                    self.stats['csv_rows_processed'] += 1
-                    extracted_data = self._extract_row_data(csv_row)
-                    if extracted_data:
-                        batch.append(extracted_data)
-
-                    if len(batch) >= batch_size:
-                        self._process_batch(batch)
-                        batch = []
-                        logger.info(f"Processed batch of {batch_size} rows. Current row: {row_num}")
-                if batch:
+            if pipelined:
+                deltas = run_batch_pipeline(
+                    lambda: self._iter_csv_batches(csv_path, batch_size),
+                    self._process_batch,
+                    lambda: {'words_upserted': 0, 'topic_word_links_created': 0, 'lexemes_created': 0,
+                             'lexemes_reused': 0, 'errors': 0},
+                    workers=workers, queue_size=queue_size
+                )
+                # Merged in batch order once the reader thread has finished with self.stats
+                for delta in deltas:
+                    merge_stats(self.stats, delta)
+            else:
+                for batch in self._iter_csv_batches(csv_path, batch_size):
                     self._process_batch(batch)
-                    logger.info(f"Processed final batch of {len(batch)} rows.")
             self._print_summary()
         except FileNotFoundError:
             logger.error(f"CSV file not found: {csv_path}")
@@ -270,10 +260,30 @@ class WordDefinitionIngester:
             logger.critical(f"Critical error during CSV ingestion: {e}", exc_info=True)
             self.stats['errors'] +=1
 
+    def _iter_csv_batches(self, csv_path: str, batch_size: int) -> Iterator[List[Dict]]:
+        """Reads and resolves CSV rows, yielding batches of up to batch_size extracted rows."""
+        with open(csv_path, 'r', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            batch: List[Dict] = []
+            for row_num, csv_row in enumerate(reader, start=1):
+                self.stats['csv_rows_processed'] += 1
+                extracted_data = self._extract_row_data(csv_row)
+                if extracted_data:
+                    batch.append(extracted_data)
+
+                if len(batch) >= batch_size:
+                    logger.info(f"Read batch of {batch_size} rows. Current row: {row_num}")
+                    yield batch
+                    batch = []
+            if batch:
+                logger.info(f"Read final batch of {len(batch)} rows.")
+                yield batch
+
     def _print_summary(self): # (same as before)
         logger.info("=== Word Definition Ingestion Summary ===")
         logger.info(f"CSV Rows Processed: {self.stats['csv_rows_processed']}")
         logger.info(f"Words Upserted (to 'words' table): {self.stats['words_upserted']}")
+        logger.info(f"Shared Lexemes Created / Reused: {self.stats['lexemes_created']} / {self.stats['lexemes_reused']}")
         logger.info(f"Topic-Word Links Created (in 'topic_words'): {self.stats['topic_word_links_created']}")
         logger.info(f"Skipped Rows (Missing Data): {self.stats['skipped_rows_missing_data']}")
         if self.stats['skipped_rows_missing_topic']:
@@ -287,7 +297,7 @@ if __name__ == "__main__":
     # DB Schema reminder (same as before)
     # CREATE TABLE words (
     #   word_pk SERIAL PRIMARY KEY,
-    #   word_text TEXT NOT NULL UNIQUE,
+    #   word_text TEXT NOT NULL,
     #   meaning TEXT,
     #   explanation TEXT,
     #   urdu_meaning TEXT,
@@ -297,8 +307,8 @@ if __name__ == "__main__":
     #   created_at TIMESTAMPTZ DEFAULT NOW(),
     #   updated_at TIMESTAMPTZ DEFAULT NOW()
     # );
-    # CREATE UNIQUE INDEX idx_words_word_text_book_fk ON words(word_text, book_fk); -- If word_text can be same in different books
-    # -- For now, word_text is globally UNIQUE as per earlier discussion for simplicity.
+    # CREATE UNIQUE INDEX idx_words_word_text_book_fk ON words(word_text, book_fk); -- Same term in different books
+    # -- Shared term data lives in lexemes; read merged rows through the book_words view.
 
     # CREATE TABLE topic_words (
     #   topic_word_pk SERIAL PRIMARY KEY,
@@ -309,6 +319,7 @@ if __name__ == "__main__":
     # );
     # -- Ensure `topics` table has `topic_xml_id` (TEXT, e.g., "1.5") and `order_in_chapter` (INT)
     # -- Ensure `chapters` table has `chapter_number_display` (TEXT, e.g., "1")
+    # -- Shared lexicon: `lexemes`, the `book_words` view and the `upsert_book_words` RPC in supa-schema.sql
 
     # For Chemistry book (assuming its book_pk is 1)
     # chemistry_ingester = WordDefinitionIngester(supabase_client=supabase, book_pk=1)
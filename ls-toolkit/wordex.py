@@ -5,16 +5,18 @@ XML Book Processor with DeepSeek API
 Extracts specialized chemistry educational words/phrases from each topic in an XML book.
 """
 
-import json
-import requests
 import argparse
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
 import time # For potential rate limiting
 
+from llm_backends import BackendError, BackendRouter, add_backend_arguments, build_router
+from llm_cache import disable_cache, print_cache_stats
+from llm_telemetry import add_telemetry_arguments, finish_telemetry
+
 # --- Configuration ---
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+# Endpoints and models are chosen with --backend / --fallback (see llm_backends.py)
 # IMPORTANT: Replace with your actual API key or use an environment variable
 # It's best to set this as an environment variable: DEEPSEEK_API_KEY
 # DEEPSEEK_API_KEY = "sk-your-api-key-here" # Loaded from args or env
@@ -152,16 +154,12 @@ def load_xml_book(xml_path: str) -> Dict[str, str]:
     return topics
 
 
-def extract_specialized_chemistry_terms(api_key: str, topic_id: str, topic_text: str) -> List[str]:
+def extract_specialized_chemistry_terms(router: BackendRouter, topic_id: str, topic_text: str) -> Optional[List[str]]:
     """
     Extracts specialized chemistry educational words/phrases using the DeepSeek API,
-    emphasizing literal extraction.
+    emphasizing literal extraction. Returns None when every attempt failed (API
+    errors or empty replies), so callers can tell a failure from a topic without terms.
     """
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
     # Instructions for exclusion are now more conceptual for the LLM prompt
     prompt = f"""
 ANALYSIS TASK:
@@ -200,26 +198,20 @@ Example: "stoichiometry,chemical reaction,mole concept,methane,carbon,ionization
 Now, meticulously extract the specialized chemistry terms that are LITERALLY PRESENT in the 'TOPIC TEXT' provided above.
 """
 
-    payload = {
-        "model": "deepseek-reasoner",
-        "messages": [
-            {"role": "system", "content": "You are a highly precise scientific content extraction assistant. Your primary function is to identify and list terms that are *literally present* in the provided text, following all constraints meticulously. You do not infer, add, or invent information."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.0, # Set to 0.0 for maximum determinism and adherence to literal extraction
-        "max_tokens": 2000, # Increased slightly just in case, but output should be concise
-    }
+    system_prompt = "You are a highly precise scientific content extraction assistant. Your primary function is to identify and list terms that are *literally present* in the provided text, following all constraints meticulously. You do not infer, add, or invent information."
 
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=120) # Increased timeout
-            response.raise_for_status()
-
-            content = response.json()
-            if 'choices' in content and content['choices']:
-                raw_output = content['choices'][0]['message']['content'].strip()
-
+            completion = router.complete(
+                prompt, system=system_prompt,
+                temperature=0.0, # Set to 0.0 for maximum determinism and adherence to literal extraction
+                max_tokens=2000, # Increased slightly just in case, but output should be concise
+                timeout=120, # Increased timeout
+                label=f"topic {topic_id}", attempt=attempt
+            )
+            raw_output = completion.text
+            if raw_output:
                 # Clean, split, make unique, and filter out common words post-LLM
                 # Also filter out single characters unless specifically desired
                 llm_extracted_terms = [
@@ -233,40 +225,71 @@ Now, meticulously extract the specialized chemistry terms that are LITERALLY PRE
                     term for term in llm_extracted_terms
                     if term not in COMMON_WORDS_TO_EXCLUDE_POST_LLM and len(term) > 2 # exclude very short, likely common words
                 )))
+                # Only cache answers that yielded terms, so a bad reply is not replayed on retries or later runs
+                if final_terms:
+                    completion.remember()
                 return final_terms
             else:
-                print(f"Warning: No 'choices' in API response for topic {topic_id} (Attempt {attempt+1}). Response: {content}")
-                if attempt == max_retries - 1: return []
+                print(f"Warning: Empty response for topic {topic_id} (Attempt {attempt+1}).")
+                completion.mark_parse_failure()
+                if attempt == max_retries - 1: return None
                 time.sleep(5 * (attempt + 1)) # Exponential backoff
 
-        except requests.exceptions.RequestException as e:
+        except BackendError as e:
             print(f"API Request Error for topic {topic_id} (Attempt {attempt+1}): {e}")
-            if attempt == max_retries - 1: return []
+            if attempt == max_retries - 1: return None
             time.sleep(5 * (attempt + 1))
         except Exception as e:
             print(f"An unexpected error occurred for topic {topic_id} (Attempt {attempt+1}): {e}")
-            if attempt == max_retries - 1: return []
+            if attempt == max_retries - 1: return None
             time.sleep(5 * (attempt + 1))
-    return []
+    return None
 
 
-def save_results(results: Dict[str, List[str]], output_path: str):
-    """Saves the extracted terms to the output file, organized by topic."""
-    try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for topic_id, words in results.items():
-                f.write(f"[Topic {topic_id}]\n")
-                if words:
-                    f.write(",".join(words) + "\n\n")
-                else:
-                    f.write("No specialized terms extracted or all filtered out for this topic.\n\n")
-        print(f"\n✅ Results saved to {output_path}")
-    except IOError as e:
-        print(f"Error writing to output file '{output_path}': {e}")
+def write_topic_result(f, topic_id: str, words: List[str]):
+    """Appends one topic block and flushes it, so a crash never loses a finished topic."""
+    block = f"[Topic {topic_id}]\n"
+    if words:
+        block += ",".join(words) + "\n\n"
+    else:
+        block += "No specialized terms extracted or all filtered out for this topic.\n\n"
+    f.write(block)
+    f.flush()
+
+
+def load_completed_topics(output_path: str) -> Dict[str, List[str]]:
+    """
+    Reads topic blocks already written to output_path. A trailing block without its
+    blank-line terminator was cut off mid-write; it is truncated away so the topic is redone.
+    """
+    if not Path(output_path).exists():
+        return {}
+
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        complete_end = data.rfind(b"\n\n") + 2 if b"\n\n" in data else 0
+        if complete_end < len(data):
+            f.truncate(complete_end)
+            print(f"⚠️ Dropped a partially written topic at the end of {output_path}")
+            data = data[:complete_end]
+
+    completed = {}
+    for block in data.decode('utf-8').split("\n\n"):
+        lines = block.strip().splitlines()
+        if not lines or not (lines[0].startswith('[Topic ') and lines[0].endswith(']')):
+            continue
+        topic_id = lines[0][len('[Topic '):-1].strip()
+        terms_line = lines[1] if len(lines) > 1 else ""
+        if terms_line.startswith("No specialized terms extracted"):
+            completed[topic_id] = []
+        else:
+            completed[topic_id] = [term for term in terms_line.split(",") if term]
+    return completed
+
 
 def main():
     parser = argparse.ArgumentParser(
-        description='Extracts specialized chemistry terms from topics in an XML book using DeepSeek API.'
+        description='Extracts specialized chemistry terms from topics in an XML book using an LLM (DeepSeek or Ollama).'
     )
     parser.add_argument('xml_file', help='Path to the XML book file.')
     parser.add_argument(
@@ -277,8 +300,20 @@ def main():
         '--apikey',
         help='DeepSeek API Key. Best to set as DEEPSEEK_API_KEY environment variable.'
     )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='Always call the API instead of reusing cached responses'
+    )
+    parser.add_argument(
+        '--resume', action='store_true',
+        help='Keep topics already in the output file and only process the rest (e.g. after an interrupted run)'
+    )
+    add_backend_arguments(parser)
+    add_telemetry_arguments(parser, 'wordex')
 
     args = parser.parse_args()
+    if args.no_cache:
+        disable_cache()
 
     # Determine API Key
     api_key_to_use = args.apikey
@@ -286,7 +321,9 @@ def main():
         import os
         api_key_to_use = os.getenv("DEEPSEEK_API_KEY")
 
-    if not api_key_to_use:
+    try:
+        router = build_router(args, api_key_to_use)
+    except ValueError:
         print("Error: DeepSeek API Key is not set. Please provide via --apikey argument or set DEEPSEEK_API_KEY environment variable.")
         return
 
@@ -299,21 +336,46 @@ def main():
         print("No topics found or could not load the XML file. Exiting.")
         return
 
-    all_extracted_terms = {}
+    completed_topics = load_completed_topics(args.output) if args.resume else {}
+    if completed_topics:
+        print(f"🔁 Resuming: {len(completed_topics)} topic(s) already in {args.output}")
+
+    try:
+        output = open(args.output, 'a' if args.resume else 'w', encoding='utf-8')
+    except IOError as e:
+        print(f"Error writing to output file '{args.output}': {e}")
+        return
+
     total_topics = len(topics)
-    for i, (topic_id, topic_text) in enumerate(topics.items()):
-        print(f"\n⏳ Processing Topic {i+1}/{total_topics}: {topic_id}...")
-        # Make sure topic_text is not excessively long for the API context window.
-        # If it is, you might need to chunk it or summarize, but that complicates "literal extraction".
-        # DeepSeek's context window is large, so this is usually not an issue for typical topic lengths.
-        if len(topic_text.split()) > 25000: # Heuristic: ~30k tokens is DeepSeek's limit
-             print(f"Warning: Topic {topic_id} is very long ({len(topic_text.split())} words) and might exceed context limits.")
-
-        extracted_words = extract_specialized_chemistry_terms(api_key_to_use, topic_id, topic_text)
-        all_extracted_terms[topic_id] = extracted_words
-        print(f"   Extracted {len(extracted_words)} specialized term(s) after filtering.")
-
-    save_results(all_extracted_terms, args.output)
+    written = 0
+    failed = []
+    with output:
+        for i, (topic_id, topic_text) in enumerate(topics.items()):
+            if topic_id in completed_topics:
+                continue
+            print(f"\n⏳ Processing Topic {i+1}/{total_topics}: {topic_id}...")
+            # Make sure topic_text is not excessively long for the API context window.
+            # If it is, you might need to chunk it or summarize, but that complicates "literal extraction".
+            # DeepSeek's context window is large, so this is usually not an issue for typical topic lengths.
+            if len(topic_text.split()) > 25000: # Heuristic: ~30k tokens is DeepSeek's limit
+                 print(f"Warning: Topic {topic_id} is very long ({len(topic_text.split())} words) and might exceed context limits.")
+
+            extracted_words = extract_specialized_chemistry_terms(router, topic_id, topic_text)
+            if extracted_words is None:
+                # Not written, so --resume retries the topic
+                failed.append(topic_id)
+                print(f"   ❌ Extraction failed for topic {topic_id}")
+                continue
+            write_topic_result(output, topic_id, extracted_words)
+            written += 1
+            print(f"   Extracted {len(extracted_words)} specialized term(s) after filtering.")
+
+    print(f"\n✅ Results for {written} topic(s) saved to {args.output}")
+    if failed:
+        print(f"⚠️ {len(failed)} topic(s) failed and were not written ({', '.join(failed)}); rerun with --resume to retry them")
+    print(router.summary())
+    print_cache_stats()
+    finish_telemetry(args)
 
 if __name__ == "__main__":
     main()